@@ -199,6 +199,15 @@ def run_migrations():
         warn("Refusing to run migrations in staging environment")
 
 
+def write_deploy_info():
+    # Read by the app at startup, so that responses change with each
+    # deploy (see openprescribing/api/conditional.py)
+    info = json.dumps({
+        'commit': run('git rev-parse --verify HEAD'),
+        'deployed_at': datetime.utcnow().isoformat() + '+00:00'})
+    run("echo '%s' > openprescribing/deploy.json" % info)
+
+
 @task
 def graceful_reload():
     result = run(r"""PID=$(sudo supervisorctl status | grep %s |
@@ -280,6 +289,7 @@ def deploy(environment, force_build=False, branch='master'):
         npm_build_css(force_build)
         deploy_static()
         run_migrations()
+        write_deploy_info()
         graceful_reload()
         clear_cloudflare()
         setup_cron()
@@ -0,0 +1,135 @@
+from collections import OrderedDict
+import threading
+import time
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+
+# Entries are shared between all instances with the same name in this
+# process, as with Django's LocMemCache (Django creates one instance of
+# each cache per thread).
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _Store(object):
+    def __init__(self):
+        self.entries = OrderedDict()  # key -> (pickled value, expiry)
+        self.size = 0
+        self.lock = threading.Lock()
+
+
+class LRUMemoryCache(BaseCache):
+    """An in-process cache which evicts the least recently used entries
+    once it holds more than MAX_ENTRIES entries, or more than MAX_SIZE
+    bytes of pickled values.
+
+    Django's LocMemCache instead culls an arbitrary fraction of its
+    entries when it is full, which is a poor fit for API responses where
+    a few popular queries account for most requests.
+
+    Configure it with, for instance:
+
+        'api': {
+            'BACKEND': 'api.cache_backends.LRUMemoryCache',
+            'LOCATION': 'api',
+            'TIMEOUT': None,
+            'OPTIONS': {
+                'MAX_ENTRIES': 2000,
+                'MAX_SIZE': 256 * 1024 * 1024,
+            }
+        }
+
+    """
+    def __init__(self, name, params):
+        super(LRUMemoryCache, self).__init__(params)
+        options = params.get('OPTIONS', {})
+        # A MAX_SIZE of zero means that only MAX_ENTRIES applies
+        self._max_size = int(options.get('MAX_SIZE', 0))
+        with _stores_lock:
+            self._store = _stores.setdefault(name, _Store())
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._store.lock:
+            if self._get(key) is not None:
+                return False
+            self._set(key, pickled, timeout)
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            pickled = self._get(key)
+        if pickled is None:
+            return default
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._store.lock:
+            self._set(key, pickled, timeout)
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            self._delete(key)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            return self._get(key) is not None
+
+    def clear(self):
+        with self._store.lock:
+            self._store.entries.clear()
+            self._store.size = 0
+
+    def _get(self, key):
+        """Return the pickled value for `key`, marking it as the most
+        recently used entry, or None if it is missing or has expired.
+
+        Must be called with the lock held.
+        """
+        entry = self._delete(key)
+        if entry is None:
+            return None
+        pickled, expiry = entry
+        if expiry is not None and expiry <= time.time():
+            return None
+        self._store.entries[key] = entry
+        self._store.size += len(pickled)
+        return pickled
+
+    def _set(self, key, pickled, timeout):
+        self._delete(key)
+        self._store.entries[key] = (
+            pickled, self.get_backend_timeout(timeout))
+        self._store.size += len(pickled)
+        self._evict()
+
+    def _delete(self, key):
+        entry = self._store.entries.pop(key, None)
+        if entry is not None:
+            self._store.size -= len(entry[0])
+        return entry
+
+    def _evict(self):
+        entries = self._store.entries
+        while entries and (
+                len(entries) > self._max_entries or
+                (self._max_size and self._store.size > self._max_size)):
+            _, (pickled, _) = entries.popitem(last=False)
+            self._store.size -= len(pickled)
@@ -0,0 +1,107 @@
+"""Conditional GET support for API responses and pages.
+
+What we serve only changes when an import writes an ImportLog, or when
+new code is deployed.  The ETag of a response is therefore a hash of
+the request's path and query params, the latest ImportLog in each
+category and the deployed commit, and its Last-Modified is the time of
+the latest import or deploy, whichever is later.  A client presenting a
+matching If-None-Match or If-Modified-Since header gets a 304 before the
+view runs any queries of its own.  The deployed commit and the time of
+the deploy come from the SOURCE_COMMIT_ID and DEPLOYED_AT settings.
+
+Only GET and HEAD requests are handled conditionally; other methods go
+straight to the view.
+
+Only views whose data is recorded by an ImportLog should be conditional.
+Lists of organisations and BNF codes aren't, as their importers don't
+write one (see response_cache.py).
+
+Pages may also depend on who is logged in, on their CSRF token and on
+any messages waiting to be shown, so their ETags include the user and
+CSRF cookie, and pages with messages are never treated as unmodified.
+
+"""
+from functools import wraps
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition
+
+from response_cache import get_request_data_versions
+
+
+def make_etag(request, extra=None):
+    params = sorted(
+        (k, request.GET.getlist(k)) for k in request.GET.keys())
+    key = json.dumps([
+        request.path,
+        params,
+        get_request_data_versions(request),
+        getattr(settings, 'SOURCE_COMMIT_ID', ''),
+        extra
+    ])
+    return hashlib.sha1(key).hexdigest()
+
+
+def get_last_modified(request):
+    times = [imported_at for _, _, imported_at in
+             get_request_data_versions(request)]
+    deployed_at = getattr(settings, 'DEPLOYED_AT', '')
+    if deployed_at:
+        times.append(deployed_at)
+    if not times:
+        return None
+    return max(parse_datetime(t) for t in times)
+
+
+def _api_etag(request, *args, **kwargs):
+    return make_etag(request)
+
+
+def _api_last_modified(request, *args, **kwargs):
+    return get_last_modified(request)
+
+
+def _has_messages(request):
+    # Checking the length doesn't mark the messages as seen
+    return len(get_messages(request)) > 0
+
+
+def _page_etag(request, *args, **kwargs):
+    if _has_messages(request):
+        return None
+    user = request.user.pk if request.user.is_authenticated() else None
+    csrf_token = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    return make_etag(request, [user, csrf_token])
+
+
+def _page_last_modified(request, *args, **kwargs):
+    # Clients which only send If-Modified-Since can't tell us whose page
+    # they have, so only anonymous pages are treated as unmodified
+    if request.user.is_authenticated() or _has_messages(request):
+        return None
+    return get_last_modified(request)
+
+
+def _conditional_get(etag_func, last_modified_func):
+    def decorator(func):
+        conditional_func = condition(
+            etag_func=etag_func, last_modified_func=last_modified_func)(func)
+
+        @wraps(func)
+        def func_wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return func(request, *args, **kwargs)
+            return conditional_func(request, *args, **kwargs)
+        return func_wrapper
+    return decorator
+
+
+# Decorators for API views, and for pages.  These should be applied
+# outside any other decorators, so that nothing else runs when a 304 is
+# returned.
+conditional_api_response = _conditional_get(_api_etag, _api_last_modified)
+conditional_page = _conditional_get(_page_etag, _page_last_modified)
@@ -0,0 +1,262 @@
+"""Instrumentation of requests, to find out which views are slow and why.
+
+RequestTimingMiddleware records, for each request, the time spent
+running database queries, the number of queries run and rows fetched,
+and the time spent rendering the response.  These are sent in a
+Server-Timing header (which browsers show with the request in their
+developer tools), and the total time taken is added to a latency
+histogram for the view.
+
+Each process keeps its histograms in memory, and adds them to the
+RequestLatency table at most every LATENCY_FLUSH_INTERVAL seconds.
+`manage.py api_latency` reports percentiles from that table.
+
+Queries are counted by wrapping the cursors of every database
+connection.  Queries run by server-side cursors created directly on
+the psycopg2 connection (see view_utils.stream_query) are not counted.
+
+"""
+from collections import Counter
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db import connection
+from django.db import connections
+from django.db import transaction
+from django.db.backends.utils import CursorDebugWrapper
+from django.db.backends.utils import CursorWrapper
+
+# Latencies are counted in buckets whose bounds are this many to each
+# doubling, so that percentiles are reported to within about 19%
+BUCKETS_PER_DOUBLING = 4
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class RequestStats(object):
+    def __init__(self):
+        self.start = time.time()
+        self.view_name = None
+        self.db_time = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.render_start = None
+        self.render_end = None
+
+
+def _current_stats():
+    return getattr(_local, 'stats', None)
+
+
+class _InstrumentedCursorMixin(object):
+    def _timed(self, method, *args):
+        stats = _current_stats()
+        if stats is None:
+            return method(*args)
+        start = time.time()
+        try:
+            return method(*args)
+        finally:
+            stats.db_time += time.time() - start
+
+    def _count_rows(self, num_rows):
+        stats = _current_stats()
+        if stats is not None:
+            stats.rows += num_rows
+
+    def execute(self, sql, params=None):
+        stats = _current_stats()
+        if stats is not None:
+            stats.queries += 1
+        return self._timed(
+            super(_InstrumentedCursorMixin, self).execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        stats = _current_stats()
+        if stats is not None:
+            stats.queries += 1
+        return self._timed(
+            super(_InstrumentedCursorMixin, self).executemany,
+            sql, param_list)
+
+    def fetchone(self):
+        row = self._timed(
+            super(_InstrumentedCursorMixin, self).__getattr__('fetchone'))
+        if row is not None:
+            self._count_rows(1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._timed(
+            super(_InstrumentedCursorMixin, self).__getattr__('fetchmany'),
+            *args)
+        self._count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(
+            super(_InstrumentedCursorMixin, self).__getattr__('fetchall'))
+        self._count_rows(len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in super(_InstrumentedCursorMixin, self).__iter__():
+            self._count_rows(1)
+            yield row
+
+
+class InstrumentedCursorWrapper(_InstrumentedCursorMixin, CursorWrapper):
+    pass
+
+
+class InstrumentedCursorDebugWrapper(_InstrumentedCursorMixin,
+                                     CursorDebugWrapper):
+    pass
+
+
+def instrument_connection(conn):
+    """Make `conn` return cursors which record the queries they run
+    against the current request.
+    """
+    if getattr(conn, 'is_instrumented', False):
+        return
+    conn.make_cursor = lambda cursor: InstrumentedCursorWrapper(
+        cursor, conn)
+    conn.make_debug_cursor = lambda cursor: InstrumentedCursorDebugWrapper(
+        cursor, conn)
+    conn.is_instrumented = True
+
+
+def get_view_name(view_func):
+    return '%s.%s' % (view_func.__module__, view_func.__name__)
+
+
+def latency_bucket(ms):
+    """Return the histogram bucket for a latency of `ms` milliseconds.
+    """
+    if ms <= 1:
+        return 0
+    return int(math.ceil(BUCKETS_PER_DOUBLING * math.log(ms, 2)))
+
+
+def bucket_upper_bound(bucket):
+    """Return the greatest latency, in milliseconds, counted in `bucket`.
+    """
+    return 2 ** (float(bucket) / BUCKETS_PER_DOUBLING)
+
+
+def percentile(counts, fraction):
+    """Return the latency, in milliseconds, below which `fraction` of
+    the requests counted in `counts` (a dict of bucket: count) were
+    served, or None if there are no requests.
+    """
+    total = sum(counts.values())
+    if not total:
+        return None
+    seen = 0
+    for bucket in sorted(counts):
+        seen += counts[bucket]
+        if seen >= fraction * total:
+            return bucket_upper_bound(bucket)
+
+
+class LatencyHistograms(object):
+    """Counts of requests to each view in each latency bucket, which are
+    added to the RequestLatency table from time to time.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.last_flush = time.time()
+
+    def add(self, view_name, ms):
+        with self.lock:
+            self.counts[(view_name, latency_bucket(ms))] += 1
+            interval = getattr(settings, 'LATENCY_FLUSH_INTERVAL', 60)
+            due = time.time() - self.last_flush >= interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.last_flush = time.time()
+        if not counts:
+            return
+        sql = (
+            "INSERT INTO frontend_requestlatency (view_name, bucket, count) "
+            "VALUES (%s, %s, %s) "
+            "ON CONFLICT (view_name, bucket) DO UPDATE "
+            "SET count = frontend_requestlatency.count + EXCLUDED.count"
+        )
+        # This runs while a response is being returned, so a database
+        # error mustn't fail the request.  The savepoint keeps an error
+        # here from breaking the request's own transaction.
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        sql,
+                        [(view_name, bucket, count)
+                         for (view_name, bucket), count in counts.items()])
+        except DatabaseError:
+            logger.exception("Couldn't record request latencies")
+            # Keep the counts to add next time
+            with self.lock:
+                self.counts.update(counts)
+
+
+histograms = LatencyHistograms()
+
+
+class RequestTimingMiddleware(object):
+    """Adds a Server-Timing header to every response, and records how
+    long each view took to respond.
+
+    It should be the first entry in MIDDLEWARE_CLASSES, so that the time
+    recorded includes all the other middleware.
+
+    """
+    def process_request(self, request):
+        for conn in connections.all():
+            instrument_connection(conn)
+        _local.stats = RequestStats()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = _current_stats()
+        if stats is not None:
+            stats.view_name = get_view_name(view_func)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns
+        stats = _current_stats()
+        if stats is not None:
+            stats.render_start = time.time()
+            response.add_post_render_callback(
+                lambda r: setattr(stats, 'render_end', time.time()))
+        return response
+
+    def process_response(self, request, response):
+        stats = _current_stats()
+        _local.stats = None
+        if stats is None:
+            return response
+        total_ms = (time.time() - stats.start) * 1000
+        timings = [
+            'db;dur=%.1f;desc="%s queries, %s rows"' % (
+                stats.db_time * 1000, stats.queries, stats.rows)
+        ]
+        if stats.render_end is not None:
+            timings.append('render;dur=%.1f' % (
+                (stats.render_end - stats.render_start) * 1000))
+        timings.append('total;dur=%.1f' % total_ms)
+        response['Server-Timing'] = ', '.join(timings)
+        if stats.view_name is not None:
+            histograms.add(stats.view_name, total_ms)
+        return response
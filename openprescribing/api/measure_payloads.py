@@ -0,0 +1,192 @@
+"""Pre-rendered responses for the measure_by_ccg and measure_by_practice
+API views.
+
+Building these responses means expanding hundreds of MeasureSeries
+into MeasureValues with their orgs, which is slow for the dashboards
+that request every measure for a CCG or practice.  So after measures are
+imported, the values of each measure for each CCG, each practice, and
+each CCG's practices are rendered once as JSON, and stored compressed
+in MeasurePayload.  When a request is for a single org with no other
+filters, the view joins these together with each measure's definition,
+which is rendered as it is served.  So only the payloads of the measures
+which were calculated need to be rewritten, and not any when only
+definitions change.
+
+"""
+from itertools import groupby
+from operator import attrgetter
+from operator import itemgetter
+import zlib
+
+from django.db import transaction
+
+from rest_framework.renderers import JSONRenderer
+
+from frontend.models import MeasurePayload
+from frontend.models import MeasureSeries
+from frontend.models import PCT
+
+
+def get_measure_payload(org_type, org_id, tag=''):
+    """Return the pre-rendered JSON response for the given org, for all
+    measures or those with the given tag, or None if there isn't one.
+    """
+    payloads = MeasurePayload.objects.filter(
+        org_type=org_type, org_id=org_id)
+    if not payloads.exists():
+        return None
+    if tag:
+        payloads = payloads.filter(measure__tags__contains=[tag])
+    measures = []
+    for payload in payloads.select_related('measure').order_by('measure_id'):
+        # The definition is rendered as an object, to which the data is
+        # added as its last member
+        definition = JSONRenderer().render(measure_data(payload.measure))
+        measures.append('%s,"data":%s}' % (
+            definition[:-1], zlib.decompress(payload.payload)))
+    return '{"measures":[%s]}' % ','.join(measures)
+
+
+def write_measure_payloads(measure_ids=None):
+    """Replace the pre-rendered values of the measures in `measure_ids`, or
+    of every measure, with ones rendered from the current MeasureSeries.
+
+    The payloads of each CCG, and of each CCG's practices, are replaced
+    in a transaction of their own, so that the table isn't locked while
+    all of them are rendered.
+
+    """
+    written = set()
+    series = _filter_measures(
+        MeasureSeries.objects.by_ccg([]), measure_ids).iterator()
+    for ccg_id, ccg_series in groupby(series, attrgetter('pct_id')):
+        with transaction.atomic():
+            _write_payloads(
+                'ccg', ccg_id, series_measure_values(ccg_series),
+                measure_ids)
+        written.add(('ccg', ccg_id))
+
+    # Practices are fetched a CCG at a time, both to write the values for
+    # all the CCG's practices and to bound the number of MeasureSeries in
+    # memory
+    ccg_ids = PCT.objects.filter(org_type='CCG').values_list(
+        'code', flat=True)
+    for ccg_id in ccg_ids:
+        values = series_measure_values(_filter_measures(
+            MeasureSeries.objects.by_practice([ccg_id]), measure_ids))
+        if not values:
+            continue
+        with transaction.atomic():
+            _write_payloads('practice', ccg_id, values, measure_ids)
+            written.add(('practice', ccg_id))
+            for practice_id, practice_values in groupby(
+                    values, attrgetter('practice_id')):
+                _write_payloads(
+                    'practice', practice_id, list(practice_values),
+                    measure_ids)
+                written.add(('practice', practice_id))
+
+    # Remove the payloads of orgs which no longer have any values
+    existing = _filter_measures(
+        MeasurePayload.objects.all(), measure_ids).values_list(
+            'org_type', 'org_id').distinct()
+    for org_type, org_id in set(existing) - written:
+        _filter_measures(MeasurePayload.objects.filter(
+            org_type=org_type, org_id=org_id), measure_ids).delete()
+
+
+def _filter_measures(qs, measure_ids):
+    if measure_ids is None:
+        return qs
+    return qs.filter(measure_id__in=measure_ids)
+
+
+def _write_payloads(org_type, org_id, measure_values, measure_ids):
+    _filter_measures(MeasurePayload.objects.filter(
+        org_type=org_type, org_id=org_id), measure_ids).delete()
+    data_by_measure = {}
+    for measure_value in measure_values:
+        data_by_measure.setdefault(measure_value.measure_id, []).append(
+            measure_value_data(measure_value, org_type))
+    MeasurePayload.objects.bulk_create([
+        MeasurePayload(
+            org_type=org_type,
+            org_id=org_id,
+            measure_id=measure_id,
+            payload=zlib.compress(JSONRenderer().render(data)))
+        for measure_id, data in data_by_measure.items()
+    ])
+
+
+def series_measure_values(series, since=None):
+    """Return the MeasureValues in each of `series`, in order, from `since`
+    onwards if given.
+    """
+    return [
+        measure_value
+        for one_series in series
+        for measure_value in one_series.measure_values(since)
+    ]
+
+
+def measure_data(measure):
+    """Return the definition of `measure` served with its values.
+    """
+    return {
+        'id': measure.id,
+        'name': measure.name,
+        'title': measure.title,
+        'description': measure.description,
+        'why_it_matters': measure.why_it_matters,
+        'numerator_short': measure.numerator_short,
+        'denominator_short': measure.denominator_short,
+        'url': measure.url,
+        'is_cost_based': measure.is_cost_based,
+        'is_percentage': measure.is_percentage,
+        'low_is_good': measure.low_is_good,
+    }
+
+
+def measure_value_data(measure_value, practice_or_ccg):
+    measure_value_data = {
+        'date': measure_value.month,
+        'numerator': measure_value.numerator,
+        'denominator': measure_value.denominator,
+        'calc_value': measure_value.calc_value,
+        'percentile': measure_value.percentile,
+        'cost_savings': measure_value.cost_savings,
+    }
+
+    if practice_or_ccg == 'practice':
+        measure_value_data.update({
+            'practice_id': measure_value.practice_id,
+            'practice_name': measure_value.practice.name,
+        })
+    elif practice_or_ccg == 'ccg':
+        measure_value_data.update({
+            'pct_id': measure_value.pct_id,
+            'pct_name': measure_value.pct.name,
+        })
+    else:
+        assert False
+
+    return measure_value_data
+
+
+def roll_up_measure_values(measure_values, practice_or_ccg):
+    """Return the definition of each measure with values in
+    `measure_values`, together with its values, ordered by measure.
+    """
+    rolled = {}
+
+    for measure_value in measure_values:
+        measure_id = measure_value.measure_id
+        data = measure_value_data(measure_value, practice_or_ccg)
+
+        if measure_id in rolled:
+            rolled[measure_id]['data'].append(data)
+        else:
+            rolled[measure_id] = measure_data(measure_value.measure)
+            rolled[measure_id]['data'] = [data]
+
+    return sorted(rolled.values(), key=itemgetter('id'))
@@ -0,0 +1,62 @@
+"""Helpers for building the WHERE clauses of API queries.
+
+Equality conditions are written as `col = ANY(%s)` with a single list
+parameter, which psycopg2 adapts to a Postgres array.  LIKE conditions
+are written as one `col LIKE %s` per pattern, ORed together, because
+Postgres can only use a `varchar_pattern_ops` index for a LIKE with a
+single pattern, not for `LIKE ANY(array)`.
+
+"""
+
+
+class Conditions(object):
+    """Accumulates SQL conditions, and the parameters they refer to, to
+    be ANDed together in a WHERE clause.
+
+    """
+    def __init__(self):
+        self.conditions = []
+        self.params = []
+
+    def __len__(self):
+        return len(self.conditions)
+
+    def add(self, condition, *params):
+        """Add an arbitrary condition, with a parameter for each of its
+        placeholders.
+        """
+        self.conditions.append(condition)
+        self.params.extend(params)
+
+    def add_any(self, column, values):
+        """Add a condition that `column` equals one of `values`.
+        """
+        self.add(any_of(column), list(values))
+
+    def add_like_any(self, column, patterns):
+        """Add a condition that `column` matches one of the LIKE
+        `patterns`.
+        """
+        patterns = list(patterns)
+        self.add(like_any(column, len(patterns)), *patterns)
+
+    def to_sql(self, keyword='WHERE'):
+        """Return the conditions as a clause introduced by `keyword`, or
+        an empty string if there are no conditions.
+        """
+        if not self.conditions:
+            return ''
+        return '%s %s ' % (
+            keyword,
+            ' AND '.join('(%s)' % c for c in self.conditions)
+        )
+
+
+def any_of(column):
+    return '%s = ANY(%%s)' % column
+
+
+def like_any(column, count):
+    if not count:
+        return 'FALSE'
+    return ' OR '.join(['%s LIKE %%s' % column] * count)
@@ -0,0 +1,114 @@
+"""Coalescing of identical queries run at the same time.
+
+When a popular page is linked to, many requests for the same data
+arrive at once, and without coalescing each would run the same
+expensive query in parallel, slowing all of them down.  Instead, the
+first process to run a query takes a Postgres advisory lock keyed on
+its SQL and params.  Any other process wanting the same rows meanwhile
+waits for the lock.  When the first process has fetched the rows, it
+stores them in a cache shared by all processes if (and only if) another
+process is waiting, and the waiting processes take the rows from there.
+
+This costs a few extra round trips for each query, so is only worth
+doing for the few expensive queries which many visitors ask for at
+once: see the `coalesce` argument of view_utils.execute_query.
+
+Rows are kept in the cache for API_QUERY_COALESCING_TIMEOUT seconds,
+which need only be long enough for waiting processes to collect them
+(and limits how long rows from before an import may be served).
+If the cache doesn't have them (because the first process failed, or
+they were evicted) a waiting process runs the query itself.
+
+The cache used is the entry in CACHES named by the
+API_QUERY_COALESCING_CACHE setting.  It must be shared between
+processes (for instance FileBasedCache, or a Redis backend) for
+coalescing to help.  If the setting is None, queries are not coalesced.
+
+"""
+import hashlib
+import json
+import struct
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def get_coalescing_cache():
+    alias = getattr(settings, 'API_QUERY_COALESCING_CACHE', None)
+    if alias is None:
+        return None
+    return caches[alias]
+
+
+def make_lock_key(query, params):
+    """Return a key, suitable for a Postgres advisory lock (which takes a
+    signed 64 bit integer), for the given query and params.
+    """
+    digest = hashlib.sha1(
+        json.dumps([query, params], cls=JSONEncoder)).digest()
+    return struct.unpack('>q', digest[:8])[0]
+
+
+def _has_waiters(lock_key):
+    """Return whether any other session is waiting for the advisory lock
+    with the given key.  A lock on a bigint is listed in pg_locks with its
+    high and low 32 bits as classid and objid, and with objsubid 1.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_locks "
+            "WHERE locktype = 'advisory' AND NOT granted "
+            "AND database = (SELECT oid FROM pg_database "
+            "WHERE datname = current_database()) "
+            "AND classid = %s::bigint::oid AND objid = %s::bigint::oid "
+            "AND objsubid = 1)",
+            [(lock_key >> 32) & 0xffffffff, lock_key & 0xffffffff])
+        return cursor.fetchone()[0]
+
+
+def coalesced(query, params, run):
+    """Return the result of calling `run()`, which should execute `query`
+    with `params` and return picklable rows, sharing the result with
+    any other process asking for the same query at the same time.
+    """
+    cache = get_coalescing_cache()
+    if cache is None:
+        return run()
+
+    lock_key = make_lock_key(query, params)
+    cache_key = 'api-query:%s' % lock_key
+    timeout = getattr(settings, 'API_QUERY_COALESCING_TIMEOUT', 10)
+
+    rows = cache.get(cache_key)
+    if rows is not None:
+        return rows
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [lock_key])
+        acquired = cursor.fetchone()[0]
+
+    if not acquired:
+        # Another process is running the query, so wait for it to finish.
+        # This is subject to any statement timeout, as the query would be.
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [lock_key])
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_key])
+        rows = cache.get(cache_key)
+        if rows is not None:
+            return rows
+        return run()
+
+    try:
+        # A savepoint, so that if the query fails, the lock can still be
+        # released when the view is being run in a transaction
+        with transaction.atomic():
+            rows = run()
+        if _has_waiters(lock_key):
+            cache.set(cache_key, rows, timeout)
+        return rows
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_key])
@@ -0,0 +1,113 @@
+"""Renderers for columnar formats, for analysts who load API responses
+into pandas or similar tools.
+
+Rows are read in chunks of BATCH_SIZE into one list per column, and
+each column of a chunk is then turned into a typed Arrow array, so
+dates, floats and ints keep their types rather than being written out
+as text.  The rows may be any iterable of dicts (such as the generator
+returned by view_utils.stream_query), so they need never all be held
+in memory as Python objects, only as Arrow arrays.
+
+Values which aren't scalars (such as the cost savings of a measure) are
+written as JSON strings, and responses which aren't rows (such as error
+messages) as a single row.
+
+"""
+from decimal import Decimal
+from itertools import islice
+import json
+
+import pyarrow
+import pyarrow.parquet
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+COLUMNAR_FORMATS = ['arrow', 'parquet']
+
+BATCH_SIZE = 10000
+
+
+def _as_rows(data):
+    if isinstance(data, basestring):
+        return [{'detail': data}]
+    if isinstance(data, dict):
+        return [data]
+    return data
+
+
+def _columnar_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, cls=JSONEncoder)
+    return value
+
+
+def build_table(data):
+    """Return a pyarrow Table holding `data`, with a column for each key
+    of its rows, in the order CSVRenderer would write them.
+    """
+    rows = iter(_as_rows(data))
+    names = []
+    # The arrays of each batch of rows, column by column
+    batches = []
+    # The type of each column, once a batch has a value in it
+    types = []
+    while True:
+        chunk = list(islice(rows, BATCH_SIZE))
+        if not chunk:
+            break
+        if not names:
+            names = sorted(chunk[0].keys())
+            types = [None] * len(names)
+        arrays = []
+        for i, name in enumerate(names):
+            values = [_columnar_value(row.get(name)) for row in chunk]
+            array = pyarrow.array(values, type=types[i])
+            if types[i] is None and array.null_count < len(array):
+                types[i] = array.type
+            arrays.append(array)
+        batches.append(arrays)
+    if not batches:
+        return pyarrow.Table.from_arrays([], names=[])
+    # A column whose earlier batches were all nulls takes the type of
+    # its later values
+    for arrays in batches:
+        for i, array in enumerate(arrays):
+            if types[i] is not None and array.type != types[i]:
+                arrays[i] = pyarrow.array([None] * len(array), type=types[i])
+    return pyarrow.Table.from_batches([
+        pyarrow.RecordBatch.from_arrays(arrays, names)
+        for arrays in batches])
+
+
+class ArrowRenderer(BaseRenderer):
+    """Renders rows in the Arrow IPC streaming format.
+    """
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, media_type=None, renderer_context=None):
+        table = build_table(data)
+        sink = pyarrow.BufferOutputStream()
+        writer = pyarrow.RecordBatchStreamWriter(sink, table.schema)
+        writer.write_table(table)
+        writer.close()
+        return sink.get_result().to_pybytes()
+
+
+class ParquetRenderer(BaseRenderer):
+    """Renders rows as a Parquet file.
+    """
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, media_type=None, renderer_context=None):
+        table = build_table(data)
+        sink = pyarrow.BufferOutputStream()
+        pyarrow.parquet.write_table(table, sink)
+        return sink.get_result().to_pybytes()
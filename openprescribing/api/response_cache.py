@@ -0,0 +1,129 @@
+"""Caching of API responses.
+
+The data behind the API only changes when an import writes an
+ImportLog, so a response can be reused until the next import.  Each
+response is cached under a key made from the request's path and query
+params together with the latest ImportLog in every category.  A new
+import therefore changes every key, so stale responses are never
+served.  The post_save handler for ImportLog also clears the cache, so
+that the stale entries don't take up space.
+
+Only views whose data is recorded by an ImportLog should be cached.
+Views of organisations and BNF codes aren't, as their importers don't
+write one.
+
+The cache used is the entry in CACHES named by the API_RESPONSE_CACHE
+setting.  It should be shared by every worker (for instance
+FileBasedCache, or a Redis backend such as
+django_redis.cache.RedisCache), as each import only clears the cache
+of the process which ran it, and so that warm_caches fills the cache
+that every worker reads.  api.cache_backends.LRUMemoryCache is local
+to one process, and only suitable for a single process.  If
+API_RESPONSE_CACHE is not set, responses are not cached.
+
+"""
+from functools import wraps
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max
+from django.http import HttpResponse
+
+from frontend.models import ImportLog
+
+
+def get_response_cache():
+    alias = getattr(settings, 'API_RESPONSE_CACHE', None)
+    if alias is None:
+        return None
+    return caches[alias]
+
+
+def clear_response_cache():
+    cache = get_response_cache()
+    if cache is not None:
+        cache.clear()
+
+
+def get_data_versions():
+    """Return the date and import time of the latest ImportLog in each
+    category.
+    """
+    versions = ImportLog.objects.values('category').annotate(
+        current_at=Max('current_at'),
+        imported_at=Max('imported_at'),
+    ).order_by('category')
+    return [
+        [v['category'], v['current_at'].isoformat(),
+         v['imported_at'].isoformat()]
+        for v in versions
+    ]
+
+
+def get_request_data_versions(request):
+    """Return get_data_versions(), computing it at most once per request.
+    """
+    if not hasattr(request, '_data_versions'):
+        request._data_versions = get_data_versions()
+    return request._data_versions
+
+
+def make_cache_key(request, versions):
+    params = sorted(
+        (k, request.GET.getlist(k)) for k in request.GET.keys())
+    key = json.dumps([request.path, params, versions])
+    return 'api-response:%s' % hashlib.sha1(key).hexdigest()
+
+
+def cached_response(func):
+    """A decorator that caches successful responses from an API view until
+    the next time data is imported.  Streaming responses are not cached.
+
+    It should be applied outside any other decorators, so that nothing
+    else runs when a response is found in the cache.
+
+    """
+    @wraps(func)
+    def func_wrapper(request, *args, **kwargs):
+        cache = get_response_cache()
+        if cache is None or request.method != 'GET':
+            return func(request, *args, **kwargs)
+
+        key = make_cache_key(request, get_request_data_versions(request))
+        response = cache.get(key)
+        if response is not None:
+            return response
+
+        response = func(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, 'add_post_render_callback'):
+                # DRF responses are only rendered, in whichever format
+                # was requested, after the view returns.
+                response.add_post_render_callback(
+                    lambda r: _store_response(cache, key, r))
+            else:
+                _store_response(cache, key, response)
+        return response
+    return func_wrapper
+
+
+def _store_response(cache, key, response):
+    # Pages rendered by the browsable API include details of the current
+    # user, so cannot be shared.
+    renderer = getattr(response, 'accepted_renderer', None)
+    if renderer is not None and renderer.format == 'api':
+        return
+    cached = HttpResponse(
+        response.content,
+        content_type=response['Content-Type'],
+        status=response.status_code
+    )
+    for header, value in response.items():
+        # These are set by conditional_api_response for each request,
+        # and depend on the deploy as well as the data
+        if header.lower() in ('etag', 'last-modified'):
+            continue
+        cached[header] = value
+    cache.set(key, cached)
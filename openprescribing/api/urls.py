@@ -1,5 +1,6 @@
 from django.conf.urls import url, include
 from rest_framework.urlpatterns import format_suffix_patterns
+import views_batch
 import views_bnf_codes
 import views_spending
 import views_org_codes
@@ -19,6 +20,10 @@ urlpatterns = [
         name='spending_by_ccg'),
     url(r'^spending_by_practice/$', views_spending.spending_by_practice,
         name='spending_by_practice'),
+    url(r'^spending_ratio/$', views_spending.spending_ratio,
+        name='spending_ratio'),
+    url(r'^spending_ranking/$', views_spending.spending_ranking,
+        name='spending_ranking'),
     url(r'^measure/$', views_measures.measure_global,
         name='measure'),
     url(r'^measure_by_ccg/$', views_measures.measure_by_ccg,
@@ -34,6 +39,7 @@ urlpatterns = [
     url(r'^bnf_code/$', views_bnf_codes.bnf_codes),
     url(r'^org_code/$', views_org_codes.org_codes),
     url(r'^org_location/$', views_org_location.org_location),
+    url(r'^batch/$', views_batch.batch, name='batch'),
     url(r'^docs/', include('rest_framework_swagger.urls')),
 ]
 
@@ -1,29 +1,101 @@
+from contextlib import contextmanager
+import csv
+import datetime
 import itertools
+import threading
+import uuid
+from django.conf import settings
 from django.db import connection
+from django.db import transaction
+from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from functools import wraps
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from query_coalescing import coalesced
+
+# The number of rows fetched from the database, and written to the
+# response, at a time when streaming
+STREAM_BATCH_SIZE = 2000
+
+# Holds the statement timeout set by the innermost `statement_timeout`
+# block being run by this thread
+_local = threading.local()
 
 
 def db_timeout(timeout):
-    """A decorator that applies a timeout to the current database
-    connection.
+    """A decorator that limits each database statement run by a view to
+    `timeout` milliseconds.
 
-    Note this will only work as expected so long as CONN_MAX_AGE is
-    zero.  Otherwise, connection pooling will lead to unexpected
-    timeouts
+    The limit for a view can be overridden by adding its name to the
+    API_STATEMENT_TIMEOUTS setting.  The view is run in a transaction,
+    so that the limit doesn't outlast it on persistent connections (see
+    `statement_timeout`).
 
     """
     def timeout_decorator(func):
         @wraps(func)
         def func_wrapper(*args, **kwargs):
-            from django.db import connection
-            cursor = connection.cursor()
-            cursor.execute("set statement_timeout to %s; commit;" % timeout)
-            return func(*args, **kwargs)
+            budget = getattr(settings, 'API_STATEMENT_TIMEOUTS', {}).get(
+                func.__name__, timeout)
+            with statement_timeout(budget):
+                return func(*args, **kwargs)
         return func_wrapper
     return timeout_decorator
 
 
+@contextmanager
+def statement_timeout(timeout):
+    """A context manager that limits each database statement run within
+    it to `timeout` milliseconds.
+
+    The block is run in a transaction, and the limit is set with SET
+    LOCAL, so it ends with the transaction whether or not the block
+    succeeds.  If the block is nested in another transaction, it gets a
+    savepoint instead; settings made after a savepoint survive its
+    release, so the limit is then reset explicitly.
+
+    """
+    nested = connection.in_atomic_block
+    previous = getattr(_local, 'statement_timeout', None)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SET LOCAL statement_timeout = %s", [int(timeout)])
+        _local.statement_timeout = timeout
+        try:
+            yield
+        finally:
+            _local.statement_timeout = previous
+        if nested:
+            with connection.cursor() as cursor:
+                if previous is None:
+                    cursor.execute("SET LOCAL statement_timeout TO DEFAULT")
+                else:
+                    cursor.execute(
+                        "SET LOCAL statement_timeout = %s", [int(previous)])
+
+
+class DateNotValid(APIException):
+    status_code = 400
+    default_detail = 'The date you provided is not valid'
+
+
+def param_to_date(str):
+    """Return the YYYY-MM-DD date in `str` as a date, or None if `str` is
+    empty.
+    """
+    if not str:
+        return None
+    try:
+        return datetime.datetime.strptime(str, '%Y-%m-%d').date()
+    except ValueError:
+        raise DateNotValid("%s is not a valid date" % str)
+
+
 def param_to_list(str):
     params = []
     if str:
@@ -40,17 +112,193 @@ def dictfetchall(cursor):
     ]
 
 
-def execute_query(query, params):
+def execute_query(query, params, coalesce=False):
+    """Execute `query` and return its rows as dicts.
+    """
+    columns, rows = execute_query_tuples(query, params, coalesce=coalesce)
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def execute_query_tuples(query, params, coalesce=False):
+    """Execute `query` and return a list of its column names, and a list
+    of its rows as tuples, which are much cheaper to build and encode
+    than a dict per row.
+
+    With `coalesce`, identical queries run by other processes at the same
+    time are coalesced (see query_coalescing.py).  This is for expensive
+    queries which many visitors are likely to make at once.
+
+    """
+    params = _flatten_params(params)
+    if not coalesce:
+        return _execute_query(query, params)
+    return coalesced(query, params, lambda: _execute_query(query, params))
+
+
+def _execute_query(query, params):
     cursor = connection.cursor()
-    if isinstance(params, dict):
+    if params is None:
+        cursor.execute(query)
+    else:
         cursor.execute(query, params)
+    columns = [col[0] for col in cursor.description]
+    rows = cursor.fetchall()
+    cursor.close()
+    return columns, rows
+
+
+def rows_response(request, columns, rows):
+    """Return a response holding `rows` (tuples of values for `columns`).
+
+    JSON is encoded here with the C encoder from the standard library,
+    rather than by the JSON renderer, in the same shape: a list of
+    objects.  With orient=split in the query params, it is instead an
+    object with a list of "columns" and a list of "data" arrays, which
+    is much smaller and quicker to encode and parse, and can be read by
+    pandas.read_json(..., orient='split').  Other formats are rendered
+    as usual.
+
+    """
+    if request.accepted_renderer.format != 'json':
+        return Response([dict(zip(columns, row)) for row in rows])
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    if request.query_params.get('orient') == 'split':
+        content = encoder.encode({'columns': columns, 'data': rows})
+    else:
+        content = encoder.encode([dict(zip(columns, row)) for row in rows])
+    if isinstance(content, unicode):
+        content = content.encode('utf-8')
+    return HttpResponse(content, content_type='application/json')
+
+
+def stream_query(query, params, batch_size=STREAM_BATCH_SIZE):
+    """Return a generator which executes `query` with a server-side
+    cursor, and yields its rows as dicts, fetching `batch_size` rows
+    from the database at a time.
+
+    The query is not run until the first row is requested.  Server-side
+    cursors only exist within a transaction, so one is held open until
+    all the rows have been consumed.  Any statement timeout in force
+    when this is called (see `statement_timeout`) applies to the query.
+
+    """
+    timeout = getattr(_local, 'statement_timeout', None)
+    return _stream_query(query, params, batch_size, timeout)
+
+
+def _stream_query(query, params, batch_size, timeout):
+    if timeout is None:
+        block = transaction.atomic()
+    else:
+        block = statement_timeout(timeout)
+    with block:
+        connection.ensure_connection()
+        cursor = connection.connection.cursor(
+            name='stream_%s' % uuid.uuid4().hex)
+        try:
+            params = _flatten_params(params)
+            # This is a psycopg2 cursor, so its errors must be converted
+            # to Django's, as they would be for a Django cursor
+            with connection.wrap_database_errors:
+                if params is None:
+                    cursor.execute(query)
+                else:
+                    cursor.execute(query, params)
+            cols = None
+            while True:
+                with connection.wrap_database_errors:
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if cols is None:
+                    # The description of a server-side cursor is only
+                    # available once rows have been fetched
+                    cols = [col[0] for col in cursor.description]
+                for row in rows:
+                    yield dict(zip(cols, row))
+        finally:
+            cursor.close()
+
+
+def streaming_response(rows, format):
+    """Return a StreamingHttpResponse which writes `rows` (an iterable of
+    dicts, all with the same keys) as CSV or JSON, in the same form as
+    the CSV and JSON renderers, without holding them all in memory.
+
+    """
+    if format == 'csv':
+        content = _stream_csv(rows)
+        content_type = 'text/csv; charset=utf-8'
+    elif format == 'json':
+        content = _stream_json(rows)
+        content_type = 'application/json'
+    else:
+        raise ValueError("Cannot stream %s" % format)
+    return StreamingHttpResponse(content, content_type=content_type)
+
+
+def _flatten_params(params):
+    if isinstance(params, dict):
+        return params
     elif params:
-        cursor.execute(query, tuple(itertools.chain.from_iterable(params)))
+        return tuple(itertools.chain.from_iterable(params))
     else:
-        cursor.execute(query)
-    data = dictfetchall(cursor)
-    cursor.close()
-    return data
+        return None
+
+
+class _Echo(object):
+    """A file-like object for csv.writer which returns what is written,
+    rather than storing it.
+    """
+    def write(self, value):
+        return value
+
+
+def _batches(rows, size=STREAM_BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _stream_csv(rows):
+    writer = csv.writer(_Echo())
+    header = None
+    for batch in _batches(rows):
+        lines = []
+        if header is None:
+            # CSVRenderer sorts the columns by name
+            header = sorted(batch[0].keys())
+            lines.append(writer.writerow(header))
+        for row in batch:
+            lines.append(writer.writerow(
+                [_encode_csv_value(row[col]) for col in header]))
+        yield ''.join(lines)
+
+
+def _encode_csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def _stream_json(rows):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    yield '['
+    first = True
+    for batch in _batches(rows):
+        chunk = ','.join(encoder.encode(row) for row in batch)
+        if not first:
+            chunk = ',' + chunk
+        first = False
+        if isinstance(chunk, unicode):
+            chunk = chunk.encode('utf-8')
+        yield chunk
+    yield ']'
 
 
 def get_practice_ids_from_org(org_codes):
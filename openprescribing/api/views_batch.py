@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.urlresolvers import Resolver404
+from django.core.urlresolvers import resolve
+from django.db import close_old_connections
+from django.http import HttpRequest
+from django.http import QueryDict
+
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class BatchNotValid(APIException):
+    status_code = 400
+    default_detail = 'The batch request is not valid'
+
+
+def _get_executor():
+    """Return the pool of threads which run sub-requests.  Each thread
+    keeps its own database connection between batches.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'API_BATCH_WORKERS', 4))
+    return _executor
+
+
+@api_view(['GET'])
+def batch(request, format=None):
+    """Returns the responses to several requests to other API views, which
+    are given as `q` params (for instance
+    `?q=/api/1.0/spending/?code=0212&q=/api/1.0/measure/`), and are run
+    concurrently.
+
+    Each response is an object with the URL requested, its status code
+    and the JSON it returned, in the order requested.
+
+    The batch itself is neither cached nor conditional, as its parts may
+    have failed, or be of views which aren't (such as org_code).  Parts
+    which are of cached views are each taken from the cache.
+
+    """
+    urls = request.query_params.getlist('q')
+    if not urls:
+        raise BatchNotValid('You must supply at least one q parameter')
+    limit = getattr(settings, 'API_BATCH_MAX_REQUESTS', 20)
+    if len(urls) > limit:
+        raise BatchNotValid(
+            'A batch may contain at most %s requests' % limit)
+
+    futures = [
+        _get_executor().submit(_run_sub_request, request._request, url)
+        for url in urls
+    ]
+    return Response([future.result() for future in futures])
+
+
+def _run_sub_request(request, url):
+    close_old_connections()
+    try:
+        status, data = _get_sub_response(request, url)
+    except Exception:
+        logger.exception('Error in batched request for %s', url)
+        status, data = 500, {'detail': 'Internal error'}
+    finally:
+        close_old_connections()
+    return {'url': url, 'status': status, 'data': data}
+
+
+def _get_sub_response(request, url):
+    path, _, query_string = url.partition('?')
+    prefix = request.path[:request.path.rindex('batch')]
+    if not path.startswith(prefix):
+        return 404, {'detail': 'Not an API URL'}
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return 404, {'detail': 'Not found.'}
+    if match.func is batch:
+        return 400, {'detail': 'Batches cannot be nested'}
+
+    response = match.func(
+        _make_sub_request(request, path, query_string, match),
+        *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    if response.streaming:
+        content = ''.join(response.streaming_content)
+    else:
+        content = response.content
+    return response.status_code, json.loads(content)
+
+
+def _make_sub_request(request, path, query_string, match):
+    """Return a GET request for `path` from the same client as `request`,
+    which always asks for JSON.
+    """
+    params = QueryDict(query_string, mutable=True)
+    params['format'] = 'json'
+    sub_request = HttpRequest()
+    sub_request.method = 'GET'
+    sub_request.path = sub_request.path_info = path
+    sub_request.GET = params
+    sub_request.COOKIES = request.COOKIES
+    sub_request.META = dict(
+        request.META,
+        PATH_INFO=path,
+        QUERY_STRING=params.urlencode(),
+        REQUEST_METHOD='GET')
+    # Conditional headers apply to the batch, not to its parts
+    sub_request.META.pop('HTTP_IF_NONE_MATCH', None)
+    sub_request.META.pop('HTTP_IF_MODIFIED_SINCE', None)
+    sub_request.resolver_match = match
+    for attr in ['user', 'session']:
+        if hasattr(request, attr):
+            setattr(sub_request, attr, getattr(request, attr))
+    return sub_request
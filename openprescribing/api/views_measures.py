@@ -1,5 +1,7 @@
 from dateutil.relativedelta import relativedelta
 
+from django.http import HttpResponse
+
 from rest_framework.decorators import api_view
 from rest_framework.exceptions import APIException
 from rest_framework.response import Response
@@ -7,8 +9,15 @@ from rest_framework.response import Response
 from frontend.models import ImportLog
 from frontend.models import Measure
 from frontend.models import MeasureGlobal
-from frontend.models import MeasureValue
-
+from frontend.models import MeasureSeries
+
+from conditional import conditional_api_response
+from measure_payloads import get_measure_payload
+from measure_payloads import measure_value_data
+from measure_payloads import roll_up_measure_values
+from measure_payloads import series_measure_values
+from renderers import COLUMNAR_FORMATS
+from response_cache import cached_response
 import view_utils as utils
 
 
@@ -17,6 +26,8 @@ class MissingParameter(APIException):
     default_detail = 'You are missing a required parameter.'
 
 
+@conditional_api_response
+@cached_response
 @api_view(['GET'])
 def measure_global(request, format=None):
     measure = request.query_params.get('measure', None)
@@ -69,6 +80,8 @@ def measure_global(request, format=None):
     return Response(d)
 
 
+@conditional_api_response
+@cached_response
 @api_view(['GET'])
 def measure_numerators_by_org(request, format=None):
     measure = request.query_params.get('measure', None)
@@ -158,21 +171,33 @@ def measure_numerators_by_org(request, format=None):
     return response
 
 
+@conditional_api_response
+@cached_response
 @api_view(['GET'])
 def measure_by_ccg(request, format=None):
     measure_id = request.query_params.get('measure', None)
     org_ids = utils.param_to_list(request.query_params.get('org', []))
     tags = [x for x in request.query_params.get('tags', '').split(',') if x]
+    since = utils.param_to_date(request.query_params.get('since'))
 
-    rolled = {}
-    measure_values = MeasureValue.objects.by_ccg(org_ids, measure_id, tags)
+    response = _pre_rendered_response(
+        request, 'ccg', org_ids, measure_id, tags, since)
+    if response is not None:
+        return response
 
+    measure_values = series_measure_values(
+        MeasureSeries.objects.by_ccg(org_ids, measure_id, tags), since)
+
+    if request.accepted_renderer.format in COLUMNAR_FORMATS:
+        return Response(_measure_value_rows(measure_values, 'ccg'))
     rsp_data = {
-        'measures': _roll_up_measure_values(measure_values, 'ccg')
+        'measures': roll_up_measure_values(measure_values, 'ccg')
     }
     return Response(rsp_data)
 
 
+@conditional_api_response
+@cached_response
 @api_view(['GET'])
 def measure_by_practice(request, format=None):
     measure_id = request.query_params.get('measure', None)
@@ -180,60 +205,47 @@ def measure_by_practice(request, format=None):
     if not org_ids:
         raise MissingParameter
     tags = [x for x in request.query_params.get('tags', '').split(',') if x]
+    since = utils.param_to_date(request.query_params.get('since'))
+
+    response = _pre_rendered_response(
+        request, 'practice', org_ids, measure_id, tags, since)
+    if response is not None:
+        return response
 
-    measure_values = MeasureValue.objects.by_practice(org_ids, measure_id,
-                                                      tags)
+    measure_values = series_measure_values(
+        MeasureSeries.objects.by_practice(org_ids, measure_id, tags), since)
 
+    if request.accepted_renderer.format in COLUMNAR_FORMATS:
+        return Response(_measure_value_rows(measure_values, 'practice'))
     rsp_data = {
-        'measures': _roll_up_measure_values(measure_values, 'practice')
+        'measures': roll_up_measure_values(measure_values, 'practice')
     }
     return Response(rsp_data)
 
 
-def _roll_up_measure_values(measure_values, practice_or_ccg):
-    rolled = {}
-
+def _measure_value_rows(measure_values, practice_or_ccg):
+    """Return one row for each measure value, for columnar formats, which
+    can't hold the nested structure of the JSON response.
+    """
+    rows = []
     for measure_value in measure_values:
-        measure = measure_value.measure
-        measure_id = measure.id
-        measure_value_data = {
-            'date': measure_value.month,
-            'numerator': measure_value.numerator,
-            'denominator': measure_value.denominator,
-            'calc_value': measure_value.calc_value,
-            'percentile': measure_value.percentile,
-            'cost_savings': measure_value.cost_savings,
-        }
-
-        if practice_or_ccg == 'practice':
-            measure_value_data.update({
-                'practice_id': measure_value.practice_id,
-                'practice_name': measure_value.practice.name,
-            })
-        elif practice_or_ccg == 'ccg':
-            measure_value_data.update({
-                'pct_id': measure_value.pct_id,
-                'pct_name': measure_value.pct.name,
-            })
-        else:
-            assert False
-
-        if measure_id in rolled:
-            rolled[measure_id]['data'].append(measure_value_data)
-        else:
-            rolled[measure_id] = {
-                'id': measure_id,
-                'name': measure.name,
-                'title': measure.title,
-                'description': measure.description,
-                'why_it_matters': measure.why_it_matters,
-                'numerator_short': measure.numerator_short,
-                'denominator_short': measure.denominator_short,
-                'url': measure.url,
-                'is_cost_based': measure.is_cost_based,
-                'is_percentage': measure.is_percentage,
-                'low_is_good': measure.low_is_good,
-                'data': [measure_value_data],
-            }
-
-    return rolled.values()
+        row = measure_value_data(measure_value, practice_or_ccg)
+        row['measure'] = measure_value.measure_id
+        rows.append(row)
+    return rows
+
+
+def _pre_rendered_response(request, org_type, org_ids, measure_id, tags,
+                           since):
+    """Return the response written by import_measures for a request for a
+    single org and at most one tag, if there is one.
+    """
+    if request.accepted_renderer.format != 'json':
+        return None
+    if measure_id or since or len(org_ids) != 1 or len(tags) > 1:
+        return None
+    content = get_measure_payload(
+        org_type, org_ids[0], tags[0] if tags else '')
+    if content is None:
+        return None
+    return HttpResponse(content, content_type='application/json')
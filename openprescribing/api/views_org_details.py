@@ -2,6 +2,9 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.exceptions import APIException
 from django.db.utils import ProgrammingError
+from conditional import conditional_api_response
+from query_builder import Conditions, any_of
+from response_cache import cached_response
 import view_utils as utils
 
 STATS_COLUMN_WHITELIST = (
@@ -17,6 +20,8 @@ class KeysNotValid(APIException):
     default_detail = 'The keys you provided are not supported'
 
 
+@conditional_api_response
+@cached_response
 @api_view(['GET'])
 def org_details(request, format=None):
     '''
@@ -25,35 +30,37 @@ def org_details(request, format=None):
     org_type = request.GET.get('org_type', None)
     keys = utils.param_to_list(request.query_params.get('keys', []))
     orgs = utils.param_to_list(request.query_params.get('org', []))
+    since = utils.param_to_date(request.query_params.get('since'))
     cols = []
+    conditions = Conditions()
     if org_type == 'practice':
         cols, query = _construct_cols(keys, True)
         query += " FROM frontend_practicestatistics pr "
         query += "JOIN frontend_practice pc ON pr.practice_id=pc.code "
         if orgs:
-            query += "WHERE "
-            for i, c in enumerate(orgs):
-                if len(c) == 3:
-                    query += 'pc.ccg_id=%s '
-                else:
-                    query += "pr.practice_id=%s "
-                if (i != len(orgs) - 1):
-                    query += ' OR '
+            # orgs may be a mixture of CCG and practice codes
+            conditions.add(
+                '%s OR %s' % (any_of('pc.ccg_id'), any_of('pr.practice_id')),
+                [org for org in orgs if len(org) == 3],
+                [org for org in orgs if len(org) != 3])
+        if since:
+            conditions.add('pr.date >= %s', since)
+        query += conditions.to_sql()
         query += "ORDER BY date, row_id"
     elif org_type == 'ccg':
         cols, query = _construct_cols(keys, False)
         query += ' FROM vw__ccgstatistics '
         if orgs:
-            query += "WHERE ("
-            for i, c in enumerate(orgs):
-                query += "pct_id=%s "
-                if (i != len(orgs) - 1):
-                    query += ' OR '
-            query += ') '
+            conditions.add_any('pct_id', orgs)
+        if since:
+            conditions.add('date >= %s', since)
+        query += conditions.to_sql()
         query += 'ORDER BY date'
     else:
         # Total across NHS England.
         json_query, cols = _query_and_cols_for(keys, json_builder_only=True)
+        if since:
+            conditions.add('date >= %s', since)
         query = 'SELECT date, '
         query += 'AVG(total_list_size) AS total_list_size, '
         query += 'AVG(astro_pu_items) AS astro_pu_items, '
@@ -71,14 +78,12 @@ def org_details(request, format=None):
         else:
             query += 'star_pu'
         query += ") "
+        query += conditions.to_sql()
         query += 'GROUP BY date, key '
         query += ') p '
         query += 'GROUP BY date ORDER BY date'
     try:
-        if cols:
-            data = utils.execute_query(query, [cols, orgs])
-        else:
-            data = utils.execute_query(query, [orgs])
+        data = utils.execute_query(query, [cols, conditions.params])
     except ProgrammingError as e:
         error = str(e)
         if keys and 'does not exist' in error:
@@ -13,13 +13,16 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.exceptions import APIException
 
-from common.utils import namedtuplefetchall, nhs_titlecase
-from dmd.models import DMDProduct, DMDVmpp, NCSOConcession
+from common.utils import namedtuplefetchall
+from frontend.models import DenormalisedPPUSaving
 from frontend.models import GenericCodeMapping
 from frontend.models import ImportLog
-from frontend.models import PPUSaving
 from frontend.models import Presentation
 from frontend.models import Practice, PCT
+from conditional import conditional_api_response
+from query_builder import Conditions, any_of
+from renderers import COLUMNAR_FORMATS
+from response_cache import cached_response
 import view_utils as utils
 from view_utils import db_timeout
 
@@ -33,6 +36,33 @@ CODE_LENGTH_ERROR = (
     'class="doorbell-show">get in touch</a> and we may be able to extract it '
     'for you')
 
+# The lengths of BNF code prefixes that are pre-aggregated in
+# vw__bnf_prefix_summary: chapter, section, paragraph, sub-paragraph,
+# chemical, product and presentation.
+BNF_PREFIX_LENGTHS = (2, 4, 6, 8, 9, 11, 15)
+
+# The columns of spending which may be divided by one of the list size
+# statistics, which are held under the same names for CCGs and practices
+RATIO_NUMERATORS = ('items', 'actual_cost', 'quantity')
+RATIO_DENOMINATORS = ('total_list_size', 'astro_pu_items', 'astro_pu_cost')
+RATIO_PERCENTILES = (10, 20, 30, 40, 50, 60, 70, 80, 90)
+
+# The measures by which practices' spending on a chemical per 1,000
+# patients is ranked in vw__chemical_ranking_by_practice, and the most
+# practices which may be returned from it at once
+RANKING_MEASURES = ('items', 'cost')
+RANKING_MAX_ROWS = 100
+
+# SQL for the first day of the period containing a month, for each period
+# over which spending can be summed.  NHS financial years start in April.
+PERIOD_STARTS = {
+    'quarter': "date_trunc('quarter', %s)::date",
+    'year': "date_trunc('year', %s)::date",
+    'financial_year': (
+        "(date_trunc('year', %s - interval '3 months') "
+        "+ interval '3 months')::date"),
+}
+
 
 class NotValid(APIException):
     status_code = 400
@@ -50,7 +80,7 @@ def _valid_or_latest_date(date):
     return date
 
 
-def _build_conditions_and_patterns(code, focus):
+def _build_patterns(code):
     if not re.match(r'[A-Z0-9]{15}', code):
         raise NotValid("%s is not a valid code" % code)
     extra_codes = GenericCodeMapping.objects.filter(
@@ -65,17 +95,31 @@ def _build_conditions_and_patterns(code, focus):
         else:
             pattern = "%s____%s" % (extra_code[:9], extra_code[13:15])
         patterns.append(pattern)
-    conditions = " OR ".join(["presentation_code LIKE %s "] * len(patterns))
-    conditions = "AND (%s) " % conditions
-    if focus:
-        if len(focus) == 3:
-            conditions += "AND (pct_id = %s)"
-        else:
-            conditions += "AND (practice_id = %s)"
-        patterns.append(focus)
-    return conditions, patterns
+    return patterns
+
 
+def _build_ppu_bin_conditions(date, patterns, entity_code):
+    """Return conditions selecting the PPUBins for presentations matching
+    `patterns` in the given month, for the CCG or practice identified by
+    `entity_code`, or for England if `entity_code` is None.
 
+    """
+    conditions = Conditions()
+    conditions.add('frontend_ppubin.date = %s', date)
+    conditions.add_like_any('frontend_ppubin.presentation_code', patterns)
+    if entity_code is None:
+        conditions.add('frontend_ppubin.pct_id IS NULL')
+        conditions.add('frontend_ppubin.practice_id IS NULL')
+    elif len(entity_code) == 3:
+        conditions.add('frontend_ppubin.pct_id = %s', entity_code)
+        conditions.add('frontend_ppubin.practice_id IS NULL')
+    else:
+        conditions.add('frontend_ppubin.practice_id = %s', entity_code)
+    return conditions
+
+
+@conditional_api_response
+@cached_response
 @api_view(['GET'])
 def bubble(request, format=None):
     """Returns data relating to price-per-unit, in a format suitable for
@@ -86,68 +130,59 @@ def bubble(request, format=None):
     trim = request.query_params.get('trim', '')
     date = _valid_or_latest_date(request.query_params.get('date', None))
     highlight = request.query_params.get('highlight', None)
-    focus = request.query_params.get('focus', None) and highlight
-    conditions, patterns = _build_conditions_and_patterns(code, focus)
-    rounded_ppus_cte_sql = (
-        "WITH rounded_ppus AS (SELECT presentation_code, "
+    focus = request.query_params.get('focus', None) and highlight or None
+    patterns = _build_patterns(code)
+    conditions = _build_ppu_bin_conditions(date, patterns, focus)
+    binned_ppus_sql = (
+        "WITH binned_ppus AS (SELECT presentation_code, "
         "COALESCE(frontend_presentation.name, 'unknown') "
         "AS presentation_name, "
-        "quantity, net_cost, practice_id, pct_id, "
-        "ROUND(CAST(net_cost/NULLIF(quantity, 0) AS numeric), 2) AS ppu "
-        "FROM frontend_prescription "
+        "price_per_unit AS ppu, quantity, "
+        "AVG(price_per_unit) OVER ("
+        " PARTITION BY presentation_code) AS mean_ppu "
+        "FROM frontend_ppubin "
         "LEFT JOIN frontend_presentation "
-        "ON frontend_prescription.presentation_code = "
-        "frontend_presentation.bnf_code "
-        "LEFT JOIN frontend_practice ON frontend_practice.code = practice_id "
-        "WHERE processing_date = %s "
-        "AND setting = 4 " +
-        conditions +
+        "ON frontend_ppubin.presentation_code = "
+        "frontend_presentation.bnf_code " +
+        conditions.to_sql() +
         ") "
     )
-    binned_ppus_sql = rounded_ppus_cte_sql + (
-        ", binned_ppus AS (SELECT presentation_code, presentation_name, ppu, "
-        "SUM(quantity) AS quantity "
-        "FROM rounded_ppus "
-        "GROUP BY presentation_code, presentation_name, ppu) "
-    )
+    params = conditions.params
     if trim:
-        # Skip items where PPU is outside <trim> percentile (where
-        # <trim> is out of 100)
-        trim = float(trim)
-        out_of = 100
-        while trim % 1 != 0:
-            trim = trim * 10
-            out_of = out_of * 10
+        # Skip the most expensive items, keeping those bins which
+        # start within the cheapest <trim> percent (where <trim> is out
+        # of 100) of the total quantity prescribed
         ordered_ppus_sql = binned_ppus_sql + (
             "SELECT * FROM ("
             " SELECT *, "
-            " AVG(ppu) OVER ("
-            "  PARTITION BY presentation_code) AS mean_ppu, "
-            " NTILE(%s) OVER (ORDER BY ppu) AS ntiled "
-            " FROM binned_ppus "
-            " ORDER BY mean_ppu, presentation_name) ranked "
-            "WHERE ntiled <= %s" % (out_of, trim)
+            " SUM(quantity) OVER ("
+            "  ORDER BY ppu, presentation_code) AS cumulative_quantity, "
+            " SUM(quantity) OVER () AS total_quantity "
+            " FROM binned_ppus) cumulative "
+            "WHERE cumulative_quantity - quantity < %s * total_quantity "
+            "ORDER BY mean_ppu, presentation_name, ppu"
         )
+        params = params + [float(trim) / 100]
     else:
-
         ordered_ppus_sql = binned_ppus_sql + (
-            "SELECT *, "
-            "AVG(ppu) OVER (PARTITION BY presentation_code) AS mean_ppu "
-            "FROM binned_ppus "
+            "SELECT * FROM binned_ppus "
             "ORDER BY mean_ppu, presentation_name, ppu"
         )
-    mean_ppu_for_entity_sql = rounded_ppus_cte_sql + (
-        "SELECT SUM(net_cost)/SUM(quantity) FROM rounded_ppus "
+    plotline_conditions = _build_ppu_bin_conditions(
+        date, patterns, highlight)
+    mean_ppu_for_entity_sql = (
+        "SELECT SUM(net_cost)/NULLIF(SUM(quantity), 0) "
+        "FROM frontend_ppubin " +
+        plotline_conditions.to_sql()
     )
-    params = [date] + patterns
     with connection.cursor() as cursor:
         cursor.execute(ordered_ppus_sql, params)
         series = []
         categories = []
-        pos = 0
+        positions = {}
         for result in namedtuplefetchall(cursor):
-            if result.presentation_name not in [x['name'] for x in categories]:
-                pos += 1
+            if result.presentation_name not in positions:
+                positions[result.presentation_name] = len(categories) + 1
                 is_generic = False
                 if result.presentation_code[9:11] == 'AA':
                     is_generic = True
@@ -159,23 +194,20 @@ def bubble(request, format=None):
                 )
 
             series.append({
-                'x': pos,
+                'x': positions[result.presentation_name],
                 'y': result.ppu,
                 'z': result.quantity,
                 'mean_ppu': result.mean_ppu,
                 'name': result.presentation_name})
-        if highlight:
-            params.append(highlight)
-            if len(highlight) == 3:
-                mean_ppu_for_entity_sql += "WHERE pct_id = %s "
-            else:
-                mean_ppu_for_entity_sql += "WHERE practice_id = %s "
-        cursor.execute(mean_ppu_for_entity_sql, params)
+        cursor.execute(
+            mean_ppu_for_entity_sql, plotline_conditions.params)
         plotline = cursor.fetchone()[0]
         return Response(
             {'plotline': plotline, 'series': series, 'categories': categories})
 
 
+@conditional_api_response
+@cached_response
 @api_view(['GET'])
 def price_per_unit(request, format=None):
     """Returns price per unit data for presentations and practices or
@@ -209,108 +241,91 @@ def price_per_unit(request, format=None):
             practice_level = True
         filename += "-%s" % entity_code
 
-    # We cannot use the ORM here since there is no ForeignKey from PPUSaving to
-    # DMDProduct.
     sql = '''
-    SELECT DISTINCT ON (
-            {dmdproduct_table}.bnf_code,
-            {ppusavings_table}.pct_id,
-            {ppusavings_table}.practice_id
-        )
-        {ppusavings_table}.id AS id,
-        {ppusavings_table}.date AS date,
-        {ppusavings_table}.lowest_decile AS lowest_decile,
-        {ppusavings_table}.quantity AS quantity,
-        {ppusavings_table}.price_per_unit AS price_per_unit,
-        {ppusavings_table}.possible_savings AS possible_savings,
-        {ppusavings_table}.formulation_swap AS formulation_swap,
-        {ppusavings_table}.pct_id AS pct,
-        {ppusavings_table}.practice_id AS practice,
-        {ppusavings_table}.bnf_code AS presentation,
-        {practice_table}.name AS practice_name,
-        {dmdproduct_table}.flag_non_bioequivalence AS flag_bioequivalence,
-        subquery.price_concession IS NOT NULL as price_concession,
-        COALESCE({dmdproduct_table}.name, {presentation_table}.name) AS name
-    FROM {ppusavings_table}
-    LEFT OUTER JOIN {presentation_table}
-        ON {ppusavings_table}.bnf_code = {presentation_table}.bnf_code
-    LEFT OUTER JOIN {practice_table}
-        ON {ppusavings_table}.practice_id = {practice_table}.code
-    LEFT OUTER JOIN {dmdproduct_table}
-        ON {ppusavings_table}.bnf_code = {dmdproduct_table}.bnf_code
-    LEFT OUTER JOIN (SELECT DISTINCT vpid, 1 AS price_concession
-                     FROM {dmdvmpp_table}
-                     INNER JOIN {ncsoconcession_table}
-                         ON {dmdvmpp_table}.vppid = {ncsoconcession_table}.vmpp_id
-                     WHERE {ncsoconcession_table}.date = %(date)s) AS subquery
-        ON {dmdproduct_table}.vpid = subquery.vpid
+    SELECT
+        saving_id AS id,
+        date,
+        lowest_decile,
+        quantity,
+        price_per_unit,
+        possible_savings,
+        formulation_swap,
+        pct_id AS pct,
+        practice_id AS practice,
+        bnf_code AS presentation,
+        practice_name,
+        flag_bioequivalence,
+        price_concession,
+        name
+    FROM {denormalisedppusaving_table}
     WHERE
-        {ppusavings_table}.date = %(date)s
-        AND {dmdproduct_table}.concept_class = 1'''
+        date = %(date)s'''
 
     if bnf_code:
         sql += '''
-        AND {ppusavings_table}.bnf_code = %(bnf_code)s'''
+        AND bnf_code = %(bnf_code)s'''
 
     if entity_code:
         if practice_level:
             sql += '''
-        AND {ppusavings_table}.practice_id = %(entity_code)s'''
+        AND practice_id = %(entity_code)s'''
         else:
             sql += '''
-        AND {ppusavings_table}.pct_id = %(entity_code)s'''
+        AND pct_id = %(entity_code)s'''
 
             if bnf_code:
                 sql += '''
-        AND {ppusavings_table}.practice_id IS NOT NULL'''
+        AND practice_id IS NOT NULL'''
             else:
                 sql += '''
-        AND {ppusavings_table}.practice_id IS NULL'''
+        AND practice_id IS NULL'''
 
     sql = sql.format(
-        ppusavings_table=PPUSaving._meta.db_table,
-        practice_table=Practice._meta.db_table,
-        presentation_table=Presentation._meta.db_table,
-        dmdproduct_table=DMDProduct._meta.db_table,
-        dmdvmpp_table=DMDVmpp._meta.db_table,
-        ncsoconcession_table=NCSOConcession._meta.db_table,
-    )
+        denormalisedppusaving_table=DenormalisedPPUSaving._meta.db_table)
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql, params)
-        results = utils.dictfetchall(cursor)
-
-    for result in results:
-        if result['practice_name'] is not None:
-            result['practice_name'] = nhs_titlecase(result['practice_name'])
-
-    response = Response(results)
+    columns, rows = utils.execute_query_tuples(sql, params)
+    response = utils.rows_response(request, columns, rows)
     if request.accepted_renderer.format == 'csv':
         filename = "%s-ppd.csv" % (filename)
         response['content-disposition'] = "attachment; filename=%s" % filename
     return response
 
 
+@conditional_api_response
+@cached_response
 @db_timeout(58000)
 @api_view(['GET'])
 def total_spending(request, format=None):
     codes = utils.param_to_list(request.query_params.get('code', []))
     codes = utils.get_bnf_codes_from_number_str(codes)
+    since = utils.param_to_date(request.query_params.get('since'))
+    period = _valid_period(request.query_params.get('period'))
 
     spending_type = utils.get_spending_type(codes)
     if spending_type is False:
         err = CODE_LENGTH_ERROR
         return Response(err, status=400)
 
-    query = _get_query_for_total_spending(codes)
-
-    if spending_type != 'presentation':
-        codes = [c + '%' for c in codes]
+    if all(len(c) in BNF_PREFIX_LENGTHS for c in codes):
+        # Every code is at a level of the BNF hierarchy that has been
+        # pre-aggregated, so we can look up one row per code per month.
+        # Duplicate codes would otherwise be counted twice.
+        codes = sorted(set(codes))
+        query, params = _get_query_for_total_spending(codes, since)
+    else:
+        if spending_type != 'presentation':
+            codes = [c + '%' for c in codes]
+        query, params = _get_query_for_total_spending_by_pattern(
+            codes, since)
+    if period:
+        query = _get_query_for_period(query, period, [])
 
-    data = utils.execute_query(query, [codes])
-    return Response(data)
+    columns, rows = utils.execute_query_tuples(query, [params])
+    return utils.rows_response(request, columns, rows)
 
 
+@conditional_api_response
+@cached_response
 @api_view(['GET'])
 def tariff(request, format=None):
     # This view uses raw SQL as we cannot produce the LEFT OUTER JOIN using the
@@ -336,50 +351,51 @@ def tariff(request, format=None):
                 AND dmd_tariffprice.vmpp_id = dmd_ncsoconcession.vmpp_id)
     '''
 
+    conditions = Conditions()
     if codes:
-        query += ' WHERE dmd_product.bnf_code IN ('
-        query += ','.join('%s' for _ in range(len(codes)))
-        query += ')'
-        params = [codes]
-    else:
-        params = None
+        conditions.add_any('dmd_product.bnf_code', codes)
+    query += conditions.to_sql()
 
     query += ' ORDER BY date'
 
-    data = utils.execute_query(query, params)
-    response = Response(data)
+    columns, rows = utils.execute_query_tuples(query, [conditions.params])
+    response = utils.rows_response(request, columns, rows)
     if request.accepted_renderer.format == 'csv':
         filename = "tariff.csv"
         response['content-disposition'] = "attachment; filename=%s" % filename
     return response
 
 
+@conditional_api_response
+@cached_response
 @db_timeout(58000)
 @api_view(['GET'])
 def spending_by_ccg(request, format=None):
     codes = utils.param_to_list(request.query_params.get('code', []))
     codes = utils.get_bnf_codes_from_number_str(codes)
     orgs = utils.param_to_list(request.query_params.get('org', []))
+    since = utils.param_to_date(request.query_params.get('since'))
+    period = _valid_period(request.query_params.get('period'))
 
     spending_type = utils.get_spending_type(codes)
     if spending_type is False:
         err = CODE_LENGTH_ERROR
         return Response(err, status=400)
 
-    if not spending_type or spending_type == 'bnf-section' \
-       or spending_type == 'chemical':
-        query = _get_query_for_chemicals_or_sections_by_ccg(codes, orgs,
-                                                            spending_type)
-    else:
-        query = _get_query_for_presentations_by_ccg(codes, orgs)
-
-    if spending_type == 'bnf-section' or spending_type == 'product':
-        codes = [c + '%' for c in codes]
-
-    data = utils.execute_query(query, [codes, orgs])
-    return Response(data)
+    query, params = _get_query_for_spending_by_ccg(
+        codes, orgs, spending_type, since)
+    if period:
+        query = _get_query_for_period(
+            query, period, ['row_id', 'row_name'])
+    # Dashboards linked to from newsletters send many identical requests
+    # for this at once
+    columns, rows = utils.execute_query_tuples(
+        query, [params], coalesce=True)
+    return utils.rows_response(request, columns, rows)
 
 
+@conditional_api_response
+@cached_response
 @db_timeout(58000)
 @api_view(['GET'])
 def spending_by_practice(request, format=None):
@@ -387,13 +403,13 @@ def spending_by_practice(request, format=None):
     codes = utils.get_bnf_codes_from_number_str(codes)
     orgs = utils.param_to_list(request.query_params.get('org', []))
     date = request.query_params.get('date', None)
+    since = utils.param_to_date(request.query_params.get('since'))
+    period = _valid_period(request.query_params.get('period'))
 
     spending_type = utils.get_spending_type(codes)
     if spending_type is False:
         err = 'Error: Codes must all be the same length'
         return Response(err, status=400)
-    if spending_type == 'bnf-section' or spending_type == 'product':
-        codes = [c + '%' for c in codes]
 
     if not date and not orgs:
         err = 'Error: You must supply either '
@@ -401,33 +417,237 @@ def spending_by_practice(request, format=None):
         err += 'date=2015-04-01'
         return Response(err, status=400)
 
-    org_for_param = None
+    query, params = _get_query_for_spending_by_practice(
+        codes, orgs, spending_type, date, since)
+    if period:
+        query = _get_query_for_period(
+            query, period, ['row_id', 'row_name', 'setting', 'ccg'])
+    format = request.accepted_renderer.format
+    if format in ['csv', 'json']:
+        # Downloads for every practice can run to hundreds of thousands
+        # of rows, so are written out as they are read from the database
+        rows = utils.stream_query(query, [params])
+        return utils.streaming_response(rows, format)
+    if format in COLUMNAR_FORMATS:
+        # The renderer builds its columns as it reads the rows
+        return Response(utils.stream_query(query, [params]))
+    data = utils.execute_query(query, [params])
+    return Response(data)
+
+
+@conditional_api_response
+@cached_response
+@db_timeout(58000)
+@api_view(['GET'])
+def spending_ratio(request, format=None):
+    """Returns the ratio of spending on the given BNF codes to a
+    denominator from the list size statistics, by month, for CCGs or
+    practices (for instance, items per patient).
+
+    With `percentiles=1` (or `percentiles=true`), returns the 10th to 90th
+    percentiles of the ratio across all the matching organisations by
+    month instead.
+
+    """
+    codes = utils.param_to_list(request.query_params.get('code', []))
+    codes = utils.get_bnf_codes_from_number_str(codes)
+    orgs = utils.param_to_list(request.query_params.get('org', []))
+    org_type = request.query_params.get('org_type', 'ccg')
+    date = request.query_params.get('date', None)
+    since = utils.param_to_date(request.query_params.get('since'))
+    numerator = request.query_params.get('num', 'items')
+    denominator = request.query_params.get('denom', 'total_list_size')
+    percentiles = request.query_params.get('percentiles') in ('1', 'true')
+
+    spending_type = utils.get_spending_type(codes)
+    if spending_type is False:
+        err = CODE_LENGTH_ERROR
+        return Response(err, status=400)
+    if numerator not in RATIO_NUMERATORS:
+        raise NotValid("%s is not a valid numerator" % numerator)
+
+    if org_type == 'ccg':
+        num_query, num_params = _get_query_for_spending_by_ccg(
+            codes, orgs, spending_type, since)
+        stats_table = 'vw__ccgstatistics'
+        stats_org = 'pct_id'
+    elif org_type == 'practice':
+        if not date and not orgs:
+            err = 'Error: You must supply either '
+            err += 'a list of practice IDs or a date parameter, e.g. '
+            err += 'date=2015-04-01'
+            return Response(err, status=400)
+        num_query, num_params = _get_query_for_spending_by_practice(
+            codes, orgs, spending_type, date, since)
+        stats_table = 'frontend_practicestatistics'
+        stats_org = 'practice_id'
+    else:
+        raise NotValid("%s is not a valid org_type" % org_type)
+
+    denom_sql, denom_params = _get_ratio_denominator(denominator)
+    # The numerator is cast so that counts are not divided as integers
+    query = 'WITH num AS (%s) ' % num_query
+    query += 'SELECT num.row_id, num.row_name, num.date, '
+    query += 'CAST(num.%s AS double precision) ' % numerator
+    query += '/ NULLIF(%s, 0) AS ratio ' % denom_sql
+    query += 'FROM num '
+    query += 'JOIN %s st ON st.%s = num.row_id ' % (stats_table, stats_org)
+    query += 'AND st.date = num.date '
+    query += 'ORDER BY num.date, num.row_id'
+    if percentiles:
+        query = _get_ratio_percentiles_query(query)
+
+    columns, rows = utils.execute_query_tuples(
+        query, [num_params, denom_params])
+    return utils.rows_response(request, columns, rows)
+
+
+@conditional_api_response
+@cached_response
+@api_view(['GET'])
+def spending_ranking(request, format=None):
+    """Returns the `n` practices which prescribed the most (or with
+    `order=bottom`, the least) of a chemical per 1,000 patients in a
+    month, with their rank and percentile among all practices which
+    prescribed it that month.
+
+    Ranks are precomputed for the last few months by `create_views`.
+
+    """
+    code = request.query_params.get('code', '')
+    date = _valid_or_latest_date(request.query_params.get('date', None))
+    measure = request.query_params.get('measure', 'items')
+    order = request.query_params.get('order', 'top')
+    try:
+        n = int(request.query_params.get('n', 20))
+    except ValueError:
+        raise NotValid("n must be a number")
+
+    if utils.get_spending_type([code]) != 'chemical':
+        raise NotValid("%s is not a chemical code" % code)
+    if measure not in RANKING_MEASURES:
+        raise NotValid("%s is not a valid measure" % measure)
+    if order not in ('top', 'bottom'):
+        raise NotValid("%s is not a valid order" % order)
+    if not 0 < n <= RANKING_MAX_ROWS:
+        raise NotValid("n must be between 1 and %s" % RANKING_MAX_ROWS)
+
+    conditions = Conditions()
+    conditions.add('r.chemical_id = %s', code)
+    conditions.add('r.processing_date = %s', date)
+    query = 'SELECT r.practice_id AS row_id, '
+    query += 'pc.name AS row_name, '
+    query += 'r.pct_id AS ccg, '
+    query += 'r.processing_date AS date, '
+    query += 'r.cost AS actual_cost, '
+    query += 'r.items AS items, '
+    query += 'r.quantity AS quantity, '
+    query += 'r.total_list_size AS total_list_size, '
+    query += 'r.{0}_per_1000 AS {0}_per_1000, '.format(measure)
+    query += 'r.{0}_per_1000_rank AS rank, '.format(measure)
+    query += 'r.{0}_per_1000_percentile AS percentile, '.format(measure)
+    query += 'r.practice_count AS practice_count '
+    query += 'FROM vw__chemical_ranking_by_practice r '
+    query += 'JOIN frontend_practice pc ON r.practice_id=pc.code '
+    query += conditions.to_sql()
+    query += 'ORDER BY r.{0}_per_1000_rank {1}, r.practice_id '.format(
+        measure, 'DESC' if order == 'bottom' else 'ASC')
+    query += 'LIMIT %s'
+
+    columns, rows = utils.execute_query_tuples(
+        query, [conditions.params, [n]])
+    return utils.rows_response(request, columns, rows)
+
+
+def _valid_period(period):
+    if period and period != 'month' and period not in PERIOD_STARTS:
+        raise NotValid("%s is not a valid period" % period)
+    if period == 'month':
+        return None
+    return period
+
+
+def _get_query_for_period(query, period, columns):
+    """Wrap `query`, which returns monthly spending, so that it returns
+    spending summed over each `period` instead, dated by the start of
+    the period, and grouped by the other `columns`.
+
+    The monthly summary tables hold at most one row per organisation
+    and code per month, so this sums at most twelve rows into each one
+    returned.
+
+    """
+    group_by = ''.join('m.%s, ' % column for column in columns)
+    period_start = PERIOD_STARTS[period] % 'm.date'
+    period_query = 'SELECT %s%s AS date, ' % (group_by, period_start)
+    period_query += 'SUM(m.actual_cost) AS actual_cost, '
+    period_query += 'CAST(SUM(m.items) AS bigint) AS items, '
+    period_query += 'CAST(SUM(m.quantity) AS bigint) AS quantity '
+    period_query += 'FROM (%s) m ' % query
+    period_query += 'GROUP BY %s%s ' % (group_by, period_start)
+    period_query += 'ORDER BY date'
+    if columns:
+        period_query += ', m.%s' % columns[0]
+    return period_query
+
+
+def _get_ratio_denominator(denominator):
+    if denominator.startswith('star_pu.'):
+        return ('CAST(st.star_pu->>%s AS double precision)',
+                [denominator[len('star_pu.'):]])
+    if denominator in RATIO_DENOMINATORS:
+        return 'st.%s' % denominator, []
+    raise NotValid("%s is not a valid denominator" % denominator)
+
+
+def _get_ratio_percentiles_query(ratio_query):
+    query = 'SELECT date, '
+    query += ', '.join(
+        'percentile_cont(%s) WITHIN GROUP (ORDER BY ratio) AS p%s' % (
+            p / 100.0, p)
+        for p in RATIO_PERCENTILES)
+    query += ' FROM (%s) r ' % ratio_query
+    query += 'GROUP BY date ORDER BY date'
+    return query
+
+
+def _get_query_for_spending_by_ccg(codes, orgs, spending_type, since=None):
+    if spending_type == 'bnf-section':
+        codes = [c + '%' for c in codes]
+    if not spending_type or spending_type == 'bnf-section' \
+       or spending_type == 'chemical':
+        return _get_query_for_chemicals_or_sections_by_ccg(
+            codes, orgs, spending_type, since)
+    elif spending_type == 'product':
+        return _get_query_for_products_by_ccg(codes, orgs, since)
+    else:
+        return _get_query_for_presentations_by_ccg(codes, orgs, since)
+
+
+def _get_query_for_spending_by_practice(codes, orgs, spending_type, date,
+                                        since=None):
+    if spending_type == 'bnf-section':
+        codes = [c + '%' for c in codes]
     if not spending_type or spending_type == 'bnf-section' \
        or spending_type == 'chemical':
-        # We can do presentation queries indexed by PCT ID, which is faster.
-        # We have yet to update the *_by_practice matviews with PCT ID.
-        # So for these queries, expand the CCG ID to a list of practice IDs.
-        expanded_orgs = utils.get_practice_ids_from_org(orgs)
         if codes:
-            query = _get_chemicals_or_sections_by_practice(codes,
-                                                           expanded_orgs,
-                                                           spending_type,
-                                                           date)
-            org_for_param = expanded_orgs
+            return _get_chemicals_or_sections_by_practice(
+                codes, orgs, spending_type, date, since)
         else:
-            query = _get_total_spending_by_practice(expanded_orgs, date)
-            org_for_param = expanded_orgs
+            return _get_total_spending_by_practice(orgs, date, since)
+    elif spending_type == 'product':
+        return _get_products_by_practice(codes, orgs, date, since)
     else:
-        query = _get_presentations_by_practice(codes, orgs, date)
-        org_for_param = orgs
-    data = utils.execute_query(
-        query, [codes, org_for_param, [date] if date else []])
-    return Response(data)
+        return _get_presentations_by_practice(codes, orgs, date, since)
 
 
-def _get_query_for_total_spending(codes):
+def _get_total_spending_query(table, conditions, since=None):
     # The CTE at the start ensures we return rows for every month in
     # the last five years, even if that's zeros
+    dates = Conditions()
+    if since:
+        conditions.add('processing_date >= %s', since)
+        dates.add('all_dates.date >= %s', since)
     query = """WITH all_dates AS (
                  SELECT
                    MAX(current_at)::date - (d.date||'month')::interval AS date
@@ -450,27 +670,50 @@ def _get_query_for_total_spending(codes):
                FROM (
                  SELECT *
                  FROM
-                   vw__presentation_summary
+                   %s
                  %s
                ) pr
                RIGHT OUTER JOIN all_dates
                ON all_dates.date = pr.processing_date
+               %s
                GROUP BY date
-               ORDER BY date;"""
+               ORDER BY date"""
+    query = query % (table, conditions.to_sql(), dates.to_sql())
+    return query, conditions.params + dates.params
+
+
+def _get_query_for_total_spending(codes, since=None):
+    # vw__bnf_prefix_summary holds one row per month for every prefix
+    # of every presentation code, at each of BNF_PREFIX_LENGTHS.  The
+    # national total is the sum over all the chapters.
+    conditions = Conditions()
     if codes:
-        condition = " WHERE ("
-        for i, c in enumerate(codes):
-            condition += "presentation_code LIKE %s "
-            if (i != len(codes) - 1):
-                condition += ' OR '
-        condition += ") "
+        conditions.add_any('bnf_prefix', codes)
     else:
-        condition = ""
+        conditions.add('prefix_length = %s', BNF_PREFIX_LENGTHS[0])
+    return _get_total_spending_query(
+        'vw__bnf_prefix_summary', conditions, since)
 
-    return query % condition
 
-
-def _get_query_for_chemicals_or_sections_by_ccg(codes, orgs, spending_type):
+def _get_query_for_total_spending_by_pattern(codes, since=None):
+    conditions = Conditions()
+    if codes:
+        conditions.add_like_any('presentation_code', codes)
+    return _get_total_spending_query(
+        'vw__presentation_summary', conditions, since)
+
+
+def _get_query_for_chemicals_or_sections_by_ccg(codes, orgs, spending_type,
+                                                since=None):
+    conditions = Conditions()
+    if spending_type == 'bnf-section':
+        conditions.add_like_any('pr.chemical_id', codes)
+    elif spending_type:
+        conditions.add_any('pr.chemical_id', codes)
+    if orgs:
+        conditions.add_any('pr.pct_id', orgs)
+    if since:
+        conditions.add('pr.processing_date >= %s', since)
     query = 'SELECT pc.code as row_id, '
     query += "pc.name as row_name, "
     query += 'pr.processing_date as date, '
@@ -480,33 +723,41 @@ def _get_query_for_chemicals_or_sections_by_ccg(codes, orgs, spending_type):
     query += "FROM vw__chemical_summary_by_ccg pr "
     query += "JOIN frontend_pct pc ON pr.pct_id=pc.code "
     query += "AND pc.org_type='CCG' "
-    if spending_type:
-        query += " WHERE ("
-        if spending_type == 'bnf-section':
-            for i, c in enumerate(codes):
-                query += "pr.chemical_id LIKE %s "
-                if (i != len(codes) - 1):
-                    query += ' OR '
-            codes = [c + '%' for c in codes]
-        else:
-            for i, c in enumerate(codes):
-                query += "pr.chemical_id=%s "
-                if (i != len(codes) - 1):
-                    query += ' OR '
-        query += ") "
+    query += conditions.to_sql()
+    query += "GROUP BY pc.code, pc.name, date "
+    query += "ORDER BY date, pc.code "
+    return query, conditions.params
+
+
+def _get_query_for_products_by_ccg(codes, orgs, since=None):
+    conditions = Conditions()
+    _add_product_conditions(conditions, codes)
     if orgs:
-        query += "AND ("
-        for i, org in enumerate(orgs):
-            query += "pr.pct_id=%s "
-            if (i != len(orgs) - 1):
-                query += ' OR '
-        query += ") "
+        conditions.add_any('pr.pct_id', orgs)
+    if since:
+        conditions.add('pr.processing_date >= %s', since)
+    query = 'SELECT pc.code as row_id, '
+    query += "pc.name as row_name, "
+    query += 'pr.processing_date as date, '
+    query += 'SUM(pr.cost) AS actual_cost, '
+    query += 'SUM(pr.items) AS items, '
+    query += 'SUM(pr.quantity) AS quantity '
+    query += "FROM vw__product_summary_by_ccg pr "
+    query += "JOIN frontend_pct pc ON pr.pct_id=pc.code "
+    query += "AND pc.org_type='CCG' "
+    query += conditions.to_sql()
     query += "GROUP BY pc.code, pc.name, date "
     query += "ORDER BY date, pc.code "
-    return query
+    return query, conditions.params
 
 
-def _get_query_for_presentations_by_ccg(codes, orgs):
+def _get_query_for_presentations_by_ccg(codes, orgs, since=None):
+    conditions = Conditions()
+    conditions.add_like_any('pr.presentation_code', codes)
+    if orgs:
+        conditions.add_any('pr.pct_id', orgs)
+    if since:
+        conditions.add('pr.processing_date >= %s', since)
     query = 'SELECT pc.code as row_id, '
     query += "pc.name as row_name, "
     query += 'pr.processing_date as date, '
@@ -516,56 +767,75 @@ def _get_query_for_presentations_by_ccg(codes, orgs):
     query += "FROM vw__presentation_summary_by_ccg pr "
     query += "JOIN frontend_pct pc ON pr.pct_id=pc.code "
     query += "AND pc.org_type='CCG' "
-    query += " WHERE ("
-    for i, c in enumerate(codes):
-        query += "pr.presentation_code LIKE %s "
-        if (i != len(codes) - 1):
-            query += ' OR '
-    if orgs:
-        query += ") AND ("
-        for i, org in enumerate(orgs):
-            query += "pr.pct_id=%s "
-            if (i != len(orgs) - 1):
-                query += ' OR '
-    query += ") GROUP BY pc.code, pc.name, date "
+    query += conditions.to_sql()
+    query += "GROUP BY pc.code, pc.name, date "
     query += "ORDER BY date, pc.code"
-    return query
+    return query, conditions.params
+
+
+def _add_product_conditions(conditions, codes):
+    """Match product ids, which are 11 characters, to `codes` exactly,
+    unless the codes are shorter, when any product starting with one of
+    them matches.
+    """
+    if all(len(code) == 11 for code in codes):
+        conditions.add_any('pr.product_id', codes)
+    else:
+        conditions.add_like_any(
+            'pr.product_id', [code + '%' for code in codes])
 
 
-def _get_total_spending_by_practice(orgs, date):
-    query = 'SELECT pr.practice_id AS row_id, '
+def _add_org_conditions(conditions, orgs):
+    """Restrict a query on a practice-level table to the given CCGs and
+    practices.
+
+    orgs may be a mixture of CCG and practice codes.  Both arrays are
+    always passed, so the statement is the same whatever the mixture.
+    """
+    conditions.add(
+        '%s OR %s' % (any_of('pr.pct_id'), any_of('pr.practice_id')),
+        [org for org in orgs if len(org) == 3],
+        [org for org in orgs if len(org) != 3])
+
+
+def _get_total_spending_by_practice(orgs, date, since=None):
+    conditions = Conditions()
+    if date:
+        conditions.add('pr.processing_date = %s', date)
+    if since:
+        conditions.add('pr.processing_date >= %s', since)
+    if orgs:
+        _add_org_conditions(conditions, orgs)
+    # A practice which moved CCG in a month has a row for each CCG
+    query = 'SELECT pc.code AS row_id, '
     query += "pc.name AS row_name, "
     query += "pc.setting AS setting, "
     query += "pc.ccg_id AS ccg, "
     query += 'pr.processing_date AS date, '
-    query += 'pr.cost AS actual_cost, '
-    query += 'pr.items AS items, '
-    query += 'pr.quantity AS quantity '
+    query += 'SUM(pr.cost) AS actual_cost, '
+    query += 'SUM(pr.items) AS items, '
+    query += 'SUM(pr.quantity) AS quantity '
     query += "FROM vw__practice_summary pr "
     query += "JOIN frontend_practice pc ON pr.practice_id=pc.code "
-    if orgs or date:
-        query += "WHERE "
-    if date:
-        query += "pr.processing_date=%s "
-    if orgs:
-        if date:
-            query += "AND "
-        query += "("
-        for i, org in enumerate(orgs):
-            query += "pr.practice_id=%s "
-            # if len(org) == 3:
-            #     query += "pr.pct_id=%s "
-            # else:
-            #     query += "pr.practice_id=%s "
-            if (i != len(orgs) - 1):
-                query += ' OR '
-        query += ") "
-    query += "ORDER BY date, pr.practice_id "
-    return query
+    query += conditions.to_sql()
+    query += "GROUP BY pc.code, pc.name, date "
+    query += "ORDER BY date, pc.code "
+    return query, conditions.params
 
 
 def _get_chemicals_or_sections_by_practice(codes, orgs, spending_type,
-                                           date):
+                                           date, since=None):
+    conditions = Conditions()
+    if spending_type == 'bnf-section':
+        conditions.add_like_any('pr.chemical_id', codes)
+    elif spending_type:
+        conditions.add_any('pr.chemical_id', codes)
+    if orgs:
+        _add_org_conditions(conditions, orgs)
+    if date:
+        conditions.add('pr.processing_date = %s', date)
+    if since:
+        conditions.add('pr.processing_date >= %s', since)
     query = 'SELECT pc.code AS row_id, '
     query += "pc.name AS row_name, "
     query += "pc.setting AS setting, "
@@ -576,49 +846,46 @@ def _get_chemicals_or_sections_by_practice(codes, orgs, spending_type,
     query += 'SUM(pr.quantity) AS quantity '
     query += "FROM vw__chemical_summary_by_practice pr "
     query += "JOIN frontend_practice pc ON pr.practice_id=pc.code "
-    has_preceding = False
-    if spending_type:
-        has_preceding = True
-        query += " WHERE ("
-        if spending_type == 'bnf-section':
-            for i, c in enumerate(codes):
-                query += "pr.chemical_id LIKE %s "
-                if (i != len(codes) - 1):
-                    query += ' OR '
-            codes = [c + '%' for c in codes]
-        else:
-            for i, c in enumerate(codes):
-                query += "pr.chemical_id=%s "
-                if (i != len(codes) - 1):
-                    query += ' OR '
-        query += ") "
+    query += conditions.to_sql()
+    query += "GROUP BY pc.code, pc.name, date "
+    query += "ORDER BY date, pc.code"
+    return query, conditions.params
+
+
+def _get_products_by_practice(codes, orgs, date, since=None):
+    conditions = Conditions()
+    _add_product_conditions(conditions, codes)
     if orgs:
-        if has_preceding:
-            query += " AND ("
-        else:
-            query += " WHERE ("
-        for i, org in enumerate(orgs):
-            query += "pr.practice_id=%s "
-            # if len(org) == 3:
-            #     query += "pr.pct_id=%s "
-            # else:
-            #     query += "pr.practice_id=%s "
-            if (i != len(orgs) - 1):
-                query += ' OR '
-        query += ") "
-        has_preceding = True
+        _add_org_conditions(conditions, orgs)
     if date:
-        if has_preceding:
-            query += " AND ("
-        else:
-            query += " WHERE ("
-        query += "pr.processing_date=%s) "
+        conditions.add('pr.processing_date = %s', date)
+    if since:
+        conditions.add('pr.processing_date >= %s', since)
+    query = 'SELECT pc.code AS row_id, '
+    query += "pc.name AS row_name, "
+    query += "pc.setting AS setting, "
+    query += "pc.ccg_id AS ccg, "
+    query += "pr.processing_date AS date, "
+    query += 'SUM(pr.cost) AS actual_cost, '
+    query += 'SUM(pr.items) AS items, '
+    query += 'SUM(pr.quantity) AS quantity '
+    query += "FROM vw__product_summary_by_practice pr "
+    query += "JOIN frontend_practice pc ON pr.practice_id=pc.code "
+    query += conditions.to_sql()
     query += "GROUP BY pc.code, pc.name, date "
     query += "ORDER BY date, pc.code"
-    return query
+    return query, conditions.params
 
 
-def _get_presentations_by_practice(codes, orgs, date):
+def _get_presentations_by_practice(codes, orgs, date, since=None):
+    conditions = Conditions()
+    conditions.add_like_any('pr.presentation_code', codes)
+    if orgs:
+        _add_org_conditions(conditions, orgs)
+    if date:
+        conditions.add('pr.processing_date = %s', date)
+    if since:
+        conditions.add('pr.processing_date >= %s', since)
     query = 'SELECT pc.code AS row_id, '
     query += "pc.name AS row_name, "
     query += "pc.setting AS setting, "
@@ -629,22 +896,7 @@ def _get_presentations_by_practice(codes, orgs, date):
     query += 'CAST(SUM(pr.quantity) AS bigint) AS quantity '
     query += "FROM frontend_prescription pr "
     query += "JOIN frontend_practice pc ON pr.practice_id=pc.code "
-    query += "WHERE ("
-    for i, c in enumerate(codes):
-        query += "pr.presentation_code LIKE %s "
-        if (i != len(codes) - 1):
-            query += ' OR '
-    if orgs:
-        query += ") AND ("
-        for i, c in enumerate(orgs):
-            if len(c) == 3:
-                query += "pr.pct_id=%s "
-            else:
-                query += "pr.practice_id=%s "
-            if (i != len(orgs) - 1):
-                query += ' OR '
-    if date:
-        query += "AND pr.processing_date=%s "
-    query += ") GROUP BY pc.code, pc.name, date "
+    query += conditions.to_sql()
+    query += "GROUP BY pc.code, pc.name, date "
     query += "ORDER BY date, pc.code"
-    return query
+    return query, conditions.params
@@ -6,6 +6,7 @@ from titlecase import titlecase
 import argparse
 import hashlib
 import html2text
+import json
 import logging
 import re
 import uuid
@@ -64,6 +65,17 @@ def get_env_setting(setting, default=None):
             raise ImproperlyConfigured(error_msg)
 
 
+def get_deploy_info(path):
+    """Return the details of the deploy written to `path` by `fab deploy`,
+    or an empty dict if there are none.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
 def under_test():
     return db.connections.databases['default']['NAME'].startswith("test_")
 
@@ -11,6 +11,8 @@ import requests
 from django.core.management import BaseCommand
 
 from dmd.models import NCSOConcession, DMDVmpp
+from frontend.management.commands.import_ppu_savings import (
+    update_price_concessions)
 from gcutils.bigquery import Client
 from openprescribing.slack import notify_slack
 
@@ -26,8 +28,12 @@ class Command(BaseCommand):
             'changed': 0,
             'unchanged': 0,
         }
+        # The months with concessions newly matched to VMPPs, whose
+        # price-per-unit savings need their flags updating
+        self.matched_months = set()
         self.import_from_archive()
         self.import_from_current()
+        update_price_concessions(self.matched_months)
 
         logger.info('New and matched: %s', self.counter['new-and-matched'])
         logger.info('New and unmatched: %s', self.counter['new-and-unmatched'])
@@ -123,6 +129,7 @@ class Command(BaseCommand):
             if matching_vmpp_id is not None:
                 logger.info('Found matching VMPP: %s', matching_vmpp_id)
                 concession.vmpp_id = matching_vmpp_id
+                self.matched_months.add(date)
                 status = 'new-and-matched'
             else:
                 logger.info('Found no matching VMPP')
@@ -4,6 +4,8 @@ from django.core.management import BaseCommand
 
 from openprescribing.utils import get_input
 from dmd.models import NCSOConcession, DMDVmpp
+from frontend.management.commands.import_ppu_savings import (
+    update_price_concessions)
 from gcutils.bigquery import Client
 
 
@@ -13,8 +15,11 @@ class Command(BaseCommand):
         num = unreconciled_concessions.count()
 
         self.stdout.write('There are {} unreconciled concessions'.format(num))
+        months = set()
         for concession in unreconciled_concessions:
             self.handle_concession(concession)
+            months.add(concession.date)
+        update_price_concessions(months)
 
         Client('dmd').upload_model(NCSOConcession)
 
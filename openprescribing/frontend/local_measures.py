@@ -0,0 +1,273 @@
+"""Calculate measures with pandas, from the prescribing data in the local
+database, rather than in BigQuery.
+
+Each function here returns the same rows as the query of the same name in
+`management/commands/measure_sql`, as a DataFrame, so that the results can
+be written to the database in the same way.  Only measures whose numerator
+and denominator are both drawn from prescribing or practice statistics,
+with conditions in plain SQL, can be calculated like this.
+
+"""
+import re
+
+from django.db import connection
+import numpy as np
+import pandas as pd
+
+from frontend.models import PCT
+from frontend.models import Practice
+
+CENTILES = [10, 20, 30, 40, 50, 60, 70, 80, 90]
+
+# The local equivalents of the BigQuery tables which measures are
+# calculated from, with columns renamed to match
+LOCAL_TABLES = {
+    '{hscic}.normalised_prescribing_standard': (
+        "(SELECT rx.presentation_code AS bnf_code, pn.name AS bnf_name, "
+        "rx.total_items AS items, rx.net_cost, rx.actual_cost, rx.quantity, "
+        "rx.processing_date AS month, rx.practice_id AS practice "
+        "FROM frontend_prescription rx "
+        "LEFT OUTER JOIN frontend_presentation pn "
+        "ON pn.bnf_code = rx.presentation_code) AS p"),
+    '{hscic}.practice_statistics': (
+        "(SELECT total_list_size, astro_pu_cost, astro_pu_items, star_pu, "
+        "date AS month, practice_id AS practice "
+        "FROM frontend_practicestatistics) AS p"),
+}
+
+# The columns of each of LOCAL_TABLES
+LOCAL_COLUMNS = {
+    '{hscic}.normalised_prescribing_standard': [
+        'bnf_code', 'bnf_name', 'items', 'net_cost', 'actual_cost',
+        'quantity', 'month', 'practice'],
+    '{hscic}.practice_statistics': [
+        'total_list_size', 'astro_pu_cost', 'astro_pu_items', 'star_pu',
+        'month', 'practice'],
+}
+
+# The words other than column names which measures' SQL may use
+SQL_WORDS = set([
+    'and', 'or', 'not', 'like', 'in', 'is', 'null', 'between', 'case',
+    'when', 'then', 'else', 'end', 'sum', 'count', 'max', 'min', 'avg',
+    'coalesce', 'cast', 'true', 'false'])
+
+BIGQUERY_ONLY = re.compile(
+    r'\b(JSON_EXTRACT|FLOAT64|IEEE_DIVIDE|SAFE_\w+)\b', re.IGNORECASE)
+STRING_LITERAL = re.compile(r"'[^']*'")
+ALIAS = re.compile(r'\bAS\s+\w+', re.IGNORECASE)
+IDENTIFIER = re.compile(r'\b[a-z_]\w*\b', re.IGNORECASE)
+
+
+def can_calculate(measure):
+    """Return whether `measure` can be calculated from the local database.
+    """
+    for num_or_denom in ['numerator', 'denominator']:
+        table = getattr(measure, num_or_denom + '_from').strip()
+        if table not in LOCAL_TABLES:
+            return False
+        sql = measure.columns_for_select(num_or_denom) + ' ' + getattr(
+            measure, num_or_denom + '_where')
+        if BIGQUERY_ONLY.search(sql):
+            return False
+        sql = ALIAS.sub('', STRING_LITERAL.sub('', sql))
+        for identifier in IDENTIFIER.findall(sql):
+            if identifier.lower() in SQL_WORDS:
+                continue
+            if identifier not in LOCAL_COLUMNS[table]:
+                return False
+    return True
+
+
+def practice_ratios(measure, start_date, end_date):
+    """Return the numerator, denominator and ratio of `measure` for every
+    practice in every month between the given dates.
+    """
+    num = _get_practice_values(measure, 'numerator', start_date, end_date)
+    denom = _get_practice_values(
+        measure, 'denominator', start_date, end_date)
+    # A row for every practice in every month, even where there is no
+    # denominator value
+    practices = pd.DataFrame.from_records(
+        Practice.objects.filter(setting=4).values_list('code', 'ccg_id'),
+        columns=['practice_id', 'pct_id'])
+    months = pd.DataFrame({'month': denom['month'].unique()})
+    practices['key'] = months['key'] = 0
+    frame = practices.merge(months, on='key').drop('key', axis=1)
+
+    keys = ['practice_id', 'month']
+    frame = frame.merge(denom, how='left', on=keys)
+    frame = frame.merge(num, how='left', on=keys)
+    # A missing numerator or denominator means zero items prescribed
+    frame['numerator'] = frame['numerator'].fillna(0)
+    frame['denominator'] = frame['denominator'].fillna(0)
+    frame['calc_value'] = _divide(frame['numerator'], frame['denominator'])
+    return frame
+
+
+def _get_practice_values(measure, num_or_denom, start_date, end_date):
+    """Return the numerator or denominator columns of `measure` summed by
+    practice and month.  Columns other than the numerator or denominator
+    itself are prefixed `num_` or `denom_`, as in the BigQuery tables.
+    """
+    sql = (
+        "SELECT month, practice AS practice_id, {columns} "
+        "FROM {table} "
+        "WHERE month >= '{start_date}' AND month <= '{end_date}' "
+        "AND ({where}) "
+        "GROUP BY practice, month").format(
+            columns=measure.columns_for_select(num_or_denom),
+            table=LOCAL_TABLES[
+                getattr(measure, num_or_denom + '_from').strip()],
+            start_date=start_date,
+            end_date=end_date,
+            where=getattr(measure, num_or_denom + '_where'))
+    with connection.cursor() as cursor:
+        # No params, so the %s in LIKE patterns are left alone
+        cursor.execute(sql)
+        columns = [col[0] for col in cursor.description]
+        frame = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+    for col in columns[2:]:
+        # Sums of numeric columns are returned as Decimals
+        frame[col] = frame[col].fillna(np.nan).astype(float)
+    prefix = 'num_' if num_or_denom == 'numerator' else 'denom_'
+    return frame.rename(columns=dict(
+        (col, prefix + col) for col in columns
+        if col not in ['month', 'practice_id', num_or_denom]))
+
+
+def add_percent_rank(frame):
+    """Add the PERCENT_RANK of each row's calc_value within its month, as
+    `percentile`.
+    """
+    frame = frame.copy()
+    by_month = frame.groupby('month')['calc_value']
+    rank = by_month.rank(method='min')
+    count = by_month.transform('count')
+    frame['percentile'] = ((rank - 1) / (count - 1)).where(count > 1, 0)
+    frame.loc[frame['calc_value'].isnull(), 'percentile'] = np.nan
+    return frame
+
+
+def global_deciles_practices(practices, measure):
+    """Return the deciles of practices' ratios for each month, along with
+    totals of the numerator and denominator columns.
+    """
+    totals_columns = [
+        col for col in practices.columns
+        if col in ['numerator', 'denominator']
+        or col.startswith('num_') or col.startswith('denom_')]
+    frame = practices.groupby('month')[totals_columns].sum()
+    frame = frame.join(_deciles(practices, 'practice'))
+    if measure.is_cost_based:
+        frame['cost_per_denom'] = _divide(
+            frame['denom_cost'] - frame['num_cost'],
+            frame['denom_quantity'] - frame['num_quantity'])
+        frame['cost_per_num'] = _divide(
+            frame['num_cost'], frame['num_quantity'])
+    return frame.reset_index()
+
+
+def global_deciles_ccgs(globals_, ccgs):
+    """Add the deciles of CCGs' ratios for each month to the global data.
+    """
+    return globals_.merge(
+        _deciles(ccgs, 'ccg').reset_index(), how='left', on='month')
+
+
+def _deciles(frame, prefix):
+    by_month = frame.groupby('month')['calc_value']
+    return pd.DataFrame(dict(
+        ('%s_%sth' % (prefix, centile), by_month.quantile(centile / 100.0))
+        for centile in CENTILES))
+
+
+def practice_cost_savings(practices, globals_):
+    """Add the savings each practice would have made at each decile.
+    """
+    return _add_cost_savings(practices, globals_, 'practice')
+
+
+def ccg_cost_savings(ccgs, globals_):
+    """Add the savings each CCG would have made at each decile.
+    """
+    return _add_cost_savings(ccgs, globals_, 'ccg')
+
+
+def _add_cost_savings(local, globals_, prefix):
+    glob = local[['month']].merge(globals_, how='left', on='month')
+    glob.index = local.index
+    num_quantity = local['num_quantity'].fillna(0)
+    num_cost = local['num_cost'].fillna(0)
+    num_price = (local['num_cost'] / local['num_quantity']).where(
+        local['num_quantity'] > 0, glob['cost_per_num'])
+    other_quantity = local['denom_quantity'] - num_quantity
+    other_price = ((local['denom_cost'] - num_cost) / other_quantity).where(
+        other_quantity != 0, glob['cost_per_denom'])
+    frame = local.copy()
+    for centile in CENTILES:
+        decile = glob['%s_%sth' % (prefix, centile)]
+        frame['cost_savings_%s' % centile] = local['denom_cost'] - (
+            decile * local['denom_quantity'] * num_price +
+            (local['denom_quantity'] - local['denom_quantity'] * decile) *
+            other_price)
+    return frame
+
+
+def ccg_ratios(practices):
+    """Return the practices' numerators and denominators summed by CCG and
+    month, with their ratio.
+    """
+    ccg_ids = PCT.objects.filter(org_type='CCG').values_list(
+        'code', flat=True)
+    frame = practices[practices['pct_id'].isin(list(ccg_ids))]
+    columns = [
+        col for col in practices.columns
+        if col in ['numerator', 'denominator']
+        or col.startswith('num_') or col.startswith('denom_')]
+    frame = frame.groupby(['pct_id', 'month'])[columns].sum().reset_index()
+    frame['calc_value'] = _divide(frame['numerator'], frame['denominator'])
+    return frame.sort_values('month')
+
+
+def global_cost_savings(practices, ccgs, globals_):
+    """Add the total savings of practices and of CCGs at each decile to
+    the global data.
+    """
+    frame = globals_
+    for prefix, local in [('practice', practices), ('ccg', ccgs)]:
+        columns = ['cost_savings_%s' % centile for centile in CENTILES]
+        savings = local.groupby('month')[columns].agg(
+            lambda s: s.clip(lower=0).sum())
+        savings.columns = ['%s_%s' % (prefix, col) for col in columns]
+        frame = frame.merge(savings.reset_index(), on='month')
+    return frame
+
+
+def rows_as_dicts(frame):
+    """Iterate over the rows of `frame` as dicts of Python values, as
+    returned for BigQuery tables.
+    """
+    for row in frame.to_dict('records'):
+        yield dict((key, _python_value(value)) for key, value in row.items())
+
+
+def _python_value(value):
+    # Integer columns become floats when merged with missing values
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return None
+        if float(value).is_integer():
+            return int(value)
+        return float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def _divide(numerator, denominator):
+    """Divide as IEEE_DIVIDE does, but with NULL for infinite or undefined
+    results.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = numerator / denominator
+    return result.replace([np.inf, -np.inf], np.nan)
@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from api import urls as api_urls
+from api.instrumentation import get_view_name
+from api.instrumentation import percentile
+from frontend.models import RequestLatency
+
+PERCENTILES = [50, 95, 99]
+
+
+def api_view_names():
+    """Return the names of the views routed to by api/urls.py, in the
+    order they are listed.
+    """
+    view_names = []
+    for pattern in api_urls.urlpatterns:
+        if not hasattr(pattern, 'callback'):
+            # An include(), such as the docs
+            continue
+        view_name = get_view_name(pattern.callback)
+        if view_name not in view_names:
+            view_names.append(view_name)
+    return view_names
+
+
+class Command(BaseCommand):
+    help = ('Reports the 50th, 95th and 99th percentiles of the time taken '
+            'to respond to requests to each API view, in milliseconds')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all-views', action='store_true',
+            help='Report on every view with recorded requests, not just '
+                 'the API')
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Delete the recorded latencies after reporting them')
+
+    def handle(self, *args, **options):
+        histograms = defaultdict(dict)
+        for latency in RequestLatency.objects.all():
+            histograms[latency.view_name][latency.bucket] = latency.count
+        if options['all_views']:
+            view_names = sorted(histograms)
+        else:
+            view_names = api_view_names()
+
+        self.stdout.write('\t'.join(
+            ['view', 'requests'] + ['p%s' % p for p in PERCENTILES]))
+        for view_name in view_names:
+            counts = histograms[view_name]
+            row = [view_name, str(sum(counts.values()))]
+            for p in PERCENTILES:
+                ms = percentile(counts, p / 100.0)
+                row.append('-' if ms is None else '%.0f' % ms)
+            self.stdout.write('\t'.join(row))
+
+        if options['reset']:
+            RequestLatency.objects.all().delete()
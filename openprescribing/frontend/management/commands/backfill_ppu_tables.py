@@ -0,0 +1,52 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from frontend.management.commands.import_ppu_savings import \
+    make_denormalised_savings_for_month
+from frontend.management.commands.import_ppu_savings import \
+    make_ppu_bins_for_month
+from frontend.models import DenormalisedPPUSaving
+from frontend.models import ImportLog
+from frontend.models import PPUBin
+from frontend.models import PPUSaving
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    args = ''
+    help = ('Fill the tables which import_ppu_savings derives from each '
+            'month of data, for months imported before they existed. '
+            'Months which already have data are skipped.')
+
+    def handle(self, *args, **options):
+        for month in get_prescribing_months():
+            if not PPUBin.objects.filter(date=month).exists():
+                logger.info('Making price-per-unit bins for %s' % month)
+                with transaction.atomic():
+                    make_ppu_bins_for_month(month)
+
+        saving_months = PPUSaving.objects.values_list(
+            'date', flat=True).distinct()
+        for month in sorted(saving_months):
+            if not DenormalisedPPUSaving.objects.filter(date=month).exists():
+                logger.info('Denormalising price-per-unit savings for %s' %
+                            month)
+                with transaction.atomic():
+                    make_denormalised_savings_for_month(month)
+
+
+def get_prescribing_months():
+    """Return the months of prescribing that we keep, oldest first.
+    """
+    latest = ImportLog.objects.latest_in_category('prescribing')
+    if latest is None:
+        return []
+    five_years_ago = latest.current_at.replace(
+        year=latest.current_at.year - 5)
+    months = ImportLog.objects.filter(
+        category='prescribing', current_at__gt=five_years_ago
+    ).values_list('current_at', flat=True)
+    return sorted(set(months))
@@ -92,6 +92,14 @@ class Command(BaseCommand):
             self.download_and_import(table)
             self.log("-------------")
 
+        # The API's cached responses and ETags are keyed on the latest
+        # ImportLogs, so this makes it stop serving anything read from the
+        # old (or half-loaded) views
+        ImportLog.objects.create(
+            category='views',
+            filename='n/a',
+            current_at=prescribing_date)
+
     def download_and_import(self, table):
         '''Download table from storage and import into local database.
 
@@ -170,12 +178,17 @@ def query_and_export(table_name, sql, substitutions):
 
 def generate_sort_cmd(table_name, field_names, raw_path, sorted_path):
     sort_keys = {
+        'vw__bnf_prefix_summary': ['bnf_prefix', 'processing_date'],
         'vw__ccgstatistics': ['pct_id'],
+        'vw__chemical_ranking_by_practice': [
+            'chemical_id', 'processing_date'],
         'vw__chemical_summary_by_ccg': ['chemical_id', 'pct_id'],
         'vw__chemical_summary_by_practice': ['chemical_id', 'practice_id'],
         'vw__practice_summary': ['practice_id', 'processing_date'],
         'vw__presentation_summary': ['presentation_code', 'processing_date'],
         'vw__presentation_summary_by_ccg': ['presentation_code', 'pct_id'],
+        'vw__product_summary_by_ccg': ['product_id', 'pct_id'],
+        'vw__product_summary_by_practice': ['product_id', 'practice_id'],
     }[table_name]
     sort_key_ixs = [field_names.index(k) + 1 for k in sort_keys]
     sort_opts = ' '.join('-k{},{}'.format(ix, ix) for ix in sort_key_ixs)
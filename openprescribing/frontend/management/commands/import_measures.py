@@ -9,6 +9,8 @@ clearly.
 """
 
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 from contextlib import contextmanager
 import csv
 import datetime
@@ -18,16 +20,23 @@ import logging
 import os
 import re
 import tempfile
+import traceback
+
+from dateutil.relativedelta import relativedelta
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.management.base import BaseCommand, CommandError
 from django.db import connection
 from django.db import transaction
+from django.db.models import Max
 
+from api.measure_payloads import write_measure_payloads
 from gcutils.bigquery import Client
 
 from common import utils
+from frontend import local_measures
 from frontend.models import MeasureGlobal, MeasureValue, Measure, ImportLog
+from frontend.models import MeasureSeries
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +51,15 @@ class Command(BaseCommand):
     You can also supply --start_date, or supply a file path that
     includes a timestamp with --month_from_prescribing_filename
 
+    Measures are calculated in BigQuery, unless --engine local is given,
+    in which case they're calculated from the prescribing data in the
+    local database (see `LocalMeasureCalculation`).
+
+    With --incremental, only months after the latest already calculated
+    for each measure are calculated, and values for months before the
+    start date are deleted.  This is what's wanted after a new month of
+    prescribing data has been imported.
+
     Specify a measure with a single string argument to `--measure`,
     and more than one with a comma-delimited list.
 
@@ -50,36 +68,39 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         options = self.parse_options(options)
         start = datetime.datetime.now()
-        start_date = options['start_date']
         end_date = options['end_date']
-        verbose = options['verbosity'] > 1
         with conditional_constraint_and_index_reconstructor(options):
-            for measure_id in options['measure_ids']:
-                logger.info('Updating measure: %s' % measure_id)
-                measure = create_or_update_measure(measure_id)
-                measure_start = datetime.datetime.now()
-
-                calcuation = MeasureCalculation(
-                    measure, start_date=start_date, end_date=end_date,
-                    verbose=verbose
-                )
-                if options['definitions_only']:
-                    continue
-
-                # Delete any existing measures data relating to the
-                # current month(s)
-                MeasureValue.objects.filter(month__gte=start_date)\
-                                    .filter(month__lte=end_date)\
-                                    .filter(measure=measure).delete()
-                MeasureGlobal.objects.filter(month__gte=start_date)\
-                                     .filter(month__lte=end_date)\
-                                     .filter(measure=measure).delete()
-
-                # Compute the measures
-                calcuation.calculate()
-                elapsed = datetime.datetime.now() - measure_start
-                logger.warning("Elapsed time for %s: %s seconds" % (
-                    measure_id, elapsed.seconds))
+            if options['parallel'] > 1:
+                import_measures_in_parallel(options)
+            else:
+                for measure_id in options['measure_ids']:
+                    import_measure(measure_id, options)
+        if options['definitions_only']:
+            # Cached API responses and their ETags depend on the latest
+            # ImportLogs, so this stops them serving the old definitions.
+            # The pre-rendered values don't include definitions, so
+            # needn't be rewritten.
+            ImportLog.objects.create(
+                category='measure_definitions',
+                filename='n/a',
+                current_at=end_date)
+        else:
+            # The series are rebuilt once all the values have been
+            # calculated and any indexes dropped for the import are back,
+            # in a single statement, rather than one scan of the values
+            # for each measure
+            if options.get('measure'):
+                measure_ids = options['measure_ids']
+            else:
+                measure_ids = None
+            logger.info('Rebuilding measure series')
+            MeasureSeries.objects.rebuild(measure_ids)
+            logger.info('Writing pre-rendered measure values')
+            write_measure_payloads(measure_ids)
+            ImportLog.objects.create(
+                category='measures',
+                filename='n/a',
+                current_at=end_date)
         logger.warning("Total elapsed time: %s" % (
             datetime.datetime.now() - start))
 
@@ -90,6 +111,15 @@ class Command(BaseCommand):
         parser.add_argument('--end_date')
         parser.add_argument('--measure')
         parser.add_argument('--definitions_only', action='store_true')
+        parser.add_argument(
+            '--parallel', type=int, default=1,
+            help='number of measures to calculate at once')
+        parser.add_argument(
+            '--engine', choices=['bigquery', 'local'], default='bigquery',
+            help='where to calculate measures')
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='only calculate months not already calculated')
 
     def parse_options(self, options):
         """Parse command line options
@@ -124,6 +154,113 @@ class Command(BaseCommand):
         return options
 
 
+def import_measure(measure_id, options):
+    """Calculate the given measure for the months in `options`, replacing
+    any values already stored for those months.
+    """
+    start_date = options['start_date']
+    end_date = options['end_date']
+    verbose = options['verbosity'] > 1
+    logger.info('Updating measure: %s' % measure_id)
+    measure = create_or_update_measure(measure_id)
+    if options['definitions_only']:
+        return
+
+    measure_start = datetime.datetime.now()
+    if options.get('incremental'):
+        delete_values_before(measure, start_date)
+        start_date = first_uncalculated_month(measure, start_date)
+        if start_date > end_date:
+            logger.info('Measure %s is already up to date' % measure_id)
+            return
+
+    calculation_class = ENGINES[options.get('engine') or 'bigquery']
+    calcuation = calculation_class(
+        measure, start_date=start_date, end_date=end_date,
+        verbose=verbose
+    )
+
+    # Delete any existing measures data relating to the
+    # current month(s)
+    MeasureValue.objects.filter(month__gte=start_date)\
+                        .filter(month__lte=end_date)\
+                        .filter(measure=measure).delete()
+    MeasureGlobal.objects.filter(month__gte=start_date)\
+                         .filter(month__lte=end_date)\
+                         .filter(measure=measure).delete()
+
+    # Compute the measures
+    calcuation.calculate()
+    elapsed = datetime.datetime.now() - measure_start
+    logger.warning("Elapsed time for %s: %s seconds" % (
+        measure_id, elapsed.seconds))
+
+
+def first_uncalculated_month(measure, start_date):
+    """Return the first month from `start_date` onwards after the latest
+    month for which `measure` has been calculated, as a string.
+
+    Percentiles and deciles are calculated separately for each month, so
+    the values for months already calculated don't change when a month is
+    added.
+    """
+    latest = MeasureGlobal.objects.filter(
+        measure=measure, month__gte=start_date).aggregate(
+            Max('month'))['month__max']
+    if latest is None:
+        return start_date
+    return (latest + relativedelta(months=1)).strftime('%Y-%m-01')
+
+
+def delete_values_before(measure, start_date):
+    """Delete the values of `measure` for months which have aged out of the
+    range being calculated.
+    """
+    MeasureValue.objects.filter(
+        measure=measure, month__lt=start_date).delete()
+    MeasureGlobal.objects.filter(
+        measure=measure, month__lt=start_date).delete()
+
+
+def import_measures_in_parallel(options):
+    """Import each of the measures in `options` in a pool of
+    `options['parallel']` threads.
+
+    Almost all the time spent calculating a measure is spent waiting for
+    its BigQuery jobs, which run one after another, so the size of the
+    pool also bounds the number of jobs in flight.  Each thread has its
+    own database connection.  A measure which fails doesn't stop the
+    others; the failures are reported together once all have finished.
+
+    """
+    with ThreadPoolExecutor(max_workers=options['parallel']) as executor:
+        futures = dict(
+            (executor.submit(_import_measure_in_thread, measure_id, options),
+             measure_id)
+            for measure_id in options['measure_ids'])
+        failures = []
+        for future in as_completed(futures):
+            measure_id = futures[future]
+            try:
+                future.result()
+            except Exception:
+                logger.error("Measure %s failed:\n%s" % (
+                    measure_id, traceback.format_exc()))
+                failures.append(measure_id)
+    if failures:
+        raise CommandError(
+            "%s of %s measures failed: %s" % (
+                len(failures), len(options['measure_ids']),
+                ', '.join(sorted(failures))))
+
+
+def _import_measure_in_thread(measure_id, options):
+    try:
+        import_measure(measure_id, options)
+    finally:
+        connection.close()
+
+
 def parse_measures():
     """Deserialise JSON measures definition into dict
     """
@@ -640,6 +777,8 @@ class MeasureCalculation(object):
         return client.get_table(table_name)
 
     def log(self, message):
+        # Prefixed with the measure, as several may be calculated at once
+        message = "%s: %s" % (self.measure.id, message)
         if self.verbose:
             logger.warning(message)
         else:
@@ -661,11 +800,92 @@ class MeasureCalculation(object):
         return [x for x in aliases if x not in num_or_denom]
 
 
+class LocalMeasureCalculation(MeasureCalculation):
+    """Logic for measure calculations with pandas, from the prescribing
+    data in the local database.
+
+    Each step which runs a query in BigQuery instead calls the function
+    of the same name in `frontend.local_measures`, and keeps the table
+    it returns in memory.  The results are then written to the database
+    as they are for BigQuery.
+
+    """
+
+    def __init__(self, measure, start_date=None, end_date=None,
+                 verbose=False):
+        super(LocalMeasureCalculation, self).__init__(
+            measure, start_date=start_date, end_date=end_date,
+            verbose=verbose)
+        if not local_measures.can_calculate(measure):
+            raise CommandError(
+                "Measure %s can only be calculated in BigQuery" % measure.id)
+        self.tables = {}
+
+    def calculate_practice_ratios(self):
+        self.tables[self.practice_table_name] = \
+            local_measures.practice_ratios(
+                self.measure, self.start_date, self.end_date)
+
+    def add_practice_percent_rank(self):
+        self.tables[self.practice_table_name] = \
+            local_measures.add_percent_rank(
+                self.tables[self.practice_table_name])
+
+    def calculate_global_centiles_for_practices(self):
+        self.tables[self.globals_table_name] = \
+            local_measures.global_deciles_practices(
+                self.tables[self.practice_table_name], self.measure)
+
+    def calculate_cost_savings_for_practices(self):
+        self.tables[self.practice_table_name] = \
+            local_measures.practice_cost_savings(
+                self.tables[self.practice_table_name],
+                self.tables[self.globals_table_name])
+
+    def calculate_ccg_ratios(self):
+        self.tables[self.ccg_table_name] = local_measures.ccg_ratios(
+            self.tables[self.practice_table_name])
+
+    def add_ccg_percent_rank(self):
+        self.tables[self.ccg_table_name] = local_measures.add_percent_rank(
+            self.tables[self.ccg_table_name])
+
+    def calculate_global_centiles_for_ccgs(self):
+        self.tables[self.globals_table_name] = \
+            local_measures.global_deciles_ccgs(
+                self.tables[self.globals_table_name],
+                self.tables[self.ccg_table_name])
+
+    def calculate_cost_savings_for_ccgs(self):
+        self.tables[self.ccg_table_name] = local_measures.ccg_cost_savings(
+            self.tables[self.ccg_table_name],
+            self.tables[self.globals_table_name])
+
+    def calculate_global_cost_savings(self):
+        self.tables[self.globals_table_name] = \
+            local_measures.global_cost_savings(
+                self.tables[self.practice_table_name],
+                self.tables[self.ccg_table_name],
+                self.tables[self.globals_table_name])
+
+    def get_rows_as_dicts(self, table_name):
+        return local_measures.rows_as_dicts(self.tables[table_name])
+
+
+ENGINES = {
+    'bigquery': MeasureCalculation,
+    'local': LocalMeasureCalculation,
+}
+
+
 @contextmanager
 def conditional_constraint_and_index_reconstructor(options):
     if 'measure' in options and options['measure']:
         # This is an optimisation that only makes sense when we're
         # updating the entire table.
         yield
+    elif options.get('incremental'):
+        # Nor when we're only adding a month or so to it
+        yield
     else:
         yield utils.constraint_and_index_reconstructor('frontend_measurevalue')
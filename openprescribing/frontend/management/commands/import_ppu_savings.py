@@ -6,13 +6,17 @@ import pandas as pd
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import connection
 from django.db import transaction
 
 from gcutils.bigquery import Client
 
+from common.utils import nhs_titlecase
 from common.utils import valid_date
 from dmd.models import DMDProduct
+from frontend.models import DenormalisedPPUSaving
 from frontend.models import ImportLog
+from frontend.models import PPUBin
 from frontend.models import PPUSaving
 from frontend.models import Presentation
 from frontend.bq_schemas import PPU_SAVING_SCHEMA, ppu_savings_transform
@@ -185,6 +189,153 @@ def get_savings(entity_type, month):
     return df
 
 
+def make_ppu_bins_for_month(month):
+    """Store the total quantity and net cost prescribed at each
+    price-per-unit, rounded to the penny, of every presentation in the
+    month, for England, each CCG and each practice.
+
+    These are what the bubble chart API serves, so that it doesn't need
+    to aggregate over every prescription on each request.  Bins are kept
+    for as long as the prescribing they're made from, five years.
+
+    """
+    sql = """
+      WITH rounded_ppus AS (
+        SELECT
+          presentation_code,
+          pct_id,
+          practice_id,
+          quantity,
+          net_cost,
+          ROUND(CAST(net_cost/NULLIF(quantity, 0) AS numeric), 2) AS ppu
+        FROM frontend_prescription
+        INNER JOIN frontend_practice
+          ON frontend_practice.code = frontend_prescription.practice_id
+        WHERE processing_date = %(month)s
+          AND setting = 4
+      )
+      INSERT INTO frontend_ppubin
+        (date, presentation_code, pct_id, practice_id,
+         price_per_unit, quantity, net_cost)
+      SELECT %(month)s, presentation_code, NULL, NULL,
+        ppu, SUM(quantity), SUM(net_cost)
+      FROM rounded_ppus
+      GROUP BY presentation_code, ppu
+      UNION ALL
+      SELECT %(month)s, presentation_code, pct_id, NULL,
+        ppu, SUM(quantity), SUM(net_cost)
+      FROM rounded_ppus
+      WHERE pct_id IS NOT NULL
+      GROUP BY presentation_code, pct_id, ppu
+      UNION ALL
+      SELECT %(month)s, presentation_code, pct_id, practice_id,
+        ppu, SUM(quantity), SUM(net_cost)
+      FROM rounded_ppus
+      GROUP BY presentation_code, pct_id, practice_id, ppu
+    """
+    PPUBin.objects.filter(date=month).delete()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'month': month})
+        cursor.execute(
+            "DELETE FROM frontend_ppubin "
+            "WHERE date <= %(month)s::date - interval '5 years'",
+            {'month': month})
+
+
+# Whether there is a price concession in its month for any pack of the
+# presentation of the saving `s`
+PRICE_CONCESSION_SQL = """
+  EXISTS (
+    SELECT 1
+    FROM dmd_product
+    INNER JOIN dmd_vmpp
+      ON dmd_vmpp.vpid = dmd_product.vpid
+    INNER JOIN dmd_ncsoconcession
+      ON dmd_ncsoconcession.vmpp_id = dmd_vmpp.vppid
+    WHERE dmd_product.bnf_code = s.bnf_code
+      AND dmd_product.concept_class = 1
+      AND dmd_ncsoconcession.date = s.date
+  )
+"""
+
+
+def make_denormalised_savings_for_month(month):
+    """Store each of the month's PPUSavings with the names, flags and
+    concessions that the price-per-unit API serves with it, so that the
+    API needn't join other tables or recase practice names on each
+    request.
+
+    Savings for presentations which aren't in the dm+d as VMPs are
+    omitted.  Where there is more than one VMP with a presentation's BNF
+    code, the name of one of them is used.
+
+    """
+    sql = """
+      INSERT INTO frontend_denormalisedppusaving
+        (saving_id, date, bnf_code, pct_id, practice_id, lowest_decile,
+         quantity, price_per_unit, possible_savings, formulation_swap,
+         name, practice_name, flag_bioequivalence, price_concession)
+      SELECT DISTINCT ON (s.bnf_code, s.pct_id, s.practice_id)
+        s.id, s.date, s.bnf_code, s.pct_id, s.practice_id, s.lowest_decile,
+        s.quantity, s.price_per_unit, s.possible_savings, s.formulation_swap,
+        COALESCE(dmd_product.name, frontend_presentation.name),
+        frontend_practice.name,
+        dmd_product.flag_non_bioequivalence,
+        %s
+      FROM frontend_ppusaving s
+      INNER JOIN dmd_product
+        ON dmd_product.bnf_code = s.bnf_code
+        AND dmd_product.concept_class = 1
+      LEFT OUTER JOIN frontend_presentation
+        ON frontend_presentation.bnf_code = s.bnf_code
+      LEFT OUTER JOIN frontend_practice
+        ON frontend_practice.code = s.practice_id
+      WHERE s.date = %%(month)s
+    """ % PRICE_CONCESSION_SQL
+    DenormalisedPPUSaving.objects.filter(date=month).delete()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'month': month})
+
+    practice_names = DenormalisedPPUSaving.objects.filter(
+        date=month, practice_name__isnull=False
+    ).values_list('practice_id', 'practice_name').distinct()
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "UPDATE frontend_denormalisedppusaving SET practice_name = %s "
+            "WHERE date = %s AND practice_id = %s",
+            [(nhs_titlecase(name), month, practice_id)
+             for practice_id, name in practice_names])
+
+
+def update_price_concessions(months):
+    """Update the price concession flags of the DenormalisedPPUSavings in
+    `months`, after NCSO concessions for those months have been imported
+    or matched to VMPPs.
+
+    If any flags change, an ImportLog is written, so that the API stops
+    serving cached responses with the old flags.
+
+    """
+    months = list(months)
+    if not months:
+        return
+    # Only rows whose flag is wrong are updated, so flipping the flag sets
+    # it to the right value, without evaluating the subquery again
+    sql = """
+      UPDATE frontend_denormalisedppusaving s
+      SET price_concession = NOT price_concession
+      WHERE date = ANY(%%s) AND price_concession <> %s
+    """ % PRICE_CONCESSION_SQL
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [months])
+        updated = cursor.rowcount
+    if updated:
+        ImportLog.objects.create(
+            category='ncso_concessions',
+            filename='n/a',
+            current_at=max(months))
+
+
 class Command(BaseCommand):
     args = ''
     help = 'Imports cost savings for a month'
@@ -252,6 +403,8 @@ class Command(BaseCommand):
                             pct_id=d.get('pct', None),
                             practice_id=d.get('practice', None)
                         )
+            make_ppu_bins_for_month(options['month'])
+            make_denormalised_savings_for_month(options['month'])
             ImportLog.objects.create(
                 category='ppu',
                 filename='n/a',
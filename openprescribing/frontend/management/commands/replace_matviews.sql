@@ -14,6 +14,20 @@ CREATE TABLE IF NOT EXISTS vw__presentation_summary (
 CREATE INDEX IF NOT EXISTS vw__idx_presentation_summary
   ON vw__presentation_summary(presentation_code varchar_pattern_ops);
 
+DROP TABLE IF EXISTS vw__bnf_prefix_summary;
+CREATE TABLE IF NOT EXISTS vw__bnf_prefix_summary (
+  processing_date date,
+  prefix_length integer,
+  bnf_prefix character varying(15),
+  items bigint,
+  cost double precision,
+  quantity bigint);
+
+CREATE INDEX IF NOT EXISTS vw__idx_bnf_prefix_summary
+  ON vw__bnf_prefix_summary(bnf_prefix, processing_date);
+CREATE INDEX IF NOT EXISTS vw__idx_bnf_prefix_summary_by_length
+  ON vw__bnf_prefix_summary(prefix_length, processing_date);
+
 DROP TABLE IF EXISTS vw__presentation_summary_by_ccg;
 CREATE TABLE IF NOT EXISTS vw__presentation_summary_by_ccg (
   processing_date date,
@@ -46,6 +60,7 @@ CREATE INDEX IF NOT EXISTS vw__idx_ccg_by_chem
 DROP TABLE IF EXISTS vw__chemical_summary_by_practice;
 CREATE TABLE IF NOT EXISTS vw__chemical_summary_by_practice (
   processing_date date,
+  pct_id character varying(3),
   practice_id character varying(6),
   chemical_id character varying(9),
   items bigint,
@@ -58,16 +73,76 @@ CREATE INDEX IF NOT EXISTS vw__idx_chem_by_practice
   ON vw__chemical_summary_by_practice (practice_id, chemical_id varchar_pattern_ops);
 CREATE INDEX IF NOT EXISTS idx_chem_by_practice_bydate
   ON vw__chemical_summary_by_practice (chemical_id varchar_pattern_ops, processing_date);
+CREATE INDEX IF NOT EXISTS vw__idx_ccg_practices_by_chem
+  ON vw__chemical_summary_by_practice (pct_id, chemical_id varchar_pattern_ops);
+
+DROP TABLE IF EXISTS vw__product_summary_by_ccg;
+CREATE TABLE IF NOT EXISTS vw__product_summary_by_ccg (
+  processing_date date,
+  pct_id character varying(3),
+  product_id character varying(11),
+  items bigint,
+  cost double precision,
+  quantity bigint);
+
+CREATE INDEX IF NOT EXISTS vw__idx_prod_by_ccg
+  ON vw__product_summary_by_ccg(product_id varchar_pattern_ops, pct_id);
+CREATE INDEX IF NOT EXISTS vw__idx_ccg_by_prod
+  ON vw__product_summary_by_ccg(pct_id, product_id varchar_pattern_ops);
+
+DROP TABLE IF EXISTS vw__product_summary_by_practice;
+CREATE TABLE IF NOT EXISTS vw__product_summary_by_practice (
+  processing_date date,
+  pct_id character varying(3),
+  practice_id character varying(6),
+  product_id character varying(11),
+  items bigint,
+  cost double precision,
+  quantity bigint);
+
+CREATE INDEX IF NOT EXISTS vw__idx_practice_by_prod
+  ON vw__product_summary_by_practice (product_id varchar_pattern_ops, practice_id);
+CREATE INDEX IF NOT EXISTS vw__idx_prod_by_practice
+  ON vw__product_summary_by_practice (practice_id, product_id varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS vw__idx_prod_by_practice_bydate
+  ON vw__product_summary_by_practice (product_id varchar_pattern_ops, processing_date);
+CREATE INDEX IF NOT EXISTS vw__idx_ccg_practices_by_prod
+  ON vw__product_summary_by_practice (pct_id, product_id varchar_pattern_ops);
+
+DROP TABLE IF EXISTS vw__chemical_ranking_by_practice;
+CREATE TABLE IF NOT EXISTS vw__chemical_ranking_by_practice (
+  processing_date date,
+  pct_id character varying(3),
+  practice_id character varying(6),
+  chemical_id character varying(9),
+  items bigint,
+  cost double precision,
+  quantity bigint,
+  total_list_size integer,
+  items_per_1000 double precision,
+  cost_per_1000 double precision,
+  items_per_1000_rank integer,
+  items_per_1000_percentile double precision,
+  cost_per_1000_rank integer,
+  cost_per_1000_percentile double precision,
+  practice_count integer);
+
+CREATE INDEX IF NOT EXISTS vw__idx_chem_ranking_by_items
+  ON vw__chemical_ranking_by_practice (chemical_id, processing_date, items_per_1000_rank);
+CREATE INDEX IF NOT EXISTS vw__idx_chem_ranking_by_cost
+  ON vw__chemical_ranking_by_practice (chemical_id, processing_date, cost_per_1000_rank);
 
 DROP TABLE IF EXISTS vw__practice_summary;
 CREATE TABLE IF NOT EXISTS vw__practice_summary (
   processing_date date,
+  pct_id character varying(3),
   practice_id character varying(6),
   items bigint,
   cost double precision,
   quantity bigint);
 
 CREATE INDEX IF NOT EXISTS vw__practice_summary_prac_id ON vw__practice_summary(practice_id);
+CREATE INDEX IF NOT EXISTS vw__practice_summary_pct_id ON vw__practice_summary(pct_id, processing_date);
 
 
 DROP TABLE IF EXISTS vw__ccgstatistics;
@@ -0,0 +1,31 @@
+-- Monthly totals at every level of the BNF hierarchy (chapter, section,
+-- paragraph, sub-paragraph, chemical, product and presentation), so that
+-- total spending can be looked up by prefix rather than by matching LIKE
+-- patterns against every presentation.  National totals are the sum of
+-- the chapter-level rows.
+SELECT
+  processing_date,
+  prefix_length,
+  SUBSTR(presentation_code, 1, prefix_length) AS bnf_prefix,
+  SUM(items) AS items,
+  SUM(cost) AS cost,
+  CAST(SUM(quantity) AS INT64) AS quantity
+FROM (
+  SELECT
+    month AS processing_date,
+    bnf_code AS presentation_code,
+    SUM(items) AS items,
+    SUM(actual_cost) AS cost,
+    SUM(quantity) AS quantity
+  FROM
+    {hscic}.normalised_prescribing_standard
+  WHERE month > TIMESTAMP(DATE_SUB(DATE "{{this_month}}", INTERVAL 5 YEAR))
+  GROUP BY
+    processing_date,
+    presentation_code
+)
+CROSS JOIN UNNEST([2, 4, 6, 8, 9, 11, 15]) AS prefix_length
+GROUP BY
+  processing_date,
+  prefix_length,
+  bnf_prefix
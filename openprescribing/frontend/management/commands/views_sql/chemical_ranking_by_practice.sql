@@ -0,0 +1,58 @@
+WITH chemical_summary AS (
+  SELECT
+    month AS processing_date,
+    pct AS pct_id,
+    practice AS practice_id,
+    SUBSTR(bnf_code, 1, 9) AS chemical_id,
+    SUM(items) AS items,
+    SUM(actual_cost) AS cost,
+    CAST(SUM(quantity) AS INT64) AS quantity
+  FROM
+    {hscic}.normalised_prescribing_standard
+  WHERE month > TIMESTAMP(DATE_SUB(DATE "{{this_month}}", INTERVAL 3 MONTH))
+  GROUP BY
+    processing_date,
+    pct_id,
+    practice_id,
+    chemical_id
+),
+ratios AS (
+  SELECT
+    rx.*,
+    statistics.total_list_size AS total_list_size,
+    1000 * rx.items / statistics.total_list_size AS items_per_1000,
+    1000 * rx.cost / statistics.total_list_size AS cost_per_1000
+  FROM
+    chemical_summary rx
+  JOIN {hscic}.practice_statistics AS statistics
+  ON (statistics.practice = rx.practice_id
+      AND statistics.month = rx.processing_date)
+  WHERE statistics.total_list_size > 0
+)
+SELECT
+  processing_date,
+  pct_id,
+  practice_id,
+  chemical_id,
+  items,
+  cost,
+  quantity,
+  total_list_size,
+  items_per_1000,
+  cost_per_1000,
+  RANK() OVER (
+    PARTITION BY processing_date, chemical_id
+    ORDER BY items_per_1000 DESC) AS items_per_1000_rank,
+  100 * PERCENT_RANK() OVER (
+    PARTITION BY processing_date, chemical_id
+    ORDER BY items_per_1000) AS items_per_1000_percentile,
+  RANK() OVER (
+    PARTITION BY processing_date, chemical_id
+    ORDER BY cost_per_1000 DESC) AS cost_per_1000_rank,
+  100 * PERCENT_RANK() OVER (
+    PARTITION BY processing_date, chemical_id
+    ORDER BY cost_per_1000) AS cost_per_1000_percentile,
+  COUNT(*) OVER (
+    PARTITION BY processing_date, chemical_id) AS practice_count
+FROM
+  ratios
@@ -1,5 +1,6 @@
 SELECT
   month AS processing_date,
+  pct AS pct_id,
   practice AS practice_id,
   SUBSTR(bnf_code, 1, 9) AS chemical_id,
   SUM(items) AS items,
@@ -10,5 +11,6 @@ FROM
 WHERE month > TIMESTAMP(DATE_SUB(DATE "{{this_month}}", INTERVAL 5 YEAR))
 GROUP BY
   processing_date,
+  pct_id,
   practice_id,
   chemical_id
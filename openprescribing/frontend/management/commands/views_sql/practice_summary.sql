@@ -1,5 +1,6 @@
 SELECT
   month AS processing_date,
+  pct AS pct_id,
   practice AS practice_id,
   SUM(items) AS items,
   SUM(actual_cost) AS cost,
@@ -9,4 +10,5 @@ FROM
 WHERE month > TIMESTAMP(DATE_SUB(DATE "{{this_month}}", INTERVAL 5 YEAR))
 GROUP BY
   processing_date,
+  pct_id,
   practice_id
@@ -1,9 +1,11 @@
 from django.db.models import Q
+from django.db import connection
 from django.db import models
+from django.db import transaction
 
 
 class MeasureValueManager(models.Manager):
-    def by_ccg(self, org_ids, measure_id=None, tags=None):
+    def by_ccg(self, org_ids, measure_id=None, tags=None, since=None):
         org_Q = Q()
         for org_id in org_ids:
             org_Q |= Q(pct_id=org_id)
@@ -23,9 +25,12 @@ class MeasureValueManager(models.Manager):
         if tags:
             qs = qs.filter(measure__tags__contains=tags)
 
+        if since:
+            qs = qs.filter(month__gte=since)
+
         return qs
 
-    def by_practice(self, org_ids, measure_id=None, tags=None):
+    def by_practice(self, org_ids, measure_id=None, tags=None, since=None):
         org_Q = Q()
         for org_id in org_ids:
             if len(org_id) == 3:
@@ -46,4 +51,98 @@ class MeasureValueManager(models.Manager):
         if tags:
             qs = qs.filter(measure__tags__contains=tags)
 
+        if since:
+            qs = qs.filter(month__gte=since)
+
+        return qs
+
+
+class MeasureSeriesManager(models.Manager):
+    def by_ccg(self, org_ids, measure_id=None, tags=None):
+        org_Q = Q()
+        for org_id in org_ids:
+            org_Q |= Q(pct_id=org_id)
+
+        qs = self.select_related('pct', 'measure').\
+            filter(
+                org_Q,
+                pct__org_type='CCG',
+                pct__close_date__isnull=True,
+                practice_id__isnull=True,
+            ).\
+            order_by('pct_id', 'measure_id')
+
+        if measure_id:
+            qs = qs.filter(measure_id=measure_id)
+
+        if tags:
+            qs = qs.filter(measure__tags__contains=tags)
+
         return qs
+
+    def by_practice(self, org_ids, measure_id=None, tags=None):
+        org_Q = Q()
+        for org_id in org_ids:
+            if len(org_id) == 3:
+                org_Q |= Q(pct_id=org_id)
+            else:
+                org_Q |= Q(practice_id=org_id)
+
+        qs = self.select_related('practice', 'measure').\
+            filter(
+                practice_id__isnull=False,
+            ).\
+            filter(org_Q).\
+            order_by('practice_id', 'measure_id')
+
+        if measure_id:
+            qs = qs.filter(measure_id=measure_id)
+
+        if tags:
+            qs = qs.filter(measure__tags__contains=tags)
+
+        return qs
+
+    def rebuild(self, measure_ids=None):
+        """Replace the series for the measures in `measure_ids`, or for
+        every measure, with ones built from frontend_measurevalue.
+
+        A practice has one series for each measure, even if it has moved
+        between CCGs, with the CCG it belonged to in its latest month.
+
+        """
+        qs = self.all()
+        params = []
+        where = ''
+        if measure_ids is not None:
+            qs = qs.filter(measure_id__in=measure_ids)
+            params.append(list(measure_ids))
+            where = 'WHERE measure_id = ANY(%s)'
+        savings = ', '.join(
+            "(cost_savings->>'%s')::float8" % centile
+            for centile in self.model.SAVINGS_CENTILES)
+        sql = """
+            INSERT INTO frontend_measureseries
+              (measure_id, pct_id, practice_id, months, numerator,
+               denominator, calc_value, percentile, cost_savings)
+            SELECT
+              measure_id,
+              (array_agg(pct_id ORDER BY month DESC))[1],
+              practice_id,
+              array_agg(month ORDER BY month),
+              array_agg(numerator ORDER BY month),
+              array_agg(denominator ORDER BY month),
+              array_agg(calc_value ORDER BY month),
+              array_agg(percentile ORDER BY month),
+              CASE WHEN bool_or(cost_savings IS NOT NULL)
+                THEN array_agg(ARRAY[%s] ORDER BY month)
+              END
+            FROM frontend_measurevalue
+            %s
+            GROUP BY measure_id, practice_id,
+              CASE WHEN practice_id IS NULL THEN pct_id END""" % (
+            savings, where)
+        with transaction.atomic():
+            qs.delete()
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2017-10-09 10:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.core.validators
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('frontend', '0031_auto_20171004_1330'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PPUBin',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('presentation_code', models.CharField(max_length=15, validators=[django.core.validators.RegexValidator(b'^[\\w]*$', code=b'Invalid name', message=b'name must be alphanumeric')])),
+                ('price_per_unit', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('quantity', models.FloatField()),
+                ('net_cost', models.FloatField(null=True)),
+                ('pct', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='frontend.PCT')),
+                ('practice', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='frontend.Practice')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='ppubin',
+            index_together=set([('date', 'presentation_code')]),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2017-10-12 11:04
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.core.validators
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('frontend', '0033_requestlatency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DenormalisedPPUSaving',
+            fields=[
+                ('saving', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, serialize=False, to='frontend.PPUSaving')),
+                ('date', models.DateField()),
+                ('bnf_code', models.CharField(max_length=15, validators=[django.core.validators.RegexValidator(b'^[\\w]*$', code=b'Invalid name', message=b'name must be alphanumeric')])),
+                ('lowest_decile', models.FloatField()),
+                ('quantity', models.IntegerField()),
+                ('price_per_unit', models.FloatField()),
+                ('possible_savings', models.FloatField()),
+                ('formulation_swap', models.TextField(blank=True, null=True)),
+                ('name', models.CharField(max_length=400, null=True)),
+                ('practice_name', models.CharField(max_length=200, null=True)),
+                ('flag_bioequivalence', models.NullBooleanField()),
+                ('price_concession', models.BooleanField(default=False)),
+                ('pct', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='frontend.PCT')),
+                ('practice', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='frontend.Practice')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='denormalisedppusaving',
+            index_together=set([('date', 'pct', 'practice', 'bnf_code'), ('date', 'bnf_code'), ('date', 'practice')]),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2017-10-19 10:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('frontend', '0034_denormalisedppusaving'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasurePayload',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('org_type', models.CharField(max_length=8)),
+                ('org_id', models.CharField(max_length=6)),
+                ('tag', models.CharField(blank=True, max_length=30)),
+                ('payload', models.BinaryField()),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='measurepayload',
+            unique_together=set([('org_type', 'org_id', 'tag')]),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2017-10-20 09:41
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('frontend', '0035_measurepayload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasureSeries',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('months', django.contrib.postgres.fields.ArrayField(base_field=models.DateField(), size=None)),
+                ('numerator', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), size=None)),
+                ('denominator', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), size=None)),
+                ('calc_value', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), size=None)),
+                ('percentile', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), size=None)),
+                ('cost_savings', django.contrib.postgres.fields.ArrayField(base_field=django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), size=None), blank=True, null=True, size=None)),
+                ('measure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='frontend.Measure')),
+                ('pct', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='frontend.PCT')),
+                ('practice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='frontend.Practice')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='measureseries',
+            unique_together=set([('measure', 'pct', 'practice')]),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('frontend', '0036_measureseries'),
+    ]
+
+    # The bubble API selects bins with presentation_code LIKE patterns,
+    # which can only use an index with varchar_pattern_ops
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX frontend_ppubin_date_presentation_code_like "
+            "ON frontend_ppubin (date, presentation_code varchar_pattern_ops)",
+            "DROP INDEX frontend_ppubin_date_presentation_code_like"
+        ),
+    ]
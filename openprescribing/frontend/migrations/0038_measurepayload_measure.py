@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('frontend', '0037_ppubin_presentation_code_pattern_index'),
+    ]
+
+    # Payloads are now held for each measure rather than each tag.  The
+    # existing ones can't be converted, and are rewritten by the next run
+    # of import_measures; until then, the views render responses from
+    # MeasureSeries.
+    operations = [
+        migrations.RunSQL(
+            "DELETE FROM frontend_measurepayload",
+            migrations.RunSQL.noop
+        ),
+        migrations.AlterUniqueTogether(
+            name='measurepayload',
+            unique_together=set([]),
+        ),
+        migrations.RemoveField(
+            model_name='measurepayload',
+            name='tag',
+        ),
+        migrations.AddField(
+            model_name='measurepayload',
+            name='measure',
+            field=models.ForeignKey(default='', on_delete=django.db.models.deletion.CASCADE, to='frontend.Measure'),
+            preserve_default=False,
+        ),
+        migrations.AlterUniqueTogether(
+            name='measurepayload',
+            unique_together=set([('org_type', 'org_id', 'measure')]),
+        ),
+    ]
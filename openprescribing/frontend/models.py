@@ -13,6 +13,7 @@ from anymail.signals import EventType
 
 from common.utils import nhs_titlecase
 from dmd.models import DMDProduct
+from frontend.managers import MeasureSeriesManager
 from frontend.managers import MeasureValueManager
 from frontend.validators import isAlphaNumeric
 from frontend import model_prescribing_units
@@ -515,6 +516,73 @@ class MeasureValue(models.Model):
     objects = MeasureValueManager()
 
 
+class MeasureSeries(models.Model):
+    '''
+    All the MeasureValues for a measure and an organisation, as parallel
+    arrays with an element for each month in `months`, in order.  This
+    is much more compact than a row per month, and is what the measures
+    API and alerts read.  It is rebuilt from MeasureValue by
+    import_measures.
+    '''
+    # The keys of MeasureValue.cost_savings, in the order they are held
+    # in the arrays in cost_savings
+    SAVINGS_CENTILES = ['10', '20', '30', '40', '50', '60', '70', '80', '90']
+
+    measure = models.ForeignKey(Measure)
+    pct = models.ForeignKey(PCT, null=True, blank=True)
+    practice = models.ForeignKey(Practice, null=True, blank=True)
+    months = ArrayField(models.DateField())
+
+    numerator = ArrayField(models.FloatField(null=True))
+    denominator = ArrayField(models.FloatField(null=True))
+    calc_value = ArrayField(models.FloatField(null=True))
+    percentile = ArrayField(models.FloatField(null=True))
+
+    # For each month, the cost savings at each of SAVINGS_CENTILES.
+    # Null for measures which are not cost-based.
+    cost_savings = ArrayField(
+        ArrayField(models.FloatField(null=True)), null=True, blank=True)
+
+    class Meta:
+        app_label = 'frontend'
+        unique_together = (('measure', 'pct', 'practice'),)
+
+    objects = MeasureSeriesManager()
+
+    def measure_values(self, since=None):
+        """Return unsaved MeasureValues for each month in the series, from
+        `since` onwards if given.
+        """
+        if self.practice_id:
+            orgs = {'practice': self.practice, 'pct_id': self.pct_id}
+        else:
+            orgs = {'pct': self.pct}
+        cost_savings = self.cost_savings or [None] * len(self.months)
+        measure_values = []
+        for i, month in enumerate(self.months):
+            if since and month < since:
+                continue
+            measure_values.append(MeasureValue(
+                measure=self.measure,
+                month=month,
+                numerator=self.numerator[i],
+                denominator=self.denominator[i],
+                calc_value=self.calc_value[i],
+                percentile=self.percentile[i],
+                cost_savings=self._savings_dict(cost_savings[i]),
+                **orgs))
+        return measure_values
+
+    def _savings_dict(self, savings):
+        if savings is None:
+            return None
+        savings = dict(
+            (centile, saving)
+            for centile, saving in zip(self.SAVINGS_CENTILES, savings)
+            if saving is not None)
+        return savings or None
+
+
 class MeasureGlobal(models.Model):
     '''
     An instance of the global values for a measure,
@@ -563,6 +631,26 @@ class MeasureGlobal(models.Model):
         unique_together = (('measure', 'month'),)
 
 
+class MeasurePayload(models.Model):
+    """The values of a measure for a single org, as served in the
+    `data` of the measure_by_ccg or measure_by_practice API views, as
+    zlib-compressed JSON.
+
+    For practices, org_id may also be a CCG code, for all the practices
+    in that CCG.  These are written by import_measures (see
+    api.measure_payloads).
+
+    """
+    org_type = models.CharField(max_length=8)
+    org_id = models.CharField(max_length=6)
+    measure = models.ForeignKey(Measure)
+    payload = models.BinaryField()
+
+    class Meta:
+        app_label = 'frontend'
+        unique_together = ('org_type', 'org_id', 'measure')
+
+
 class TruncatingCharField(models.CharField):
     def get_prep_value(self, value):
         value = super(TruncatingCharField, self).get_prep_value(value)
@@ -795,6 +883,34 @@ class GenericCodeMapping(models.Model):
                                validators=[isAlphaNumeric], db_index=True)
 
 
+class PPUBin(models.Model):
+    """The total quantity and net cost of a presentation prescribed at
+    each price-per-unit (rounded to the penny) in a month, by standard
+    GP practices.  These are computed monthly by import_ppu_savings, and
+    are used to draw the bubble chart of price-per-unit.
+
+    Records with a blank pct_id and practice_id are for England as a
+    whole; those with a blank practice_id are for a CCG; those with a
+    practice_id are for a practice.
+
+    """
+    date = models.DateField()
+    presentation_code = models.CharField(max_length=15,
+                                         validators=[isAlphaNumeric])
+    pct = models.ForeignKey(PCT, null=True, blank=True, db_constraint=False)
+    practice = models.ForeignKey(
+        Practice, null=True, blank=True, db_constraint=False)
+    # NULL where the quantity prescribed was zero
+    price_per_unit = models.DecimalField(
+        max_digits=14, decimal_places=2, null=True)
+    quantity = models.FloatField()
+    net_cost = models.FloatField(null=True)
+
+    class Meta:
+        app_label = 'frontend'
+        index_together = [['date', 'presentation_code']]
+
+
 class PPUSaving(models.Model):
     """A Price-per-unit Saving describes a possible saving for a CCG or a
     practice for an individual presentation.
@@ -816,3 +932,52 @@ class PPUSaving(models.Model):
     pct = models.ForeignKey(PCT, null=True, blank=True, db_index=True)
     practice = models.ForeignKey(
         Practice, null=True, blank=True, db_index=True)
+
+
+class DenormalisedPPUSaving(models.Model):
+    """A PPUSaving together with everything the price-per-unit API serves
+    about it: the name of its presentation from the dm+d, the cased name
+    of its practice, and whether it is non-bioequivalent or has a price
+    concession.  These are computed monthly by import_ppu_savings.
+
+    """
+    saving = models.OneToOneField(
+        PPUSaving, primary_key=True, db_constraint=False,
+        on_delete=models.DO_NOTHING)
+    date = models.DateField()
+    bnf_code = models.CharField(max_length=15, validators=[isAlphaNumeric])
+    pct = models.ForeignKey(PCT, null=True, blank=True, db_constraint=False)
+    practice = models.ForeignKey(
+        Practice, null=True, blank=True, db_constraint=False)
+    lowest_decile = models.FloatField()
+    quantity = models.IntegerField()
+    price_per_unit = models.FloatField()
+    possible_savings = models.FloatField()
+    formulation_swap = models.TextField(null=True, blank=True)
+    name = models.CharField(max_length=400, null=True)
+    practice_name = models.CharField(max_length=200, null=True)
+    flag_bioequivalence = models.NullBooleanField()
+    price_concession = models.BooleanField(default=False)
+
+    class Meta:
+        app_label = 'frontend'
+        index_together = [
+            ['date', 'pct', 'practice', 'bnf_code'],
+            ['date', 'bnf_code'],
+            ['date', 'practice'],
+        ]
+
+
+class RequestLatency(models.Model):
+    """The number of requests to a view which took a time in a given
+    latency bucket.  See api.instrumentation for the bounds of the
+    buckets.
+
+    """
+    view_name = models.CharField(max_length=200)
+    bucket = models.IntegerField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        app_label = 'frontend'
+        unique_together = ('view_name', 'bucket')
@@ -10,7 +10,9 @@ from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from api.response_cache import clear_response_cache
 from common.utils import google_user_id
+from frontend.models import ImportLog
 from frontend.models import MailLog
 from frontend.models import Profile
 
@@ -23,6 +25,13 @@ def handle_user_save(sender, instance, created, **kwargs):
         Profile.objects.create(user=instance)
 
 
+@receiver(post_save, sender=ImportLog)
+def handle_import_log_save(sender, instance, **kwargs):
+    # Cached API responses are keyed on the latest imports, so will no
+    # longer be used
+    clear_response_cache()
+
+
 @receiver(user_logged_in, sender=User)
 def handle_user_logged_in(sender, request, user, **kwargs):
     user.searchbookmark_set.update(approved=True)
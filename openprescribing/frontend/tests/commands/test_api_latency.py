@@ -0,0 +1,44 @@
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.instrumentation import latency_bucket
+from frontend.models import RequestLatency
+
+
+class CommandTestCase(TestCase):
+    def setUp(self):
+        RequestLatency.objects.create(
+            view_name='api.views_spending.bubble',
+            bucket=latency_bucket(10), count=99)
+        RequestLatency.objects.create(
+            view_name='api.views_spending.bubble',
+            bucket=latency_bucket(1000), count=1)
+        RequestLatency.objects.create(
+            view_name='frontend.views.views.home',
+            bucket=latency_bucket(10), count=1)
+
+    def _report(self, **options):
+        out = StringIO()
+        call_command('api_latency', stdout=out, **options)
+        return [line.split('\t') for line in out.getvalue().splitlines()]
+
+    def test_reports_api_views(self):
+        rows = self._report()
+        self.assertEqual(rows[0], ['view', 'requests', 'p50', 'p95', 'p99'])
+        rows = dict((row[0], row[1:]) for row in rows[1:])
+        self.assertEqual(rows['api.views_spending.bubble'],
+                         ['100', '11', '11', '11'])
+        self.assertEqual(rows['api.views_spending.tariff'],
+                         ['0', '-', '-', '-'])
+        self.assertNotIn('frontend.views.views.home', rows)
+
+    def test_reports_all_views(self):
+        rows = self._report(all_views=True)
+        self.assertEqual([row[0] for row in rows[1:]], [
+            'api.views_spending.bubble', 'frontend.views.views.home'])
+
+    def test_reset(self):
+        self._report(reset=True)
+        self.assertEqual(RequestLatency.objects.count(), 0)
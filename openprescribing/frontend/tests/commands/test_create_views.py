@@ -3,7 +3,10 @@ import os
 from django.core.management import call_command
 from django.db import connection
 from django.test import SimpleTestCase
+from django.test import TestCase
+from mock import patch
 
+from api.response_cache import get_data_versions
 from gcutils.bigquery import Client
 from frontend.models import ImportLog, PCT, PracticeStatistics
 from frontend.bq_schemas import (CCG_SCHEMA, PRACTICE_STATISTICS_SCHEMA,
@@ -108,10 +111,11 @@ class CommandsTestCase(SimpleTestCase):
             c.execute(cmd)
             results = c.fetchall()
             self.assertEqual(len(results), 2)
-            self.assertEqual(results[1][1], 'P87629')
-            self.assertEqual(results[1][2], 385)
-            self.assertEqual(results[1][3], 6000)
-            self.assertEqual(results[1][4], 38500)
+            self.assertEqual(results[1][1], '03V')
+            self.assertEqual(results[1][2], 'P87629')
+            self.assertEqual(results[1][3], 385)
+            self.assertEqual(results[1][4], 6000)
+            self.assertEqual(results[1][5], 38500)
 
             cmd = 'SELECT * FROM vw__presentation_summary '
             cmd += 'ORDER BY processing_date, presentation_code'
@@ -150,11 +154,51 @@ class CommandsTestCase(SimpleTestCase):
             c.execute(cmd)
             results = c.fetchall()
             self.assertEqual(len(results), 2)
-            self.assertEqual(results[0][1], 'N84014')
-            self.assertEqual(results[0][2], '0703021Q0')
+            self.assertEqual(results[0][1], '03Q')
+            self.assertEqual(results[0][2], 'N84014')
+            self.assertEqual(results[0][3], '0703021Q0')
+            self.assertEqual(results[0][4], 1110)
+            self.assertEqual(results[0][5], 84000)
+            self.assertEqual(results[0][6], 111000)
+
+            cmd = 'SELECT * FROM vw__product_summary_by_ccg '
+            cmd += 'ORDER BY processing_date, product_id'
+            c.execute(cmd)
+            results = c.fetchall()
+            self.assertEqual(len(results), 4)
+            self.assertEqual(results[0][1], '03Q')
+            self.assertEqual(results[0][2], '0703021Q0AA')
+            self.assertEqual(results[0][3], 300)
+            self.assertEqual(results[0][4], 3000)
+            self.assertEqual(results[0][5], 30000)
+
+            cmd = 'SELECT * FROM vw__product_summary_by_practice '
+            cmd += 'ORDER BY processing_date, product_id'
+            c.execute(cmd)
+            results = c.fetchall()
+            self.assertEqual(len(results), 4)
+            self.assertEqual(results[1][1], '03Q')
+            self.assertEqual(results[1][2], 'N84014')
+            self.assertEqual(results[1][3], '0703021Q0BB')
+            self.assertEqual(results[1][4], 810)
+            self.assertEqual(results[1][5], 81000)
+            self.assertEqual(results[1][6], 81000)
+
+            cmd = 'SELECT * FROM vw__bnf_prefix_summary '
+            cmd += 'ORDER BY processing_date, prefix_length, bnf_prefix'
+            c.execute(cmd)
+            results = c.fetchall()
+            self.assertEqual(len(results), 16)
+            self.assertEqual(results[0][1], 2)
+            self.assertEqual(results[0][2], '07')
             self.assertEqual(results[0][3], 1110)
             self.assertEqual(results[0][4], 84000)
             self.assertEqual(results[0][5], 111000)
+            self.assertEqual(results[6][1], 15)
+            self.assertEqual(results[6][2], '0703021Q0AAAAAA')
+            self.assertEqual(results[6][3], 300)
+            self.assertEqual(results[6][4], 3000)
+            self.assertEqual(results[6][5], 30000)
 
             cmd = 'SELECT * FROM vw__ccgstatistics '
             cmd += 'ORDER BY date, pct_id'
@@ -180,3 +224,17 @@ class CommandsTestCase(SimpleTestCase):
             )
 
         self.assertEqual(cmd, exp_cmd)
+
+
+class DataVersionTestCase(TestCase):
+    @patch('frontend.management.commands.create_views.Command.'
+           'download_and_import')
+    @patch('frontend.management.commands.create_views.Pool')
+    @patch('frontend.management.commands.create_views.Client')
+    def test_create_views_changes_data_versions(self, *mocks):
+        ImportLog.objects.create(
+            category='prescribing', current_at='2015-10-01')
+        versions = get_data_versions()
+        call_command('create_views')
+        self.assertNotEqual(get_data_versions(), versions)
+        self.assertTrue(ImportLog.objects.filter(category='views').exists())
@@ -9,6 +9,7 @@ from mock import MagicMock
 
 from django.conf import settings
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 
 from frontend.bq_schemas import CCG_SCHEMA, PRACTICE_SCHEMA, PRESCRIBING_SCHEMA
@@ -84,6 +85,70 @@ class UnitTests(TestCase):
                     .return_value.execute.mock_calls
         self.assertGreater(calls, 0)
 
+    @patch('frontend.management.commands.import_measures.'
+           'write_measure_payloads')
+    @patch('frontend.management.commands.import_measures.import_measure')
+    def test_parallel_import_reports_failed_measures(
+            self, import_measure, write_measure_payloads):
+        def fail_for_b(measure_id, options):
+            if measure_id == 'b':
+                raise ValueError('BigQuery job failed')
+        import_measure.side_effect = fail_for_b
+        with self.assertRaisesRegexp(CommandError, '1 of 3 measures.*: b'):
+            call_command(
+                'import_measures', measure='a,b,c', month='2015-01-01',
+                parallel=2)
+        self.assertEqual(
+            sorted(c[0][0] for c in import_measure.call_args_list),
+            ['a', 'b', 'c'])
+        write_measure_payloads.assert_not_called()
+
+    @patch('frontend.management.commands.import_measures.'
+           'write_measure_payloads')
+    @patch('frontend.management.commands.import_measures.import_measure')
+    def test_definitions_only_import_writes_import_log(
+            self, import_measure, write_measure_payloads):
+        from frontend.models import ImportLog
+        call_command(
+            'import_measures', measure='a', month='2015-01-01',
+            definitions_only=True)
+        write_measure_payloads.assert_not_called()
+        self.assertTrue(ImportLog.objects.filter(
+            category='measure_definitions').exists())
+        self.assertFalse(
+            ImportLog.objects.filter(category='measures').exists())
+
+    @patch('frontend.management.commands.import_measures.MeasureSeries')
+    @patch('frontend.management.commands.import_measures.'
+           'write_measure_payloads')
+    @patch('frontend.management.commands.import_measures.import_measure')
+    def test_import_rewrites_payloads_of_measures_imported(
+            self, import_measure, write_measure_payloads, measure_series):
+        call_command('import_measures', measure='a,b', month='2015-01-01')
+        measure_series.objects.rebuild.assert_called_once_with(['a', 'b'])
+        write_measure_payloads.assert_called_once_with(['a', 'b'])
+
+    def test_incremental_import_only_calculates_new_months(self):
+        from frontend.management.commands.import_measures \
+            import delete_values_before, first_uncalculated_month
+        measure = Measure.objects.get(pk='cerazette')
+        self.assertEqual(
+            first_uncalculated_month(measure, '2014-11-01'), '2014-11-01')
+        for month in ['2014-11-01', '2014-12-01', '2015-01-01']:
+            MeasureGlobal.objects.create(measure=measure, month=month)
+            MeasureValue.objects.create(measure=measure, month=month)
+        self.assertEqual(
+            first_uncalculated_month(measure, '2014-11-01'), '2015-02-01')
+        self.assertEqual(
+            first_uncalculated_month(measure, '2015-06-01'), '2015-06-01')
+
+        delete_values_before(measure, '2014-12-01')
+        self.assertEqual(
+            [str(m) for m in MeasureGlobal.objects.values_list(
+                'month', flat=True).order_by('month')],
+            ['2014-12-01', '2015-01-01'])
+        self.assertEqual(MeasureValue.objects.count(), 2)
+
 
 class BigqueryFunctionalTests(TestCase):
     @classmethod
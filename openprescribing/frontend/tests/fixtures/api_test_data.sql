@@ -12,29 +12,55 @@ INSERT INTO vw__chemical_summary_by_ccg VALUES('2014-10-01'::date,'03Q','0202010
 INSERT INTO vw__chemical_summary_by_ccg VALUES('2014-09-01'::date,'03Q','0202010F0',1,11.99,128);
 INSERT INTO vw__chemical_summary_by_ccg VALUES('2014-11-01'::date,'03V','0202010B0',62,54.26,2788);
 INSERT INTO vw__chemical_summary_by_ccg VALUES('2013-04-01'::date,'03Q','0202010F0',2,3.05,56);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2013-04-01'::date,'N84014','0202010F0',2,3.05,56);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2014-09-01'::date,'N84014','0202010F0',1,11.99,128);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2014-11-01'::date,'P87629','0202010B0',38,42.13,1399);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2014-11-01'::date,'K83059','0204000I0',16,14.15,1154);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2013-08-01'::date,'N84014','0202010F0',1,1.53,28);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2014-10-01'::date,'N84014','0202010B0',50,58.08,1953);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2014-09-01'::date,'P87629','0202010F0',1,1.99,32);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2013-08-01'::date,'P87629','0202010B0',1,1.69,23);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2014-11-01'::date,'K83059','0202010B0',24,12.13,1389);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2014-09-01'::date,'P87629','0202010B0',40,36.29,1209);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2014-11-01'::date,'P87629','0204000I0',17,22.13,1200);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2013-10-01'::date,'P87629','0202010B0',1,1.62,24);
-INSERT INTO vw__chemical_summary_by_practice VALUES('2013-04-01'::date,'P87629','0202010B0',1,1.56,26);
-INSERT INTO vw__practice_summary VALUES('2013-04-01'::date,'N84014',2,3.05,56);
-INSERT INTO vw__practice_summary VALUES('2014-09-01'::date,'N84014',1,11.99,128);
-INSERT INTO vw__practice_summary VALUES('2014-10-01'::date,'N84014',50,58.08,1953);
-INSERT INTO vw__practice_summary VALUES('2013-08-01'::date,'N84014',1,1.53,28);
-INSERT INTO vw__practice_summary VALUES('2014-09-01'::date,'P87629',41,38.28,1241);
-INSERT INTO vw__practice_summary VALUES('2013-08-01'::date,'P87629',1,1.69,23);
-INSERT INTO vw__practice_summary VALUES('2014-11-01'::date,'K83059',40,26.28,2543);
-INSERT INTO vw__practice_summary VALUES('2013-04-01'::date,'P87629',1,1.56,26);
-INSERT INTO vw__practice_summary VALUES('2013-10-01'::date,'P87629',1,1.62,24);
-INSERT INTO vw__practice_summary VALUES('2014-11-01'::date,'P87629',55,64.26,2599);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2013-04-01'::date,'03Q','N84014','0202010F0',2,3.05,56);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2014-09-01'::date,'03Q','N84014','0202010F0',1,11.99,128);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2014-11-01'::date,'03V','P87629','0202010B0',38,42.13,1399);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2014-11-01'::date,'03V','K83059','0204000I0',16,14.15,1154);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2013-08-01'::date,'03Q','N84014','0202010F0',1,1.53,28);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2014-10-01'::date,'03Q','N84014','0202010B0',50,58.08,1953);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2014-09-01'::date,'03V','P87629','0202010F0',1,1.99,32);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2013-08-01'::date,'03V','P87629','0202010B0',1,1.69,23);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2014-11-01'::date,'03V','K83059','0202010B0',24,12.13,1389);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2014-09-01'::date,'03V','P87629','0202010B0',40,36.29,1209);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2014-11-01'::date,'03V','P87629','0204000I0',17,22.13,1200);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2013-10-01'::date,'03V','P87629','0202010B0',1,1.62,24);
+INSERT INTO vw__chemical_summary_by_practice VALUES('2013-04-01'::date,'03V','P87629','0202010B0',1,1.56,26);
+INSERT INTO vw__product_summary_by_ccg VALUES('2014-11-01'::date,'03V','0202010B0AA',62,54.26,2788);
+INSERT INTO vw__product_summary_by_ccg VALUES('2013-08-01'::date,'03V','0202010B0AA',1,1.69,23);
+INSERT INTO vw__product_summary_by_ccg VALUES('2014-10-01'::date,'03Q','0202010B0AA',50,58.08,1953);
+INSERT INTO vw__product_summary_by_ccg VALUES('2014-09-01'::date,'03V','0202010F0AA',1,1.99,32);
+INSERT INTO vw__product_summary_by_ccg VALUES('2014-11-01'::date,'03V','0204000I0BC',29,32.26,2350);
+INSERT INTO vw__product_summary_by_ccg VALUES('2013-04-01'::date,'03V','0202010B0AA',1,1.56,26);
+INSERT INTO vw__product_summary_by_ccg VALUES('2013-10-01'::date,'03V','0202010B0AA',1,1.62,24);
+INSERT INTO vw__product_summary_by_ccg VALUES('2013-04-01'::date,'03Q','0202010F0AA',2,3.05,56);
+INSERT INTO vw__product_summary_by_ccg VALUES('2013-08-01'::date,'03Q','0202010F0AA',1,1.53,28);
+INSERT INTO vw__product_summary_by_ccg VALUES('2014-11-01'::date,'03V','0204000I0AA',4,4.02,4);
+INSERT INTO vw__product_summary_by_ccg VALUES('2014-09-01'::date,'03Q','0202010F0AA',1,11.99,128);
+INSERT INTO vw__product_summary_by_ccg VALUES('2014-09-01'::date,'03V','0202010B0AA',40,36.29,1209);
+INSERT INTO vw__product_summary_by_practice VALUES('2013-04-01'::date,'03Q','N84014','0202010F0AA',2,3.05,56);
+INSERT INTO vw__product_summary_by_practice VALUES('2014-09-01'::date,'03Q','N84014','0202010F0AA',1,11.99,128);
+INSERT INTO vw__product_summary_by_practice VALUES('2014-11-01'::date,'03V','P87629','0202010B0AA',38,42.13,1399);
+INSERT INTO vw__product_summary_by_practice VALUES('2014-11-01'::date,'03V','K83059','0204000I0BC',12,10.13,1150);
+INSERT INTO vw__product_summary_by_practice VALUES('2014-11-01'::date,'03V','K83059','0204000I0AA',4,4.02,4);
+INSERT INTO vw__product_summary_by_practice VALUES('2013-08-01'::date,'03Q','N84014','0202010F0AA',1,1.53,28);
+INSERT INTO vw__product_summary_by_practice VALUES('2014-10-01'::date,'03Q','N84014','0202010B0AA',50,58.08,1953);
+INSERT INTO vw__product_summary_by_practice VALUES('2014-09-01'::date,'03V','P87629','0202010F0AA',1,1.99,32);
+INSERT INTO vw__product_summary_by_practice VALUES('2013-08-01'::date,'03V','P87629','0202010B0AA',1,1.69,23);
+INSERT INTO vw__product_summary_by_practice VALUES('2014-11-01'::date,'03V','K83059','0202010B0AA',24,12.13,1389);
+INSERT INTO vw__product_summary_by_practice VALUES('2014-09-01'::date,'03V','P87629','0202010B0AA',40,36.29,1209);
+INSERT INTO vw__product_summary_by_practice VALUES('2014-11-01'::date,'03V','P87629','0204000I0BC',17,22.13,1200);
+INSERT INTO vw__product_summary_by_practice VALUES('2013-10-01'::date,'03V','P87629','0202010B0AA',1,1.62,24);
+INSERT INTO vw__product_summary_by_practice VALUES('2013-04-01'::date,'03V','P87629','0202010B0AA',1,1.56,26);
+INSERT INTO vw__practice_summary VALUES('2013-04-01'::date,'03Q','N84014',2,3.05,56);
+INSERT INTO vw__practice_summary VALUES('2014-09-01'::date,'03Q','N84014',1,11.99,128);
+INSERT INTO vw__practice_summary VALUES('2014-10-01'::date,'03Q','N84014',50,58.08,1953);
+INSERT INTO vw__practice_summary VALUES('2013-08-01'::date,'03Q','N84014',1,1.53,28);
+INSERT INTO vw__practice_summary VALUES('2014-09-01'::date,'03V','P87629',41,38.28,1241);
+INSERT INTO vw__practice_summary VALUES('2013-08-01'::date,'03V','P87629',1,1.69,23);
+INSERT INTO vw__practice_summary VALUES('2014-11-01'::date,'03V','K83059',40,26.28,2543);
+INSERT INTO vw__practice_summary VALUES('2013-04-01'::date,'03V','P87629',1,1.56,26);
+INSERT INTO vw__practice_summary VALUES('2013-10-01'::date,'03V','P87629',1,1.62,24);
+INSERT INTO vw__practice_summary VALUES('2014-11-01'::date,'03V','P87629',55,64.26,2599);
 INSERT INTO vw__presentation_summary VALUES('2014-11-01'::date,'0202010B0AAABAB',62,54.26,2788);
 INSERT INTO vw__presentation_summary VALUES('2014-11-01'::date,'0204000I0BCAAAB',29,32.26,2350);
 INSERT INTO vw__presentation_summary VALUES('2014-10-01'::date,'0202010B0AAABAB',50,58.08,1953);
@@ -58,3 +84,68 @@ INSERT INTO vw__presentation_summary_by_ccg VALUES('2013-08-01'::date,'03Q','020
 INSERT INTO vw__presentation_summary_by_ccg VALUES('2014-11-01'::date,'03V','0204000I0AAALAL',4,4.02,4);
 INSERT INTO vw__presentation_summary_by_ccg VALUES('2014-09-01'::date,'03Q','0202010F0AAAAAA',1,11.99,128);
 INSERT INTO vw__presentation_summary_by_ccg VALUES('2014-09-01'::date,'03V','0202010B0AAABAB',40,36.29,1209);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-04-01'::date,2,'02',3,4.61,82);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-04-01'::date,4,'0202',3,4.61,82);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-04-01'::date,6,'020201',3,4.61,82);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-04-01'::date,8,'0202010B',1,1.56,26);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-04-01'::date,8,'0202010F',2,3.05,56);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-04-01'::date,9,'0202010B0',1,1.56,26);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-04-01'::date,9,'0202010F0',2,3.05,56);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-04-01'::date,11,'0202010B0AA',1,1.56,26);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-04-01'::date,11,'0202010F0AA',2,3.05,56);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-04-01'::date,15,'0202010B0AAACAC',1,1.56,26);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-04-01'::date,15,'0202010F0AAAAAA',2,3.05,56);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-08-01'::date,2,'02',2,3.22,51);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-08-01'::date,4,'0202',2,3.22,51);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-08-01'::date,6,'020201',2,3.22,51);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-08-01'::date,8,'0202010B',1,1.69,23);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-08-01'::date,8,'0202010F',1,1.53,28);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-08-01'::date,9,'0202010B0',1,1.69,23);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-08-01'::date,9,'0202010F0',1,1.53,28);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-08-01'::date,11,'0202010B0AA',1,1.69,23);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-08-01'::date,11,'0202010F0AA',1,1.53,28);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-08-01'::date,15,'0202010B0AAACAC',1,1.69,23);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-08-01'::date,15,'0202010F0AAAAAA',1,1.53,28);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-10-01'::date,2,'02',1,1.62,24);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-10-01'::date,4,'0202',1,1.62,24);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-10-01'::date,6,'020201',1,1.62,24);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-10-01'::date,8,'0202010B',1,1.62,24);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-10-01'::date,9,'0202010B0',1,1.62,24);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-10-01'::date,11,'0202010B0AA',1,1.62,24);
+INSERT INTO vw__bnf_prefix_summary VALUES('2013-10-01'::date,15,'0202010B0AAACAC',1,1.62,24);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-09-01'::date,2,'02',42,50.27,1369);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-09-01'::date,4,'0202',42,50.27,1369);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-09-01'::date,6,'020201',42,50.27,1369);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-09-01'::date,8,'0202010B',40,36.29,1209);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-09-01'::date,8,'0202010F',2,13.98,160);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-09-01'::date,9,'0202010B0',40,36.29,1209);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-09-01'::date,9,'0202010F0',2,13.98,160);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-09-01'::date,11,'0202010B0AA',40,36.29,1209);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-09-01'::date,11,'0202010F0AA',2,13.98,160);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-09-01'::date,15,'0202010B0AAABAB',40,36.29,1209);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-09-01'::date,15,'0202010F0AAAAAA',2,13.98,160);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-10-01'::date,2,'02',50,58.08,1953);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-10-01'::date,4,'0202',50,58.08,1953);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-10-01'::date,6,'020201',50,58.08,1953);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-10-01'::date,8,'0202010B',50,58.08,1953);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-10-01'::date,9,'0202010B0',50,58.08,1953);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-10-01'::date,11,'0202010B0AA',50,58.08,1953);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-10-01'::date,15,'0202010B0AAABAB',50,58.08,1953);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,2,'02',95,90.54,5142);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,4,'0202',62,54.26,2788);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,4,'0204',33,36.28,2354);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,6,'020201',62,54.26,2788);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,6,'020400',33,36.28,2354);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,8,'0202010B',62,54.26,2788);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,8,'0204000I',33,36.28,2354);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,9,'0202010B0',62,54.26,2788);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,9,'0204000I0',33,36.28,2354);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,11,'0202010B0AA',62,54.26,2788);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,11,'0204000I0AA',4,4.02,4);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,11,'0204000I0BC',29,32.26,2350);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,15,'0202010B0AAABAB',62,54.26,2788);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,15,'0204000I0AAALAL',4,4.02,4);
+INSERT INTO vw__bnf_prefix_summary VALUES('2014-11-01'::date,15,'0204000I0BCAAAB',29,32.26,2350);
+INSERT INTO vw__chemical_ranking_by_practice VALUES('2014-11-01'::date,'03V','P87629','0202010B0',55,64.26,2599,1000,55.0,64.26,1,100.0,1,100.0,3);
+INSERT INTO vw__chemical_ranking_by_practice VALUES('2014-11-01'::date,'03V','K83059','0202010B0',7,3.26,244,500,14.0,6.52,2,50.0,2,50.0,3);
+INSERT INTO vw__chemical_ranking_by_practice VALUES('2014-11-01'::date,'03Q','N84014','0202010B0',1,1.0,10,2000,0.5,0.5,3,0.0,3,0.0,3);
@@ -0,0 +1,65 @@
+import json
+import urllib
+
+from mock import patch
+
+from .api_test_base import ApiTestBase
+
+
+class TestAPIBatchViews(ApiTestBase):
+
+    def _get_batch(self, *urls):
+        url = '%s/batch/?%s' % (
+            self.api_prefix, urllib.urlencode([('q', u) for u in urls]))
+        return self.client.get(url, follow=True)
+
+    def test_batch(self):
+        spending_url = '%s/spending_by_ccg/?code=0204000I0BC' % (
+            self.api_prefix)
+        response = self._get_batch(
+            spending_url, '%s/no_such_view/' % self.api_prefix, '/admin/')
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content)
+        self.assertEqual(
+            [(r['url'], r['status']) for r in results],
+            [(spending_url, 200),
+             ('%s/no_such_view/' % self.api_prefix, 404),
+             ('/admin/', 404)])
+        self.assertEqual(results[0]['data'], [{
+            'row_id': '03V',
+            'row_name': 'NHS Corby',
+            'date': '2014-11-01',
+            'actual_cost': 32.26,
+            'items': 29,
+            'quantity': 2350,
+        }])
+
+    def test_batch_cannot_be_nested(self):
+        nested_url = '%s/batch/?q=%s/org_code/' % (
+            self.api_prefix, self.api_prefix)
+        response = self._get_batch(nested_url)
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content)
+        self.assertEqual(results[0]['status'], 400)
+
+    def test_batch_not_valid(self):
+        self.assertEqual(self._get_batch().status_code, 400)
+        with self.settings(API_BATCH_MAX_REQUESTS=1):
+            response = self._get_batch(
+                '%s/org_code/' % self.api_prefix,
+                '%s/org_code/' % self.api_prefix)
+        self.assertEqual(response.status_code, 400)
+
+    def test_errors_are_not_exposed(self):
+        url = '%s/org_code/' % self.api_prefix
+        with patch('api.views_batch._get_sub_response',
+                   side_effect=Exception('password authentication failed')):
+            response = self._get_batch(url)
+        results = json.loads(response.content)
+        self.assertEqual(results[0]['status'], 500)
+        self.assertEqual(results[0]['data'], {'detail': 'Internal error'})
+
+    def test_batch_is_not_conditional(self):
+        response = self._get_batch('%s/org_code/' % self.api_prefix)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
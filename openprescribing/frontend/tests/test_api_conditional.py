@@ -0,0 +1,70 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api.conditional import conditional_page
+from frontend.models import ImportLog
+
+from .api_test_base import ApiTestBase
+
+
+class TestAPIConditionalGet(ApiTestBase):
+    url = '/api/1.0/spending_by_ccg/?format=json&code=0202010B0&org=03V'
+
+    def setUp(self):
+        super(TestAPIConditionalGet, self).setUp()
+        ImportLog.objects.create(
+            category='prescribing', current_at='2014-11-01')
+
+    def test_etag_and_last_modified_set(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_not_modified_when_etag_matches(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, '')
+
+    def test_not_modified_since_last_import(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_params(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(
+            self.url.replace('03V', '03Q'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_modified_after_import(self):
+        etag = self.client.get(self.url)['ETag']
+        ImportLog.objects.create(
+            category='prescribing', current_at='2014-12-01')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_modified_after_deploy(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        with override_settings(DEPLOYED_AT='2030-01-01T00:00:00+00:00'):
+            response = self.client.get(
+                self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Last-Modified'], 'Tue, 01 Jan 2030 00:00:00 GMT')
+
+    def test_etag_depends_on_deployed_commit(self):
+        etag = self.client.get(self.url)['ETag']
+        with override_settings(SOURCE_COMMIT_ID='abc123'):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class TestConditionalMethods(SimpleTestCase):
+    def test_post_is_not_conditional(self):
+        view = conditional_page(lambda request: HttpResponse('posted'))
+        request = RequestFactory().post('/', HTTP_IF_MATCH='"other"')
+        self.assertEqual(view(request).status_code, 200)
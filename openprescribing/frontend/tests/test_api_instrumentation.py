@@ -0,0 +1,61 @@
+from django.db import DatabaseError
+from django.test import SimpleTestCase, override_settings
+from mock import patch
+
+from api.instrumentation import LatencyHistograms
+from api.instrumentation import bucket_upper_bound
+from api.instrumentation import latency_bucket
+from api.instrumentation import percentile
+from frontend.models import RequestLatency
+
+from .api_test_base import ApiTestBase
+
+
+class TestRequestTimingMiddleware(ApiTestBase):
+    url = '/api/1.0/spending_by_ccg/?format=csv&code=0202010B0&org=03V'
+
+    def test_server_timing_header(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        timings = response['Server-Timing'].split(', ')
+        self.assertEqual(
+            [t.split(';')[0] for t in timings], ['db', 'render', 'total'])
+        self.assertRegexpMatches(
+            timings[0], r'^db;dur=[\d.]+;desc="[1-9]\d* queries, \d+ rows"$')
+
+    @override_settings(LATENCY_FLUSH_INTERVAL=0)
+    def test_latency_recorded(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        latencies = RequestLatency.objects.filter(
+            view_name='api.views_spending.spending_by_ccg')
+        self.assertEqual(sum(l.count for l in latencies), 2)
+
+    def test_failed_flush_keeps_counts(self):
+        histograms = LatencyHistograms()
+        histograms.add('view', 10)
+        with patch('api.instrumentation.connection') as conn:
+            conn.cursor.side_effect = DatabaseError('connection lost')
+            histograms.flush()
+        self.assertEqual(
+            histograms.counts, {('view', latency_bucket(10)): 1})
+
+
+class TestLatencyPercentiles(SimpleTestCase):
+    def test_bucket_bounds(self):
+        for ms in [0.5, 1, 3, 99, 100, 12345]:
+            bucket = latency_bucket(ms)
+            self.assertLessEqual(ms, bucket_upper_bound(bucket))
+            if bucket > 0:
+                self.assertGreater(ms, bucket_upper_bound(bucket - 1))
+
+    def test_percentile(self):
+        counts = {latency_bucket(10): 90, latency_bucket(1000): 10}
+        self.assertEqual(
+            percentile(counts, 0.5), bucket_upper_bound(latency_bucket(10)))
+        self.assertEqual(
+            percentile(counts, 0.95),
+            bucket_upper_bound(latency_bucket(1000)))
+
+    def test_percentile_with_no_requests(self):
+        self.assertIsNone(percentile({}, 0.5))
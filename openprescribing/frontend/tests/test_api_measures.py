@@ -3,7 +3,11 @@ import json
 
 from django.test import TestCase
 
+from api.measure_payloads import write_measure_payloads
 from frontend.models import Measure
+from frontend.models import MeasurePayload
+from frontend.models import MeasureSeries
+from frontend.models import MeasureValue
 from frontend.models import PCT
 
 
@@ -23,6 +27,9 @@ class TestAPIMeasureViews(TestCase):
     fixtures = ['one_month_of_measures']
     api_prefix = '/api/1.0'
 
+    def setUp(self):
+        MeasureSeries.objects.rebuild()
+
     def _get_json(self, url):
         response = self.client.get(url, follow=True)
         self.assertEqual(response.status_code, 200)
@@ -209,6 +216,62 @@ class TestAPIMeasureViews(TestCase):
         self.assertEqual(d['percentile'], 100)
         self.assertEqual("%.4f" % d['calc_value'], '0.5734')
 
+    def test_measure_series_rebuilt_from_measure_values(self):
+        measure_value = MeasureValue.objects.get(
+            measure_id='cerazette', practice_id='C84001')
+        series = MeasureSeries.objects.get(
+            measure_id='cerazette', practice_id='C84001')
+        self.assertEqual(series.months, [measure_value.month])
+        self.assertEqual(series.percentile, [measure_value.percentile])
+        value = series.measure_values()[0]
+        self.assertEqual(
+            sorted(value.cost_savings), sorted(measure_value.cost_savings))
+        self.assertAlmostEqual(
+            value.cost_savings['50'], measure_value.cost_savings['50'])
+        self.assertEqual(
+            series.measure_values(since=datetime.date(2100, 1, 1)), [])
+
+    def test_measure_series_of_practice_which_moved_ccg(self):
+        measure_value = MeasureValue.objects.get(
+            measure_id='cerazette', practice_id='C84001')
+        earlier = datetime.date(2015, 8, 1)
+        MeasureValue.objects.create(
+            measure_id='cerazette', practice_id='C84001', pct_id='03T',
+            month=earlier, numerator=1, denominator=2, calc_value=0.5)
+        MeasureSeries.objects.rebuild(['cerazette'])
+        series = MeasureSeries.objects.get(
+            measure_id='cerazette', practice_id='C84001')
+        self.assertEqual(series.pct_id, '02Q')
+        self.assertEqual(series.months, [earlier, measure_value.month])
+        self.assertEqual(
+            MeasureSeries.objects.by_practice(['03T'], 'cerazette').filter(
+                practice_id='C84001').count(), 0)
+
+    def test_api_measure_by_org_pre_rendered(self):
+        urls = [
+            '/api/1.0/measure_by_ccg/?org=02Q&format=json',
+            '/api/1.0/measure_by_practice/?org=C84001&format=json',
+            '/api/1.0/measure_by_practice/?org=02Q&format=json',
+            '/api/1.0/measure_by_ccg/?org=02Q&tags=core&format=json',
+            '/api/1.0/measure_by_ccg/?org=02Q&tags=other&format=json',
+        ]
+        live = [self._get_json(url) for url in urls]
+        write_measure_payloads()
+        self.assertTrue(MeasurePayload.objects.filter(
+            org_type='practice', org_id='02Q',
+            measure_id='cerazette').exists())
+        self.assertEqual([self._get_json(url) for url in urls], live)
+
+        # Definitions are served as they are now, not as they were when
+        # the values were rendered
+        Measure.objects.filter(pk='cerazette').update(name='New name')
+        data = self._get_json(urls[0])
+        self.assertEqual(data['measures'][0]['name'], 'New name')
+
+        # Requests which can't be answered from one payload still work
+        url = '/api/1.0/measure_by_practice/?org=C84001,02Q&format=json'
+        self.assertTrue(self._get_json(url)['measures'])
+
     def test_api_measure_by_practice(self):
         url = '/api/1.0/measure_by_practice/'
         url += '?org=C84001&measure=cerazette&format=json'
@@ -261,6 +324,25 @@ class TestAPIMeasureViews(TestCase):
         self.assertEqual(d['calc_value'], None)
         self.assertEqual(d['cost_savings']['10'], 0.0)
 
+    def test_api_measure_by_practice_parquet(self):
+        import pyarrow
+        import pyarrow.parquet
+        url = '/api/1.0/measure_by_practice/'
+        url += '?org=C84001&measure=cerazette&format=parquet'
+        response = self.client.get(url, follow=True)
+        self.assertEqual(response.status_code, 200)
+        table = pyarrow.parquet.read_table(
+            pyarrow.BufferReader(response.content))
+        df = table.to_pandas()
+        self.assertEqual(len(df), 1)
+        row = df.iloc[0]
+        self.assertEqual(row['measure'], 'cerazette')
+        self.assertEqual(row['practice_id'], 'C84001')
+        self.assertEqual(row['numerator'], 1000)
+        self.assertEqual("%.4f" % row['calc_value'], '0.0909')
+        self.assertEqual(
+            "%.2f" % json.loads(row['cost_savings'])['10'], '485.58')
+
     def test_api_all_measures_by_practice(self):
         url = '/api/1.0/measure_by_practice/'
         url += '?org=C84001&format=json'
@@ -56,6 +56,17 @@ class TestAPIOrgDetailsViews(ApiTestBase):
         self.assertEqual(rows[1].get('astro_pu_cost'), None)
         self.assertEqual(float(rows[1]['total_list_size']), 28)
 
+    def test_api_view_org_details_all_ccgs_since(self):
+        url = self.api_prefix
+        url += ('/org_details?format=csv&org_type=ccg&keys=total_list_size'
+                '&since=2015-02-01')
+        response = self.client.get(url, follow=True)
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(response.content.splitlines()))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['row_id'], '03V')
+        self.assertEqual(rows[0]['date'], '2015-02-01')
+
     def test_api_view_org_details_all_ccgs_with_nothing_key(self):
         url = self.api_prefix
         url += ('/org_details?format=csv&org_type=ccg&keys=nothing')
@@ -0,0 +1,101 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+
+from api.cache_backends import LRUMemoryCache
+from frontend.models import ImportLog
+
+from .api_test_base import ApiTestBase
+
+
+@override_settings(API_RESPONSE_CACHE='api')
+class TestAPIResponseCache(ApiTestBase):
+    url = '/spending_by_ccg?format=csv&code=0202010B0&org=03V'
+
+    def setUp(self):
+        super(TestAPIResponseCache, self).setUp()
+        caches['api'].clear()
+        ImportLog.objects.create(
+            category='prescribing', current_at='2014-11-01')
+
+    def _double_spending(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE vw__chemical_summary_by_ccg SET cost = cost * 2")
+
+    def test_response_is_cached(self):
+        rows = self._rows_from_api(self.url)
+        self._double_spending()
+        self.assertEqual(self._rows_from_api(self.url), rows)
+
+    def test_responses_for_different_params_are_not_shared(self):
+        rows = self._rows_from_api(self.url)
+        other_rows = self._rows_from_api(self.url.replace('03V', '03Q'))
+        self.assertNotEqual(rows, other_rows)
+
+    def test_cache_invalidated_by_new_import(self):
+        rows = self._rows_from_api(self.url)
+        self._double_spending()
+        ImportLog.objects.create(
+            category='prescribing', current_at='2014-12-01')
+        new_rows = self._rows_from_api(self.url)
+        self.assertEqual(
+            float(new_rows[0]['actual_cost']),
+            float(rows[0]['actual_cost']) * 2)
+
+    def test_cache_key_depends_on_import_log(self):
+        rows = self._rows_from_api(self.url)
+        self._double_spending()
+        # Updating in bulk doesn't send post_save, so the cache isn't
+        # cleared; the cached response is no longer used because its key
+        # has changed.
+        ImportLog.objects.update(current_at='2014-12-01')
+        new_rows = self._rows_from_api(self.url)
+        self.assertNotEqual(new_rows, rows)
+
+    def test_errors_are_not_cached(self):
+        url = '%s/spending?format=csv&code=0' % self.api_prefix
+        response = self.client.get(url, follow=True)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(caches['api']._store.entries), 0)
+
+
+class TestLRUMemoryCache(SimpleTestCase):
+    def _make_cache(self, name, **options):
+        cache = LRUMemoryCache(name, {'TIMEOUT': None, 'OPTIONS': options})
+        cache.clear()
+        return cache
+
+    def test_least_recently_used_entry_evicted(self):
+        cache = self._make_cache('test-lru-entries', MAX_ENTRIES=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_entries_evicted_when_too_large(self):
+        cache = self._make_cache('test-lru-size', MAX_SIZE=2500)
+        cache.set('a', 'x' * 1000)
+        cache.set('b', 'x' * 1000)
+        cache.get('a')
+        cache.set('c', 'x' * 1000)
+        self.assertTrue(cache.has_key('a'))
+        self.assertFalse(cache.has_key('b'))
+        self.assertTrue(cache.has_key('c'))
+
+    def test_entries_shared_between_instances(self):
+        cache = self._make_cache('test-lru-shared')
+        cache.set('a', 1)
+        other = LRUMemoryCache('test-lru-shared', {})
+        self.assertEqual(other.get('a'), 1)
+
+    def test_expired_entries_not_returned(self):
+        cache = self._make_cache('test-lru-expiry')
+        cache.set('a', 1, timeout=0)
+        self.assertIsNone(cache.get('a'))
+        self.assertTrue(cache.add('a', 2))
+        self.assertFalse(cache.add('a', 3))
+        self.assertEqual(cache.get('a'), 2)
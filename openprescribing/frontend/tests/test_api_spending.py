@@ -1,11 +1,23 @@
 import datetime
 import json
 
+from django.core.management import call_command
 from django.db import connection
 
 from .api_test_base import ApiTestBase
 
+from dmd.models import NCSOConcession
+from frontend.management.commands.import_ppu_savings import (
+    make_denormalised_savings_for_month, make_ppu_bins_for_month,
+    update_price_concessions)
+from frontend.models import DenormalisedPPUSaving
 from frontend.models import ImportLog
+from frontend.models import PPUBin
+
+
+def _make_ppu_bins():
+    for month in ['2014-09-01', '2014-11-01']:
+        make_ppu_bins_for_month(month)
 
 
 def _create_prescribing_tables():
@@ -152,6 +164,34 @@ class TestAPISpendingViews(ApiTestBase):
         self.assertEqual(rows[17]['items'], '40')
         self.assertEqual(rows[17]['quantity'], '1209')
 
+    def test_total_spending_by_bnf_paragraph(self):
+        _create_prescribing_tables()
+        rows = self._rows_from_api('/spending?format=csv&code=2.2.1')
+        self.assertEqual(rows[0]['date'], '2013-04-01')
+        self.assertEqual(rows[0]['actual_cost'], '4.61')
+        self.assertEqual(rows[0]['items'], '3')
+        self.assertEqual(rows[0]['quantity'], '82')
+        self.assertEqual(rows[19]['date'], '2014-11-01')
+        self.assertEqual(rows[19]['actual_cost'], '54.26')
+        self.assertEqual(rows[19]['items'], '62')
+        self.assertEqual(rows[19]['quantity'], '2788')
+
+    def test_total_spending_by_duplicated_codes(self):
+        _create_prescribing_tables()
+        rows = self._rows_from_api('/spending?format=csv&code=2,02')
+        self.assertEqual(rows[19]['date'], '2014-11-01')
+        self.assertEqual(rows[19]['actual_cost'], '90.54')
+        self.assertEqual(rows[19]['items'], '95')
+        self.assertEqual(rows[19]['quantity'], '5142')
+
+    def test_total_spending_by_code_not_in_prefix_summary(self):
+        _create_prescribing_tables()
+        rows = self._rows_from_api('/spending?format=csv&code=0202010')
+        self.assertEqual(rows[19]['date'], '2014-11-01')
+        self.assertEqual(rows[19]['actual_cost'], '54.26')
+        self.assertEqual(rows[19]['items'], '62')
+        self.assertEqual(rows[19]['quantity'], '2788')
+
     ########################################
     # Total spending by CCG.
     ########################################
@@ -165,6 +205,40 @@ class TestAPISpendingViews(ApiTestBase):
         self.assertEqual(rows[6]['items'], '41')
         self.assertEqual(rows[6]['quantity'], '1241')
 
+    def test_total_spending_by_ccg_since(self):
+        rows = self._rows_from_api(
+            '/spending_by_ccg?format=csv&since=2014-09-01')
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['date'], '2014-09-01')
+        self.assertEqual(rows[-1]['date'], '2014-11-01')
+
+    def test_total_spending_by_ccg_by_year(self):
+        rows = self._rows_from_api('/spending_by_ccg?format=csv&period=year')
+        self.assertEqual(
+            [(row['date'], row['row_id']) for row in rows],
+            [('2013-01-01', '03Q'), ('2013-01-01', '03V'),
+             ('2014-01-01', '03Q'), ('2014-01-01', '03V')])
+        self.assertEqual(rows[1]['items'], '3')
+        self.assertEqual(rows[1]['quantity'], '73')
+
+    def test_total_spending_by_ccg_by_financial_year(self):
+        rows = self._rows_from_api(
+            '/spending_by_ccg?format=csv&org=03V&period=financial_year')
+        self.assertEqual(
+            [row['date'] for row in rows], ['2013-04-01', '2014-04-01'])
+        self.assertEqual(rows[1]['items'], '136')
+
+    def test_total_spending_by_ccg_by_invalid_period(self):
+        url = '%s/spending_by_ccg?format=csv&period=week' % self.api_prefix
+        response = self.client.get(url, follow=True)
+        self.assertEqual(response.status_code, 400)
+
+    def test_total_spending_by_ccg_since_invalid_date(self):
+        url = '%s/spending_by_ccg?format=csv&since=2014-09' % (
+            self.api_prefix)
+        response = self.client.get(url, follow=True)
+        self.assertEqual(response.status_code, 400)
+
     def test_total_spending_by_one_ccg(self):
         rows = self._rows_from_api('/spending_by_ccg?format=csv&org=03V')
         self.assertEqual(len(rows), 5)
@@ -232,6 +306,29 @@ class TestAPISpendingViews(ApiTestBase):
         self.assertEqual(rows[0]['items'], '29')
         self.assertEqual(rows[0]['quantity'], '2350')
 
+    def test_spending_by_all_ccgs_on_product_json(self):
+        url = '%s/spending_by_ccg?format=json&code=0204000I0BC' % (
+            self.api_prefix)
+        records = json.loads(self.client.get(url, follow=True).content)
+        self.assertEqual(records, [{
+            'row_id': '03V',
+            'row_name': 'NHS Corby',
+            'date': '2014-11-01',
+            'actual_cost': 32.26,
+            'items': 29,
+            'quantity': 2350,
+        }])
+
+        split = json.loads(
+            self.client.get(url + '&orient=split', follow=True).content)
+        self.assertEqual(
+            split['columns'],
+            ['row_id', 'row_name', 'date', 'actual_cost', 'items',
+             'quantity'])
+        self.assertEqual(
+            split['data'], [['03V', 'NHS Corby', '2014-11-01', 32.26, 29,
+                             2350]])
+
     def test_spending_by_all_ccgs_on_presentation(self):
         url = '/spending_by_ccg'
         url += '?format=csv&code=0202010B0AAABAB'
@@ -307,6 +404,45 @@ class TestAPISpendingViews(ApiTestBase):
         self.assertEqual(rows[0]['items'], '40')
         self.assertEqual(rows[0]['quantity'], '2543')
 
+    def test_total_spending_by_practice_which_moved_ccg(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO vw__practice_summary "
+                "(processing_date, pct_id, practice_id, items, cost, "
+                "quantity) VALUES ('2014-11-01', '03Q', 'K83059', 1, 1, 1)")
+        url = '/spending_by_practice'
+        url += '?format=csv&date=2014-11-01'
+        rows = self._rows_from_api(url)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['row_id'], 'K83059')
+        self.assertAlmostEqual(float(rows[0]['actual_cost']), 27.28)
+        self.assertEqual(rows[0]['items'], '41')
+        self.assertEqual(rows[0]['quantity'], '2544')
+
+    def test_total_spending_by_practice_json(self):
+        url = '%s/spending_by_practice' % self.api_prefix
+        url += '?format=json&date=2014-11-01'
+        response = self.client.get(url, follow=True)
+        self.assertTrue(response.streaming)
+        rows = json.loads(''.join(response.streaming_content))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0], {
+            'row_id': 'K83059',
+            'row_name': 'DR KHALID & PARTNERS',
+            'date': '2014-11-01',
+            'setting': -1,
+            'ccg': '03V',
+            'actual_cost': 26.28,
+            'items': 40,
+            'quantity': 2543,
+        })
+
+    def test_spending_by_practice_with_no_results(self):
+        url = '%s/spending_by_practice' % self.api_prefix
+        url += '?format=json&date=2000-01-01'
+        response = self.client.get(url, follow=True)
+        self.assertEqual(json.loads(''.join(response.streaming_content)), [])
+
     def test_spending_by_practice_on_chemical(self):
         url = '/spending_by_practice'
         url += '?format=csv&code=0204000I0&date=2014-11-01'
@@ -321,6 +457,21 @@ class TestAPISpendingViews(ApiTestBase):
         self.assertEqual(rows[0]['items'], '16')
         self.assertEqual(rows[0]['quantity'], '1154')
 
+    def test_spending_by_practice_on_chemical_as_arrow(self):
+        import pyarrow
+        url = '%s/spending_by_practice' % self.api_prefix
+        url += '?format=arrow&code=0204000I0&date=2014-11-01'
+        response = self.client.get(url, follow=True)
+        self.assertEqual(response.status_code, 200)
+        reader = pyarrow.open_stream(pyarrow.BufferReader(response.content))
+        df = reader.read_all().to_pandas()
+        self.assertEqual(len(df), 2)
+        self.assertEqual(df['row_id'][0], 'K83059')
+        self.assertEqual(str(df['date'][0])[:10], '2014-11-01')
+        self.assertEqual("%.2f" % df['actual_cost'][0], '14.15')
+        self.assertEqual(df['items'][0], 16)
+        self.assertEqual(df['quantity'][0], 1154)
+
     def test_spending_by_all_practices_on_chemical_with_date(self):
         url = '/spending_by_practice'
         url += '?format=csv&code=0202010F0&date=2014-09-01'
@@ -360,6 +511,19 @@ class TestAPISpendingViews(ApiTestBase):
         self.assertEqual(rows[-1]['items'], '38')
         self.assertEqual(rows[-1]['quantity'], '1399')
 
+    def test_spending_by_ccg_practices(self):
+        url = '/spending_by_practice?format=csv&org=03V&date=2014-11-01'
+        rows = self._rows_from_api(url)
+        self.assertEqual([r['row_id'] for r in rows], ['K83059', 'P87629'])
+        self.assertEqual(rows[1]['actual_cost'], '64.26')
+
+    def test_spending_by_ccg_practices_on_chemical(self):
+        url = '/spending_by_practice'
+        url += '?format=csv&code=0202010F0&org=03Q,P87629&date=2014-09-01'
+        rows = self._rows_from_api(url)
+        self.assertEqual([r['row_id'] for r in rows], ['N84014', 'P87629'])
+        self.assertEqual(rows[0]['actual_cost'], '11.99')
+
     def test_spending_by_practice_on_multiple_chemicals(self):
         url = '/spending_by_practice?format=csv'
         url += '&code=0202010B0,0204000I0&org=P87629,K83059'
@@ -386,6 +550,15 @@ class TestAPISpendingViews(ApiTestBase):
         self.assertEqual(rows[1]['items'], '38')
         self.assertEqual(rows[1]['quantity'], '1399')
 
+    def test_spending_by_ccg_practices_on_short_product_code(self):
+        url = '/spending_by_practice'
+        url += '?format=csv&code=0204000I0B&org=03V&date=2014-11-01'
+        rows = self._rows_from_api(url)
+        self.assertEqual([r['row_id'] for r in rows], ['K83059', 'P87629'])
+        self.assertEqual(rows[0]['actual_cost'], '10.13')
+        self.assertEqual(rows[0]['items'], '12')
+        self.assertEqual(rows[0]['quantity'], '1150')
+
     def test_spending_by_all_practices_on_presentation(self):
         url = '/spending_by_practice'
         url += '?format=csv&code=0202010B0AAABAB&date=2014-11-01'
@@ -451,9 +624,89 @@ class TestAPISpendingViews(ApiTestBase):
         self.assertEqual(rows[0]['quantity'], '56')
 
 
+class TestAPISpendingRankingViews(ApiTestBase):
+    def test_spending_ranking_top(self):
+        rows = self._rows_from_api(
+            '/spending_ranking?format=csv&code=0202010B0&date=2014-11-01&n=2')
+        self.assertEqual(
+            [row['row_id'] for row in rows], ['P87629', 'K83059'])
+        self.assertEqual(rows[0]['rank'], '1')
+        self.assertEqual(rows[0]['percentile'], '100.0')
+        self.assertEqual(rows[0]['items_per_1000'], '55.0')
+        self.assertEqual(rows[0]['practice_count'], '3')
+
+    def test_spending_ranking_bottom_by_cost(self):
+        rows = self._rows_from_api(
+            '/spending_ranking?format=csv&code=0202010B0&date=2014-11-01'
+            '&n=1&order=bottom&measure=cost')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['row_id'], 'N84014')
+        self.assertEqual(rows[0]['rank'], '3')
+        self.assertEqual(rows[0]['cost_per_1000'], '0.5')
+
+    def test_spending_ranking_rejects_non_chemical_code(self):
+        url = '%s/spending_ranking?format=csv&code=0202&date=2014-11-01' % (
+            self.api_prefix)
+        response = self.client.get(url, follow=True)
+        self.assertEqual(response.status_code, 400)
+
+
+class TestAPISpendingRatioViews(ApiTestBase):
+    def setUp(self):
+        super(TestAPISpendingRatioViews, self).setUp()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO vw__ccgstatistics VALUES "
+                "('2014-09-01'::date,'03V','NHS Corby',100,80.0,40.0,"
+                "'{\"oral_antibacterials_item\": 20}'), "
+                "('2014-09-01'::date,'03Q','NHS Vale of York',50,40.0,20.0,"
+                "'{\"oral_antibacterials_item\": 10}')")
+
+    def test_spending_ratio_by_ccg(self):
+        rows = self._rows_from_api(
+            '/spending_ratio?format=csv&code=0202&org_type=ccg')
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['row_id'], '03Q')
+        self.assertEqual(rows[0]['date'], '2014-09-01')
+        self.assertEqual(float(rows[0]['ratio']), 0.02)
+        self.assertEqual(rows[1]['row_id'], '03V')
+        self.assertEqual(float(rows[1]['ratio']), 0.41)
+
+    def test_spending_ratio_by_ccg_with_star_pu(self):
+        rows = self._rows_from_api(
+            '/spending_ratio?format=csv&code=0202&org=03V'
+            '&denom=star_pu.oral_antibacterials_item')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(float(rows[0]['ratio']), 2.05)
+
+    def test_spending_ratio_percentiles(self):
+        rows = self._rows_from_api(
+            '/spending_ratio?format=csv&code=0202&percentiles=1')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['date'], '2014-09-01')
+        self.assertAlmostEqual(float(rows[0]['p50']), 0.215)
+
+    def test_spending_ratio_percentiles_off(self):
+        rows = self._rows_from_api(
+            '/spending_ratio?format=csv&code=0202&org=03V&percentiles=0')
+        self.assertEqual(len(rows), 1)
+        self.assertNotIn('p50', rows[0])
+
+    def test_spending_ratio_rejects_unknown_denominator(self):
+        url = '%s/spending_ratio?format=json&code=0202&denom=nothing' % (
+            self.api_prefix)
+        response = self.client.get(url, follow=True)
+        self.assertEqual(response.status_code, 400)
+
+
 class TestAPISpendingViewsPPUTable(ApiTestBase):
     fixtures = ApiTestBase.fixtures + ['ppusavings', 'dmdproducts']
 
+    def setUp(self):
+        super(TestAPISpendingViewsPPUTable, self).setUp()
+        for month in ['2014-10-01', '2014-11-01']:
+            make_denormalised_savings_for_month(month)
+
     def _get(self, **data):
         data['format'] = 'json'
         url = self.api_prefix + '/price_per_unit/'
@@ -570,6 +823,13 @@ class TestAPISpendingViewsPPUTable(ApiTestBase):
         data.sort(key=lambda r: r['id'])
         self.assertEqual(data, self._expected_results([1, 2, 5, 6]))
 
+    def test_backfill(self):
+        DenormalisedPPUSaving.objects.all().delete()
+        call_command('backfill_ppu_tables')
+        data = self._get(bnf_code='0202010F0AAAAAA', date='2014-11-01')
+        data.sort(key=lambda r: r['id'])
+        self.assertEqual(data, self._expected_results([1, 2, 5, 6]))
+
     def test_bnf_code_no_data_for_month(self):
         data = self._get(bnf_code='0202010F0AAAAAA', date='2014-12-01')
         self.assertEqual(len(data), 0)
@@ -605,6 +865,20 @@ class TestAPISpendingViewsPPUTable(ApiTestBase):
         data = self._get(entity_code='03V', date='2014-12-01')
         self.assertEqual(len(data), 0)
 
+    def test_price_concessions_updated(self):
+        NCSOConcession.objects.all().delete()
+        # Only the months given are updated
+        update_price_concessions([datetime.date(2014, 10, 1)])
+        data = self._get(bnf_code='0202010F0AAAAAA', date='2014-11-01')
+        self.assertTrue(any(r['price_concession'] for r in data))
+
+        update_price_concessions([datetime.date(2014, 11, 1)])
+        data = self._get(bnf_code='0202010F0AAAAAA', date='2014-11-01')
+        self.assertEqual(len(data), 4)
+        self.assertFalse(any(r['price_concession'] for r in data))
+        self.assertTrue(ImportLog.objects.filter(
+            category='ncso_concessions').exists())
+
     def test_invalid_entity_code_ccg(self):
         data = self._get(entity_code='000', date='2014-11-01')
         self.assertEqual(data, {'detail': 'Not found.'})
@@ -613,6 +887,10 @@ class TestAPISpendingViewsPPUTable(ApiTestBase):
 class TestAPISpendingViewsPPUBubble(ApiTestBase):
     fixtures = ApiTestBase.fixtures + ['importlog']
 
+    def setUp(self):
+        super(TestAPISpendingViewsPPUBubble, self).setUp()
+        _make_ppu_bins()
+
     def test_simple(self):
         url = '/bubble?format=json'
         url += '&bnf_code=0204000I0BCAAAB&date=2014-11-01&highlight=03V'
@@ -706,10 +984,34 @@ class TestAPISpendingViewsPPUBubble(ApiTestBase):
              'plotline': 0.08875}
         )
 
+    def test_trim_is_weighted_by_quantity(self):
+        # The cheaper bin accounts for 20% of the quantity prescribed,
+        # so the more expensive one starts within the cheapest 25%
+        url = '/bubble?format=json'
+        url += '&bnf_code=0202010F0AAAAAA&date=2014-09-01'
+        url += '&highlight=03V&trim=25'
+        url = self.api_prefix + url
+        response = self.client.get(url, follow=True)
+        data = json.loads(response.content)
+        self.assertEqual([x['y'] for x in data['series']], [0.09, 0.1])
+
+    def test_backfill(self):
+        PPUBin.objects.filter(date='2014-11-01').delete()
+        call_command('backfill_ppu_tables')
+        url = '/bubble?format=json'
+        url += '&bnf_code=0204000I0BCAAAB&date=2014-11-01&highlight=03V'
+        response = self.client.get(self.api_prefix + url, follow=True)
+        data = json.loads(response.content)
+        self.assertEqual(len(data['series']), 1)
+
 
 class TestAPISpendingViewsPPUWithGenericMapping(ApiTestBase):
     fixtures = ApiTestBase.fixtures + ['importlog', 'genericcodemapping']
 
+    def setUp(self):
+        super(TestAPISpendingViewsPPUWithGenericMapping, self).setUp()
+        _make_ppu_bins()
+
     def test_with_wildcard(self):
         url = '/bubble?format=json'
         url += '&bnf_code=0204000I0BCAAAB&date=2014-11-01&highlight=03V'
@@ -1,5 +1,13 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test import override_settings
 from django.db import OperationalError
+from django.db import connection
+
+
+def _current_statement_timeout():
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW statement_timeout")
+        return cursor.fetchone()[0]
 
 
 class ApiTestUtils(TestCase):
@@ -12,3 +20,182 @@ class ApiTestUtils(TestCase):
                 cursor = connection.cursor()
                 cursor.execute("select pg_sleep(0.01);")
         self.assertRaises(OperationalError, do_long_running_query)
+
+    def test_db_timeout_reset_after_nested_transaction(self):
+        from api.view_utils import db_timeout
+
+        @db_timeout(1234)
+        def get_timeout():
+            return _current_statement_timeout()
+
+        before = _current_statement_timeout()
+        self.assertEqual(get_timeout(), '1234ms')
+        self.assertEqual(_current_statement_timeout(), before)
+
+    @override_settings(API_STATEMENT_TIMEOUTS={'get_timeout': 4321})
+    def test_db_timeout_overridden_by_setting(self):
+        from api.view_utils import db_timeout
+
+        @db_timeout(1234)
+        def get_timeout():
+            return _current_statement_timeout()
+
+        self.assertEqual(get_timeout(), '4321ms')
+
+
+class ApiTestDbTimeoutTransactions(TransactionTestCase):
+    def test_db_timeout_does_not_outlast_view(self):
+        from api.view_utils import db_timeout
+
+        @db_timeout(1)
+        def do_long_running_query():
+                cursor = connection.cursor()
+                cursor.execute("select pg_sleep(0.01);")
+
+        before = _current_statement_timeout()
+        self.assertRaises(OperationalError, do_long_running_query)
+        self.assertEqual(_current_statement_timeout(), before)
+
+    def test_stream_query_uses_current_timeout(self):
+        from api.view_utils import db_timeout, stream_query
+
+        @db_timeout(1)
+        def stream_long_running_query():
+            return stream_query("select pg_sleep(0.01)", None)
+
+        rows = stream_long_running_query()
+        self.assertRaises(OperationalError, list, rows)
+
+
+@override_settings(API_QUERY_COALESCING_CACHE='queries')
+class ApiTestQueryCoalescing(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        caches['queries'].clear()
+
+    def test_rows_not_cached_without_waiters(self):
+        from django.core.cache import caches
+        from api.query_coalescing import coalesced, make_lock_key
+
+        calls = []
+
+        def run():
+            calls.append(1)
+            return [{'x': 1}]
+
+        self.assertEqual(coalesced('SELECT 1 AS x', None, run), [{'x': 1}])
+        self.assertEqual(coalesced('SELECT 1 AS x', None, run), [{'x': 1}])
+        self.assertEqual(len(calls), 2)
+        key = make_lock_key('SELECT 1 AS x', None)
+        self.assertIsNone(caches['queries'].get('api-query:%s' % key))
+
+    def test_rows_cached_for_waiting_process(self):
+        import threading
+        import time
+        import psycopg2
+        from django.core.cache import caches
+        from api.query_coalescing import coalesced, make_lock_key
+        from api.query_coalescing import _has_waiters
+
+        key = make_lock_key('SELECT 1 AS x', None)
+        other = psycopg2.connect(**connection.get_connection_params())
+        other.autocommit = True
+
+        def wait_for_lock():
+            other.cursor().execute("SELECT pg_advisory_lock(%s)", [key])
+            other.cursor().execute("SELECT pg_advisory_unlock(%s)", [key])
+
+        waiter = threading.Thread(target=wait_for_lock)
+
+        def run():
+            waiter.start()
+            while not _has_waiters(key):
+                time.sleep(0.01)
+            return [{'x': 1}]
+
+        try:
+            self.assertEqual(
+                coalesced('SELECT 1 AS x', None, run), [{'x': 1}])
+        finally:
+            waiter.join()
+            other.close()
+        self.assertEqual(
+            caches['queries'].get('api-query:%s' % key), [{'x': 1}])
+
+    def test_waits_for_identical_query_in_progress(self):
+        import threading
+        import psycopg2
+        from django.core.cache import caches
+        from api.query_coalescing import make_lock_key
+        from api.view_utils import execute_query
+
+        query = 'SELECT %s AS x'
+        key = make_lock_key(query, (1,))
+        other = psycopg2.connect(**connection.get_connection_params())
+        other.autocommit = True
+        other.cursor().execute("SELECT pg_advisory_lock(%s)", [key])
+
+        def finish_other_query():
+            caches['queries'].set('api-query:%s' % key, [{'x': 'shared'}])
+            other.cursor().execute("SELECT pg_advisory_unlock(%s)", [key])
+
+        timer = threading.Timer(0.2, finish_other_query)
+        timer.start()
+        try:
+            rows = execute_query(query, [[1]], coalesce=True)
+        finally:
+            timer.join()
+            other.close()
+        self.assertEqual(rows, [{'x': 'shared'}])
+
+
+class ApiTestQueryBuilder(SimpleTestCase):
+    def test_no_conditions(self):
+        from api.query_builder import Conditions
+
+        conditions = Conditions()
+        self.assertEqual(conditions.to_sql(), '')
+        self.assertEqual(conditions.params, [])
+
+    def test_statement_does_not_depend_on_number_of_values(self):
+        from api.query_builder import Conditions
+
+        statements = []
+        for orgs in [['03Q'], ['03Q', '03V', '99P']]:
+            conditions = Conditions()
+            conditions.add_like_any('chemical_id', ['0202%'])
+            conditions.add_any('pct_id', orgs)
+            conditions.add('processing_date = %s', '2015-01-01')
+            statements.append(conditions.to_sql())
+            self.assertEqual(
+                conditions.params, ['0202%', orgs, '2015-01-01'])
+        self.assertEqual(statements[0], statements[1])
+        self.assertEqual(
+            statements[0],
+            'WHERE (chemical_id LIKE %s) AND (pct_id = ANY(%s)) '
+            'AND (processing_date = %s) ')
+
+    def test_like_conditions_are_ored(self):
+        from api.query_builder import Conditions
+
+        conditions = Conditions()
+        conditions.add_like_any('chemical_id', ['0202%', '0203%'])
+        self.assertEqual(
+            conditions.to_sql(),
+            'WHERE (chemical_id LIKE %s OR chemical_id LIKE %s) ')
+        self.assertEqual(conditions.params, ['0202%', '0203%'])
+
+
+class ApiTestRenderers(SimpleTestCase):
+    def test_build_table_in_batches(self):
+        from mock import patch
+        from api import renderers
+
+        rows = [{'x': None, 'y': i} for i in range(3)]
+        rows += [{'x': 1.5, 'y': 3}]
+        with patch.object(renderers, 'BATCH_SIZE', 2):
+            table = renderers.build_table(iter(rows))
+        self.assertEqual(table.num_rows, 4)
+        self.assertEqual(
+            table.to_pandas()['x'].fillna(0).tolist(), [0, 0, 0, 1.5])
+        self.assertEqual(table.to_pandas()['y'].tolist(), [0, 1, 2, 3])
@@ -19,6 +19,7 @@ from mock import MagicMock
 
 from frontend.models import ImportLog
 from frontend.models import Measure
+from frontend.models import MeasureSeries
 from frontend.models import MeasureValue
 from frontend.models import PCT
 from frontend.models import Practice
@@ -193,6 +194,7 @@ class TestBookmarkUtilsPerforming(TestCase):
         self.pct = pct
         self.high_percentile_practice = practice_with_high_percentiles
         self.low_percentile_practice = practice_with_low_percentiles
+        MeasureSeries.objects.rebuild()
 
     # Worst performing
     # CCG bookmarks
@@ -211,6 +213,7 @@ class TestBookmarkUtilsPerforming(TestCase):
 
     def test_miss_where_not_worst_in_specified_number_of_months(self):
         MeasureValue.objects.all().delete()
+        MeasureSeries.objects.rebuild()
         finder = bookmark_utils.InterestingMeasureFinder(
             pct=self.pct)
         worst_measures = finder.worst_performing_in_period(3)
@@ -312,6 +315,7 @@ class TestBookmarkUtilsChanging(TestCase):
         self.practice_with_low_change = practice_with_low_change
         self.practice_with_high_change = practice_with_high_change
         self.practice_with_high_neg_change = practice_with_high_neg_change
+        MeasureSeries.objects.rebuild()
 
     def test_high_change_returned(self):
         finder = bookmark_utils.InterestingMeasureFinder(
@@ -374,6 +378,7 @@ def _makeCostSavingMeasureValues(measure, practice, savings):
                 '90': savings[i] * 100, },
             month=month
         )
+    MeasureSeries.objects.rebuild()
 
 
 class TestBookmarkUtilsSavingsBase(TestCase):
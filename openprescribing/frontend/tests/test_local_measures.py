@@ -0,0 +1,103 @@
+import datetime
+
+from django.test import SimpleTestCase
+from mock import MagicMock
+import pandas as pd
+
+from frontend import local_measures
+
+
+JAN = datetime.date(2015, 1, 1)
+FEB = datetime.date(2015, 2, 1)
+
+
+class LocalMeasuresTests(SimpleTestCase):
+    def test_can_calculate(self):
+        measure = MagicMock(
+            numerator_from='{hscic}.normalised_prescribing_standard ',
+            numerator_where="bnf_code LIKE '0212%'",
+            denominator_from='{hscic}.normalised_prescribing_standard ',
+            denominator_where="bnf_code LIKE '02%'")
+        measure.columns_for_select.return_value = 'SUM(items) AS numerator'
+        self.assertTrue(local_measures.can_calculate(measure))
+
+        measure.columns_for_select.return_value = (
+            "CAST(JSON_EXTRACT(MAX(star_pu), '$.statins') AS FLOAT64) "
+            "AS denominator")
+        self.assertFalse(local_measures.can_calculate(measure))
+
+        measure.columns_for_select.return_value = 'SUM(items) AS numerator'
+        measure.numerator_from = '{measures}.opioid_total_ome '
+        self.assertFalse(local_measures.can_calculate(measure))
+
+        # silver, which selects on presentation names
+        measure.numerator_from = '{hscic}.normalised_prescribing_standard '
+        measure.numerator_where = (
+            "(bnf_code like '20%' AND (bnf_name LIKE '%Silv%' "
+            "OR bnf_name LIKE '% Ag %')) ")
+        self.assertTrue(local_measures.can_calculate(measure))
+
+        # Columns which the local tables don't have
+        measure.numerator_where = "(bnf_code LIKE '20%' AND pct = '03V')"
+        self.assertFalse(local_measures.can_calculate(measure))
+
+    def test_add_percent_rank(self):
+        frame = pd.DataFrame({
+            'month': [JAN, JAN, JAN, JAN, FEB],
+            'calc_value': [0.5, 0.1, 0.5, None, 0.3],
+        })
+        frame = local_measures.add_percent_rank(frame)
+        self.assertEqual(
+            list(local_measures.rows_as_dicts(frame[['percentile']])),
+            [{'percentile': 0.5}, {'percentile': 0}, {'percentile': 0.5},
+             {'percentile': None}, {'percentile': 0}])
+
+    def test_deciles_and_totals(self):
+        measure = MagicMock(is_cost_based=False)
+        practices = pd.DataFrame({
+            'month': [JAN] * 5 + [FEB],
+            'numerator': [1, 2, 3, 4, 0, 7],
+            'denominator': [10, 10, 10, 10, 0, 14],
+            'calc_value': [0.1, 0.2, 0.3, 0.4, None, 0.5],
+        })
+        globals_ = local_measures.global_deciles_practices(
+            practices, measure)
+        rows = list(local_measures.rows_as_dicts(globals_))
+        self.assertEqual(rows[0]['month'], JAN)
+        self.assertEqual(rows[0]['numerator'], 10)
+        self.assertEqual(rows[0]['denominator'], 40)
+        self.assertAlmostEqual(rows[0]['practice_10th'], 0.13)
+        self.assertAlmostEqual(rows[0]['practice_50th'], 0.25)
+        self.assertEqual(rows[1]['practice_90th'], 0.5)
+
+    def test_cost_savings(self):
+        globals_ = pd.DataFrame({
+            'month': [JAN],
+            'cost_per_num': [1.0],
+            'cost_per_denom': [0.5],
+        })
+        for centile in local_measures.CENTILES:
+            globals_['ccg_%sth' % centile] = centile / 100.0
+        ccgs = pd.DataFrame({
+            'pct_id': ['02Q', '03V'],
+            'month': [JAN, JAN],
+            'num_cost': [80.0, None],
+            'num_quantity': [40.0, None],
+            'denom_cost': [100.0, 50.0],
+            'denom_quantity': [100.0, 100.0],
+        })
+        ccgs = local_measures.ccg_cost_savings(ccgs, globals_)
+        rows = list(local_measures.rows_as_dicts(ccgs))
+        # 02Q: 100 - (0.1 * 100 * 2.0 + 90 * 20 / 60.0)
+        self.assertAlmostEqual(rows[0]['cost_savings_10'], 50)
+        self.assertAlmostEqual(rows[0]['cost_savings_50'], -50 / 3.0)
+        # 03V has no numerator, so is priced at the global cost per item
+        self.assertAlmostEqual(rows[1]['cost_savings_50'], -25)
+
+        practices = ccgs.copy()
+        totals = local_measures.global_cost_savings(
+            practices, ccgs, globals_)
+        row = list(local_measures.rows_as_dicts(totals))[0]
+        # Only positive savings are counted
+        self.assertAlmostEqual(row['ccg_cost_savings_10'], 50)
+        self.assertAlmostEqual(row['practice_cost_savings_50'], 0)
@@ -409,6 +409,30 @@ class TestFrontendViews(TransactionTestCase):
         self.assertContains(response, 'bnfCodes = "ABCD"')
 
 
+class TestConditionalViews(TransactionTestCase):
+    fixtures = ['chemicals', 'sections', 'ccgs',
+                'practices', 'prescriptions', 'measures', 'importlog']
+
+    def test_not_modified_when_etag_matches(self):
+        etag = self.client.get('/bnf/')['ETag']
+        response = self.client.get('/bnf/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_user(self):
+        etag = self.client.get('/ccg/03V/')['ETag']
+        self._login()
+        response = self.client.get('/ccg/03V/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def _login(self):
+        from django.contrib.auth.models import User
+        user = User.objects.create(
+            username='a@a.com', email='a@a.com', is_active=True)
+        self.client.force_login(
+            user, 'django.contrib.auth.backends.ModelBackend')
+
+
 class TestPPUViews(TransactionTestCase):
     fixtures = ['ccgs', 'importlog', 'dmdproducts',
                 'practices', 'prescriptions', 'presentations']
@@ -25,7 +25,7 @@ from common.utils import email_as_text
 from common.utils import nhs_titlecase
 from frontend.models import ImportLog
 from frontend.models import Measure
-from frontend.models import MeasureValue
+from frontend.models import MeasureSeries
 
 GRAB_CMD = ('/usr/local/bin/phantomjs ' +
             settings.SITE_ROOT +
@@ -241,24 +241,21 @@ class InterestingMeasureFinder(object):
     def _best_or_worst_performing_in_period(self, period, best_or_worst=None):
         assert best_or_worst in ['best', 'worst']
         worst = []
-        measure_filter = {
-            'month__gte': self.months_ago(period),
-            'measure__tags__contains': ['core']
-        }
-        if self.practice:
-            measure_filter['practice'] = self.practice
-        else:
-            measure_filter['pct'] = self.pct
-            measure_filter['practice'] = None
         invert_percentile_for_comparison = False
         if best_or_worst == 'worst':
             invert_percentile_for_comparison = True
-            measure_filter['percentile__gte'] = 90
+
+            def include(measure_value):
+                return (measure_value.percentile is not None and
+                        measure_value.percentile >= 90)
         else:
-            measure_filter['percentile__lte'] = 10
+            def include(measure_value):
+                return (measure_value.percentile is not None and
+                        measure_value.percentile <= 10)
         df = self.measurevalues_dataframe(
-            MeasureValue.objects.filter(**measure_filter),
-            ['numerator', 'calc_value', 'percentile'])
+            self.months_ago(period),
+            ['numerator', 'calc_value', 'percentile'],
+            include)
         for row in df.iterrows():
             measure = Measure.objects.get(pk=row[0])
             measure_df = row[1]
@@ -301,17 +298,8 @@ class InterestingMeasureFinder(object):
         # that are continuing after they were first detected
         window_multiplier = 1.5
         window_plus = int(round(window * window_multiplier))
-        measure_filter = {
-            'month__gte': self.months_ago(window_plus),
-            'measure__tags__contains': ['core']
-        }
-        if self.practice:
-            measure_filter['practice'] = self.practice
-        else:
-            measure_filter['pct'] = self.pct
-            measure_filter['practice'] = None
         df = self.measurevalues_dataframe(
-            MeasureValue.objects.filter(**measure_filter), 'percentile')
+            self.months_ago(window_plus), 'percentile')
         for row in df.itertuples():
             measure = Measure.objects.get(pk=row[0])
             percentiles = row[1:]
@@ -344,17 +332,31 @@ class InterestingMeasureFinder(object):
         return {'improvements': improvements,
                 'declines': declines}
 
-    def measurevalues_dataframe(self, queryset=None, data_col=None):
-        """Given a queryset of many measurevalues across many measures,
-        returns a dataframe indexed by measure, with month columns,
-        and `data_col` values.
+    def measurevalues_dataframe(self, since, data_col, include=None):
+        """Returns a dataframe of the organisation's values for core
+        measures from `since` onwards, indexed by measure, with month
+        columns, and `data_col` values.  If given, `include` is called
+        with each MeasureValue to decide whether to include it.
 
         """
         if not isinstance(data_col, list):
             data_col = [data_col]
         data_cols = ['month', 'measure_id'] + data_col
-        data = list(queryset.order_by('measure_id', 'month').values_list(
-            *data_cols))
+        series = MeasureSeries.objects.select_related(
+            'measure', 'pct', 'practice')
+        series = series.filter(measure__tags__contains=['core'])
+        if self.practice:
+            series = series.filter(practice=self.practice)
+        else:
+            series = series.filter(pct=self.pct, practice=None)
+        data = sorted(
+            (
+                tuple(getattr(measure_value, col) for col in data_cols)
+                for one_series in series
+                for measure_value in one_series.measure_values(since)
+                if include is None or include(measure_value)
+            ),
+            key=lambda row: (row[1], row[0]))
         if data:
             df = pd.DataFrame.from_records(
                 data,
@@ -378,16 +380,8 @@ class InterestingMeasureFinder(object):
         possible_savings = []
         achieved_savings = []
         total_savings = 0
-        measure_filter = {
-            'month__gte': self.months_ago(period),
-            'measure__tags__contains': ['core']}
-        if self.practice:
-            measure_filter['practice'] = self.practice
-        else:
-            measure_filter['pct'] = self.pct
-            measure_filter['practice'] = None
         df = self.measurevalues_dataframe(
-            MeasureValue.objects.filter(**measure_filter), 'cost_savings')
+            self.months_ago(period), 'cost_savings')
         for row in df.itertuples():
             measure = Measure.objects.get(pk=row[0])
             cost_savings = row[1:]
@@ -25,6 +25,7 @@ from allauth.account import app_settings
 from allauth.account.models import EmailAddress
 from allauth.account.utils import perform_login
 
+from api.conditional import conditional_page
 from common.utils import valid_date
 from dmd.models import DMDProduct
 from frontend.forms import OrgBookmarkForm
@@ -121,6 +122,7 @@ def chemical(request, bnf_code):
 ##################################################
 # Price per unit
 ##################################################
+@conditional_page
 def price_per_unit_by_presentation(request, entity_code, bnf_code):
     date = request.GET.get('date', None)
     if date:
@@ -193,6 +195,7 @@ def _specified_or_last_date(request, category):
     return date
 
 
+@conditional_page
 def practice_price_per_unit(request, code):
     date = _specified_or_last_date(request, 'ppu')
     practice = get_object_or_404(Practice, code=code)
@@ -219,6 +222,7 @@ def all_ccgs(request):
     return render(request, 'all_ccgs.html', context)
 
 
+@conditional_page
 def ccg_price_per_unit(request, code):
     date = _specified_or_last_date(request, 'ppu')
     ccg = get_object_or_404(PCT, code=code)
@@ -237,6 +241,7 @@ def ccg_price_per_unit(request, code):
 # These replace old CCG and practice dashboards.
 ##################################################
 
+@conditional_page
 def all_measures(request):
     tags = request.GET.get('tags', '')
     query = {}
@@ -249,6 +254,7 @@ def all_measures(request):
     return render(request, 'all_measures.html', context)
 
 
+@conditional_page
 def measure_for_all_ccgs(request, measure):
     measure = get_object_or_404(Measure, id=measure)
     context = {
@@ -257,6 +263,7 @@ def measure_for_all_ccgs(request, measure):
     return render(request, 'measure_for_all_ccgs.html', context)
 
 
+@conditional_page
 def measure_for_practices_in_ccg(request, ccg_code, measure):
     requested_ccg = get_object_or_404(PCT, code=ccg_code)
     measure = get_object_or_404(Measure, id=measure)
@@ -271,6 +278,7 @@ def measure_for_practices_in_ccg(request, ccg_code, measure):
     return render(request, 'measure_for_practices_in_ccg.html', context)
 
 
+@conditional_page
 def measures_for_one_ccg(request, ccg_code):
     requested_ccg = get_object_or_404(PCT, code=ccg_code.upper())
     if request.method == 'POST':
@@ -306,6 +314,7 @@ def measures_for_one_ccg(request, ccg_code):
     return render(request, 'measures_for_one_ccg.html', context)
 
 
+@conditional_page
 def measure_for_one_ccg(request, measure, ccg_code):
     ccg = get_object_or_404(PCT, code=ccg_code)
     measure = get_object_or_404(Measure, pk=measure)
@@ -318,6 +327,7 @@ def measure_for_one_ccg(request, measure, ccg_code):
     return render(request, 'measure_for_one_ccg.html', context)
 
 
+@conditional_page
 def measure_for_one_practice(request, measure, practice_code):
     practice = get_object_or_404(Practice, code=practice_code)
     measure = get_object_or_404(Measure, pk=measure)
@@ -357,6 +367,7 @@ def last_bookmark(request):
         return redirect('home')
 
 
+@conditional_page
 def analyse(request):
     if request.method == 'POST':
         form = _handleCreateBookmark(
@@ -427,6 +438,7 @@ def _handleCreateBookmark(request, subject_class,
     return form
 
 
+@conditional_page
 def measures_for_one_practice(request, code):
     p = get_object_or_404(Practice, code=code)
     if request.method == 'POST':
@@ -478,6 +490,7 @@ def gdoc_view(request, doc_id):
     return render(request, 'gdoc.html', context)
 
 
+@conditional_page
 def tariff(request, code=None):
     products = DMDProduct.objects.filter(
         tariffprice__isnull=False,
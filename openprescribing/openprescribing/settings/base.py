@@ -158,6 +158,8 @@ TEMPLATES = [
 # MIDDLEWARE CONFIGURATION
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#middleware-classes
 MIDDLEWARE_CLASSES = (
+    # Should come first, so that it times all the other middleware
+    'api.instrumentation.RequestTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     # Default Django middleware.
     'django.middleware.common.CommonMiddleware',
@@ -279,12 +281,39 @@ TEST_RUNNER = 'frontend.tests.custom_runner.AssetBuildingTestRunner'
 
 CONN_MAX_AGE = 1200
 
+# Limits, in milliseconds, on the time any one database statement run
+# by an API view may take, overriding the limit passed to its db_timeout
+# decorator.  Keyed by the name of the view function.
+API_STATEMENT_TIMEOUTS = {}
+
+# The entry in CACHES used to cache API responses until the next import
+# (see api/response_cache.py).  Responses are not cached if this is None.
+API_RESPONSE_CACHE = None
+
+# The entry in CACHES through which identical queries run at the same
+# time by different processes share their rows, and how many seconds the
+# rows are kept there (see api/query_coalescing.py).  Queries are not
+# coalesced if this is None.
+API_QUERY_COALESCING_CACHE = None
+API_QUERY_COALESCING_TIMEOUT = 10
+
+# The number of threads which run the parts of requests to the batch API
+# view, and the most parts a request may have (see api/views_batch.py)
+API_BATCH_WORKERS = 4
+API_BATCH_MAX_REQUESTS = 20
+
+# How often, in seconds, each process adds the latencies it has recorded
+# to the RequestLatency table (see api/instrumentation.py)
+LATENCY_FLUSH_INTERVAL = 60
+
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
         'rest_framework_csv.renderers.CSVRenderer',
+        'api.renderers.ArrowRenderer',
+        'api.renderers.ParquetRenderer',
     ),
     'DEFAULT_CONTENT_NEGOTIATION_CLASS':
     'frontend.negotiation.IgnoreAcceptsContentNegotiation',
@@ -313,6 +342,16 @@ GDOC_DOCS = {
 
 API_HOST = utils.get_env_setting('API_HOST', default='')
 
+# The commit deployed, and when it was deployed (as an ISO 8601 datetime),
+# which conditional responses depend on (see api/conditional.py).  These
+# are written to deploy.json by `fab deploy`, and can be overridden by
+# environment variables.
+_deploy_info = utils.get_deploy_info(join(SITE_ROOT, 'deploy.json'))
+SOURCE_COMMIT_ID = utils.get_env_setting(
+    'SOURCE_COMMIT_ID', default=_deploy_info.get('commit', ''))
+DEPLOYED_AT = utils.get_env_setting(
+    'DEPLOYED_AT', default=_deploy_info.get('deployed_at', ''))
+
 # BigQuery project name
 BQ_PROJECT = 'ebmdatalab'
 
@@ -27,7 +27,7 @@ DATABASES = {
         'USER': utils.get_env_setting('DB_USER'),
         'PASSWORD': utils.get_env_setting('DB_PASS'),
         'HOST': utils.get_env_setting('DB_HOST', '127.0.0.1'),
-        'CONN_MAX_AGE': 0  # Must be zero, see api/view_utils#db_timeout
+        'CONN_MAX_AGE': CONN_MAX_AGE
     },
     'old': {
         'ENGINE': 'django.contrib.gis.db.backends.postgis',
@@ -46,8 +46,27 @@ DATABASES = {
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # API responses are keyed on the latest imports, so there is no need
+    # for a timeout.  They're shared by every worker, so that one cache
+    # is filled (and cleared on import) rather than one per worker.
+    'api': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/tmp/openprescribing_api',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        }
+    },
+    # Rows shared by identical queries running at the same time, which
+    # must be visible to every worker
+    'queries': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/tmp/openprescribing_queries',
     }
 }
+API_RESPONSE_CACHE = 'api'
+API_QUERY_COALESCING_CACHE = 'queries'
 # END CACHE CONFIGURATION
 
 GOOGLE_TRACKING_ID = 'UA-62480003-1'
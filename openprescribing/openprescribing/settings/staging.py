@@ -36,8 +36,27 @@ DATABASES = {
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # API responses are keyed on the latest imports, so there is no need
+    # for a timeout.  They're shared by every worker, so that one cache
+    # is filled (and cleared on import) rather than one per worker.
+    'api': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/tmp/openprescribing_staging_api',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        }
+    },
+    # Rows shared by identical queries running at the same time, which
+    # must be visible to every worker
+    'queries': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/tmp/openprescribing_staging_queries',
     }
 }
+API_RESPONSE_CACHE = 'api'
+API_QUERY_COALESCING_CACHE = 'queries'
 # END CACHE CONFIGURATION
 
 ANYMAIL["MAILGUN_SENDER_DOMAIN"] = "staging.openprescribing.net",
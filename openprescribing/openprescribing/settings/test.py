@@ -18,6 +18,17 @@ DATABASES = {
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Only used by tests that set API_RESPONSE_CACHE
+    'api': {
+        'BACKEND': 'api.cache_backends.LRUMemoryCache',
+        'LOCATION': 'api',
+        'TIMEOUT': None,
+    },
+    # Only used by tests that set API_QUERY_COALESCING_CACHE
+    'queries': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'queries',
     }
 }
 INTERNAL_IPS = ('127.0.0.1',)
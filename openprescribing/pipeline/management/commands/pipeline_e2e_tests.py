@@ -132,6 +132,10 @@ def run_end_to_end():
     assert_raw_count_equal(1, 'vw__presentation_summary',
                            "presentation_code = '1001030C0AAAAAA'")
 
+    # We expect one chemical-level BNF prefix summary per month
+    assert_raw_count_equal(1, 'vw__bnf_prefix_summary',
+                           "bnf_prefix = '1001030C0'")
+
     # We expect one presentation summary per CCG per month
     assert_raw_count_equal(2, 'vw__presentation_summary_by_ccg',
                            "presentation_code = '1001030C0AAAAAA'")
@@ -167,6 +171,10 @@ def run_end_to_end():
     assert_raw_count_equal(2, 'vw__presentation_summary',
                            "presentation_code = '1001030C0AAAAAA'")
 
+    # We expect one chemical-level BNF prefix summary per month
+    assert_raw_count_equal(2, 'vw__bnf_prefix_summary',
+                           "bnf_prefix = '1001030C0'")
+
     # We expect one presentation summary per CCG per month
     assert_raw_count_equal(4, 'vw__presentation_summary_by_ccg',
                            "presentation_code = '1001030C0AAAAAA'")
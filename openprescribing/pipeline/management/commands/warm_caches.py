@@ -0,0 +1,147 @@
+"""Replay popular API requests against the live site, so that the first
+visitors after an import don't have to wait while the response caches
+and the database's buffers fill.
+
+By default the requests are those listed in warm_cache_urls.txt in the
+pipeline metadata directory.  With --access-log, the most frequent
+successful API requests in the given nginx access logs are replayed
+instead.  The time taken by each request is reported, slowest first, so
+that any that have become slow are noticed straight away.
+
+Each request is served by whichever web worker takes it, so this only
+helps if the API response cache is shared by every worker.  The command
+refuses to run if the cache is local to each process.
+
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import os
+import re
+import threading
+import time
+
+import requests
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.core.management import CommandError
+
+from api.response_cache import get_response_cache
+
+# Cache backends which keep entries in the memory of each process
+LOCAL_CACHE_BACKENDS = [
+    'api.cache_backends.LRUMemoryCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+]
+
+# Matches the request line of a successful API GET in nginx's combined
+# log format
+ACCESS_LOG_RE = re.compile(r'"GET (/api/1\.0/[^ "]+) HTTP/[\d.]+" 200 ')
+
+
+def configured_paths():
+    path = os.path.join(
+        settings.PIPELINE_METADATA_DIR, 'warm_cache_urls.txt')
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def popular_paths(access_log_paths, limit):
+    """Return the `limit` API paths most often requested successfully in
+    the given access logs, which may be gzipped.
+    """
+    counts = Counter()
+    for log_path in access_log_paths:
+        if log_path.endswith('.gz'):
+            f = gzip.open(log_path)
+        else:
+            f = open(log_path)
+        with f:
+            for line in f:
+                match = ACCESS_LOG_RE.search(line)
+                if match:
+                    counts[match.group(1)] += 1
+    return [path for path, _ in counts.most_common(limit)]
+
+
+def check_cache_is_shared():
+    if get_response_cache() is None:
+        raise CommandError('API responses are not cached')
+    backend = settings.CACHES[settings.API_RESPONSE_CACHE]['BACKEND']
+    if backend in LOCAL_CACHE_BACKENDS:
+        raise CommandError(
+            'The API response cache (%s) is local to each web worker, so '
+            'warming it over HTTP would only fill one of them' % backend)
+
+
+_local = threading.local()
+
+
+def get_session():
+    """Return a Session for the current thread, as Sessions aren't safe to
+    share between threads.
+    """
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def fetch(url, timeout):
+    """Request `url`, returning the status code (or the error, if the
+    request failed) and the time taken to read the whole response.
+    """
+    start = time.time()
+    try:
+        response = get_session().get(url, timeout=timeout)
+        status = response.status_code
+    except requests.RequestException as e:
+        status = e.__class__.__name__
+    return url, status, time.time() - start
+
+
+class Command(BaseCommand):
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host', default=settings.GRAB_HOST,
+            help='The site to send requests to')
+        parser.add_argument(
+            '--access-log', action='append', dest='access_logs',
+            help='An nginx access log to find popular requests in; may be '
+                 'given more than once')
+        parser.add_argument(
+            '--limit', type=int, default=100,
+            help='The number of requests to take from the access logs')
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='The number of requests to make at a time')
+        parser.add_argument(
+            '--timeout', type=int, default=120,
+            help='Seconds to wait for each response')
+
+    def handle(self, *args, **options):
+        check_cache_is_shared()
+        if options['access_logs']:
+            paths = popular_paths(options['access_logs'], options['limit'])
+        else:
+            paths = configured_paths()
+        urls = [options['host'].rstrip('/') + path for path in paths]
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            results = list(executor.map(
+                lambda url: fetch(url, options['timeout']), urls))
+        total = time.time() - start
+
+        failures = 0
+        for url, status, seconds in sorted(
+                results, key=lambda result: -result[2]):
+            if status != 200:
+                failures += 1
+            self.stdout.write('%8.2fs  %s  %s' % (seconds, status, url))
+        self.stdout.write(
+            'Warmed %s URLs in %.2fs with %s workers; %s failed' % (
+                len(urls), total, options['workers'], failures))